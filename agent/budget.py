@@ -0,0 +1,209 @@
+"""
+单次 Agent 调用的预算
+
+模型反复重试失败的 SQL 时，一次 data_agent 调用可能循环数分钟，长时间占用 worker 和数据库连接。
+每次调用绑定一个 AgentBudget（contextvars，Agent 内部的节点和工具调用共享同一个对象），
+由 BudgetMiddleware 在 Agent 循环内检查：
+
+- 耗时（AGENT_MAX_SECONDS）、LLM 调用次数（AGENT_MAX_LLM_CALLS）、SQL 调用次数（AGENT_MAX_SQL_CALLS）
+- SQL 次数用完后，后续 SQL 工具调用不再执行，直接返回提示
+- 任一预算用完后，下一次 LLM 调用不再提供工具，要求模型根据已有结果给出部分回答
+- 收尾调用本身也超时（或整体超过 AGENT_MAX_SECONDS + AGENT_FINAL_ANSWER_GRACE）时，
+  用已完成的工具结果拼出部分回答
+
+预算触发次数计入 db_mcp.metrics（agent_budget_exhausted{kind=...}）。
+
+使用示例：
+    from agent.budget import AgentBudget, BudgetMiddleware, bind_budget, reset_budget
+
+    budget = AgentBudget()
+    token = bind_budget(budget)
+    try:
+        result = await asyncio.wait_for(agent.ainvoke(inputs), budget.hard_timeout)
+    except asyncio.TimeoutError:
+        result = budget.partial_answer()
+    finally:
+        reset_budget(token)
+"""
+
+import asyncio
+import time
+from contextvars import ContextVar, Token
+from typing import List, Optional, Tuple
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from db_mcp import metrics
+from db_mcp.config import get_int_env
+from db_mcp.logger import get_logger
+
+logger = get_logger("mcp.agent.budget")
+
+# 单次调用的耗时（秒）、LLM 调用次数、SQL 调用次数上限
+AGENT_MAX_SECONDS = get_int_env("AGENT_MAX_SECONDS", 120)
+AGENT_MAX_LLM_CALLS = get_int_env("AGENT_MAX_LLM_CALLS", 15)
+AGENT_MAX_SQL_CALLS = get_int_env("AGENT_MAX_SQL_CALLS", 10)
+# 预算用完后，留给收尾回答的时间（秒）
+AGENT_FINAL_ANSWER_GRACE = get_int_env("AGENT_FINAL_ANSWER_GRACE", 30)
+
+# 部分回答中保留的工具结果数量和每条结果的字符数
+_PARTIAL_RESULTS = 5
+_PARTIAL_RESULT_CHARS = 1000
+
+_FINAL_ANSWER_PROMPT = (
+    "本次分析的{reason}已用完，不能再调用工具。"
+    "请根据上面已经获得的查询结果和信息，直接给出尽可能完整的回答，"
+    "并说明哪些部分尚未完成、还需要进一步查询什么。"
+)
+
+
+def _is_sql_call(name: str, args: dict) -> bool:
+    """会访问 MySQL 执行 SQL 的工具调用"""
+    return name == "execute_sql_query" or (name == "analyze_data" and bool(args.get("sql")))
+
+
+class AgentBudget:
+    """单次 Agent 调用的预算和已完成的工具结果"""
+
+    def __init__(
+        self,
+        max_seconds: int = AGENT_MAX_SECONDS,
+        max_llm_calls: int = AGENT_MAX_LLM_CALLS,
+        max_sql_calls: int = AGENT_MAX_SQL_CALLS,
+    ):
+        self.max_seconds = max_seconds
+        self.max_llm_calls = max_llm_calls
+        self.max_sql_calls = max_sql_calls
+        self.started_at = time.monotonic()
+        self.llm_calls = 0
+        self.sql_calls = 0
+        # 第一个用完的预算（time / llm / sql），None 表示未用完
+        self.exhausted: Optional[str] = None
+        # (工具名, 结果) 按完成顺序
+        self.results: List[Tuple[str, str]] = []
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def hard_timeout(self) -> float:
+        """整体超时（秒）：耗时预算加收尾时间"""
+        return self.max_seconds + AGENT_FINAL_ANSWER_GRACE
+
+    def mark_exhausted(self, kind: str):
+        """记录预算用完（只记录第一次）"""
+        if self.exhausted is None:
+            self.exhausted = kind
+            metrics.increment("agent_budget_exhausted", kind=kind)
+            logger.warning(
+                f"Agent 预算用完: {kind}",
+                extra={
+                    "elapsed": round(self.elapsed, 1),
+                    "llm_calls": self.llm_calls,
+                    "sql_calls": self.sql_calls,
+                }
+            )
+
+    def check(self) -> Optional[str]:
+        """检查耗时和 LLM 调用次数，返回已用完的预算（未用完时为 None）"""
+        if self.exhausted is None:
+            if self.elapsed >= self.max_seconds:
+                self.mark_exhausted("time")
+            elif self.llm_calls >= self.max_llm_calls:
+                self.mark_exhausted("llm")
+        return self.exhausted
+
+    def reason(self) -> str:
+        return {
+            "time": f"时间预算（{self.max_seconds} 秒）",
+            "llm": f"模型调用次数（{self.max_llm_calls} 次）",
+            "sql": f"SQL 查询次数（{self.max_sql_calls} 次）",
+        }.get(self.exhausted or "", "预算")
+
+    def partial_answer(self) -> str:
+        """收尾调用也无法完成时，用已完成的工具结果拼出部分回答"""
+        self.mark_exhausted("time")
+        lines = [f"分析未完成：{self.reason()}已用完。"]
+        if not self.results:
+            lines.append("尚未获得任何查询结果，请缩小问题范围后重试。")
+            return "\n".join(lines)
+
+        lines.append("以下是已经获得的结果：")
+        for name, content in self.results[-_PARTIAL_RESULTS:]:
+            if len(content) > _PARTIAL_RESULT_CHARS:
+                content = content[:_PARTIAL_RESULT_CHARS] + "..."
+            lines.append(f"\n[{name}]\n{content}")
+        return "\n".join(lines)
+
+
+_budget: ContextVar[Optional[AgentBudget]] = ContextVar("agent_budget", default=None)
+
+
+def bind_budget(budget: AgentBudget) -> Token:
+    """绑定当前调用的预算（Agent 内部的子任务继承同一个对象）"""
+    return _budget.set(budget)
+
+
+def reset_budget(token: Token):
+    _budget.reset(token)
+
+
+def get_budget() -> Optional[AgentBudget]:
+    """当前调用的预算（未绑定时为 None，不做限制）"""
+    return _budget.get()
+
+
+class BudgetMiddleware(AgentMiddleware):
+    """在 Agent 循环内执行 AgentBudget 的检查（未绑定预算时不做任何事）"""
+
+    async def awrap_model_call(self, request, handler):
+        budget = get_budget()
+        if budget is None:
+            return await handler(request)
+
+        if budget.check() is None:
+            budget.llm_calls += 1
+            return await handler(request)
+
+        # 预算已用完：不提供工具，要求模型根据已有结果收尾
+        prompt = _FINAL_ANSWER_PROMPT.format(reason=budget.reason())
+        request = request.override(
+            tools=[],
+            messages=[*request.messages, HumanMessage(content=prompt)],
+        )
+        remaining = max(budget.hard_timeout - budget.elapsed, 1)
+        try:
+            return await asyncio.wait_for(handler(request), remaining)
+        except asyncio.TimeoutError:
+            return AIMessage(content=budget.partial_answer())
+
+    async def awrap_tool_call(self, request, handler):
+        budget = get_budget()
+        if budget is None:
+            return await handler(request)
+
+        call = request.tool_call
+        name = call["name"]
+        if _is_sql_call(name, call.get("args") or {}):
+            if budget.sql_calls >= budget.max_sql_calls:
+                budget.mark_exhausted("sql")
+            else:
+                budget.sql_calls += 1
+
+        # 只检查耗时（最后一次允许的 LLM 调用发起的工具仍然执行）
+        if budget.exhausted is None and budget.elapsed >= budget.max_seconds:
+            budget.mark_exhausted("time")
+        if budget.exhausted is not None:
+            return ToolMessage(
+                content=f"{budget.reason()}已用完，未执行该工具，请根据已有结果回答",
+                tool_call_id=call["id"],
+                name=name,
+            )
+
+        result = await handler(request)
+        content = getattr(result, "content", None)
+        if isinstance(content, str) and content:
+            budget.results.append((name, content))
+        return result
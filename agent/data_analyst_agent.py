@@ -4,6 +4,7 @@
 """
 
 import os
+import asyncio
 import operator
 from typing import Annotated, List, Tuple, Union
 from typing_extensions import TypedDict
@@ -18,7 +19,28 @@ from langchain.agents import create_agent
 load_dotenv()
 
 # 导入工具
-from tools import execute_sql_query, search_knowledge_graph, get_table_schema
+from tools import (
+    execute_sql_query,
+    search_knowledge_graph,
+    get_table_schema,
+    search_metadata,
+    search_historical_queries,
+    suggest_join_path,
+    fetch_query_result,
+    analyze_data,
+    query_workspace,
+)
+from db_mcp.config import get_int_env
+from db_mcp.relevance import estimate_tokens
+
+# 同一轮（wave）内并发执行的最大步骤数
+PLAN_MAX_PARALLEL = get_int_env("PLAN_MAX_PARALLEL", 3)
+# Replanner 提示词中已完成步骤的 token 预算
+PAST_STEPS_TOKEN_BUDGET = get_int_env("PAST_STEPS_TOKEN_BUDGET", 4000)
+# 原样保留结果的最近步骤数（更早的步骤只保留结果开头）
+PAST_STEPS_KEEP_RECENT = get_int_env("PAST_STEPS_KEEP_RECENT", 2)
+# 较早步骤保留的结果字符数
+_OLD_STEP_RESULT_CHARS = 300
 
 
 # ============= 状态定义 =============
@@ -26,6 +48,7 @@ class PlanExecute(TypedDict):
     """Agent 状态"""
     input: str
     plan: List[str]
+    depends_on: List[List[int]]
     past_steps: Annotated[List[Tuple], operator.add]
     response: str
 
@@ -36,6 +59,10 @@ class Plan(BaseModel):
     steps: List[str] = Field(
         description="要执行的步骤列表，按顺序排列"
     )
+    depends_on: List[List[int]] = Field(
+        default_factory=list,
+        description="每个步骤依赖的步骤编号（从 1 开始），与 steps 一一对应；空列表表示不依赖其他步骤，可与其他无依赖步骤并行执行"
+    )
 
 
 class Response(BaseModel):
@@ -82,11 +109,32 @@ planner_prompt = ChatPromptTemplate.from_messages([
    - 支持 SELECT 查询
    - 自动添加 LIMIT 保护
 
+4. **search_metadata** - 搜索本地元数据（毫秒级）
+   - 按业务描述查找表、字段含义
+   - 查找 Redash 历史查询
+
+5. **search_historical_queries** - 按候选表 / 关键词查找历史 SQL
+   - 返回已在报表中使用过的 SQL，可直接参考写法
+
+6. **suggest_join_path** - 多张表之间的关联路径
+   - 返回历史 SQL 中使用过的 JOIN 条件
+
+7. **fetch_query_result** - 分页读取 execute_sql_query 保存的完整结果
+   - 结果较大时 execute_sql_query 只返回前几行、列统计和 result_id
+
+8. **analyze_data** - 查询结果的统计分析（服务端计算）
+   - 列分布、分组聚合、时间趋势和异常值，传入 result_id 或 sql
+
+9. **query_workspace** - 在本会话之前的查询结果上执行本地 SQL（SQLite 语法）
+   - execute_sql_query 的结果保存为 r1、r2 ...，追问时优先在本地筛选、聚合
+
 ## 规划原则
 1. 在生成 SQL 前，**务必**先使用 get_table_schema 确认表名和字段
-2. 对于复杂业务逻辑，使用 search_knowledge_graph 参考历史查询
+2. 对于复杂业务逻辑，先用 search_metadata 查找相关表和历史查询，必要时再用 search_knowledge_graph
 3. 复杂查询应该分步骤验证
 4. 每个步骤应该清晰、具体、可执行
+5. 用 depends_on 标出每个步骤依赖哪些步骤的结果；互不依赖的步骤（如分别查看几张表的结构、
+   查找历史查询）会并行执行，能并行的不要串成依赖
 
 ## 示例步骤
 - "使用 get_table_schema 获取所有表列表，找到与放款相关的表"
@@ -95,11 +143,12 @@ planner_prompt = ChatPromptTemplate.from_messages([
 - "执行 SQL: SELECT COUNT(*) FROM orders WHERE date = '2024-01-01'"
 
 ## 重要：输出格式
-你必须返回一个 JSON 对象，包含 steps 数组，每个元素是一个步骤的文字描述。
+你必须返回一个 JSON 对象，包含 steps 数组（每个元素是一个步骤的文字描述）
+和 depends_on 数组（每个元素是对应步骤依赖的步骤编号列表）。
 注意：steps 是字符串数组，不是工具调用！
 
 正确示例：
-{{"steps": ["使用 get_table_schema 获取所有表列表", "根据表名查询相关数据"]}}
+{{"steps": ["使用 get_table_schema('orders') 查看字段", "使用 get_table_schema('users') 查看字段", "关联两张表查询数据"], "depends_on": [[], [], [1, 2]]}}
 
 错误示例（不要这样）：
 {{"tool": "get_table_schema", "args": []}}
@@ -123,7 +172,8 @@ replanner_prompt = ChatPromptTemplate.from_template("""你是一个数据分析
 ## 输出格式
 请以 JSON 格式返回，二选一：
 - 结束任务：{{"action": {{"response": "最终回答内容"}}}}
-- 继续执行：{{"action": {{"steps": ["步骤1", "步骤2", ...]}}}}
+- 继续执行：{{"action": {{"steps": ["步骤1", "步骤2", ...], "depends_on": [[], [1], ...]}}}}
+  （depends_on 为每个步骤依赖的步骤编号，互不依赖的步骤会并行执行）
 """)
 
 
@@ -164,7 +214,17 @@ def get_agent_executor():
             model=os.getenv("LLM_MODEL"),
             api_key=os.getenv("LLM_API_KEY"),
             base_url=os.getenv("LLM_BASE_URL"),
-            tools=[execute_sql_query, search_knowledge_graph, get_table_schema]
+            tools=[
+                execute_sql_query,
+                search_knowledge_graph,
+                get_table_schema,
+                search_metadata,
+                search_historical_queries,
+                suggest_join_path,
+                fetch_query_result,
+                analyze_data,
+                query_workspace,
+            ]
         )
     return _agent_executor
 
@@ -173,39 +233,133 @@ def get_agent_executor():
 async def plan_step(state: PlanExecute):
     """规划步骤"""
     plan = await get_planner().ainvoke({"messages": [("user", state["input"])]})
-    return {"plan": plan.steps}
+    return {"plan": plan.steps, "depends_on": plan.depends_on}
 
 
-async def execute_step(state: PlanExecute):
-    """执行步骤"""
-    plan = state["plan"]
-    plan_str = "\n".join(f"{i+1}. {step}" for i, step in enumerate(plan))
-    task = plan[0]
-    
-    task_formatted = f"""根据以下计划执行第一步:
+def next_wave(plan: List[str], depends_on: List[List[int]]) -> List[int]:
+    """
+    本轮可以并发执行的步骤下标
+
+    第一步总是执行；其后不依赖计划中任何步骤的步骤一起执行，最多 PLAN_MAX_PARALLEL 个。
+    没有依赖信息的步骤视为依赖前面的步骤（与原来逐步执行一致）。
+    """
+    wave = [0]
+    for i in range(1, len(plan)):
+        if len(wave) >= PLAN_MAX_PARALLEL:
+            break
+        deps = depends_on[i] if i < len(depends_on) else None
+        if deps is not None and not any(1 <= d <= len(plan) for d in deps):
+            wave.append(i)
+    return wave
+
+
+async def _run_task(plan_str: str, task: str) -> str:
+    """用 Agent 执行单个步骤，失败时返回错误信息交给 Replanner 处理"""
+    task_formatted = f"""根据以下计划执行其中一步:
 {plan_str}
 
 当前任务: {task}
 
 请使用可用工具完成这个任务。"""
-    
-    agent_response = await get_agent_executor().ainvoke(
-        {"messages": [("user", task_formatted)]}
-    )
-    
+    try:
+        agent_response = await get_agent_executor().ainvoke(
+            {"messages": [("user", task_formatted)]}
+        )
+    except Exception as e:
+        return f"执行失败: {e}"
+    return agent_response["messages"][-1].content
+
+
+async def execute_step(state: PlanExecute):
+    """执行步骤：本轮互不依赖的步骤并发执行，整轮结束后再重规划"""
+    plan = state["plan"]
+    plan_str = "\n".join(f"{i+1}. {step}" for i, step in enumerate(plan))
+    tasks = [plan[i] for i in next_wave(plan, state.get("depends_on") or [])]
+
+    results = await asyncio.gather(*(_run_task(plan_str, task) for task in tasks))
+
     return {
-        "past_steps": [(task, agent_response["messages"][-1].content)],
+        "past_steps": list(zip(tasks, results)),
     }
 
 
+def _truncate(text: str, max_tokens: int) -> str:
+    """按估算 token 数截断文本"""
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    keep = max(int(len(text) * max_tokens / tokens), 0)
+    return text[:keep] + f"...（已截断，原文约 {tokens} tokens）"
+
+
+def compact_past_steps(
+    past_steps: List[Tuple],
+    token_budget: int = PAST_STEPS_TOKEN_BUDGET,
+    keep_recent: int = PAST_STEPS_KEEP_RECENT
+) -> str:
+    """
+    压缩已完成步骤，供 Replanner 提示词使用
+
+    past_steps 在状态中完整累积，但原始工具输出可能是上万行的 JSON，
+    每轮全部放进提示词会让 Replanner 越来越慢。这里：
+    - 最近 keep_recent 步保留完整结果（每步最多占预算的 1/(keep_recent+1)，超出时截断）
+    - 更早的步骤只保留结果开头
+    - 从最新往前填充 token 预算，放不下的更早步骤只保留任务描述，仍放不下则只给出数量
+
+    Args:
+        past_steps: [(任务, 结果)]
+        token_budget: token 预算
+        keep_recent: 保留完整结果的最近步骤数
+
+    Returns:
+        按执行顺序排列的已完成步骤文本
+    """
+    total = len(past_steps)
+    remaining = token_budget
+    recent_cap = token_budget // (keep_recent + 1)
+    blocks: List[str] = []
+    omitted = 0
+
+    for i in range(total - 1, -1, -1):
+        task, result = past_steps[i][0], str(past_steps[i][1])
+        if i < total - keep_recent:
+            result = result[:_OLD_STEP_RESULT_CHARS] + ("..." if len(result) > _OLD_STEP_RESULT_CHARS else "")
+        else:
+            result = _truncate(result, recent_cap)
+        header = f"{i + 1}. {task}"
+        block = f"{header}\n   结果: {result}"
+        cost = estimate_tokens(block)
+        if cost > remaining:
+            # 放不下完整结果：最近的步骤截断结果，其余只保留任务描述
+            header_cost = estimate_tokens(header) + 10
+            if i >= total - keep_recent and remaining > header_cost * 2:
+                block = f"{header}\n   结果: {_truncate(result, remaining - header_cost)}"
+            elif header_cost <= remaining:
+                block = f"{header}（结果已省略）"
+            else:
+                omitted = i + 1
+                break
+            cost = estimate_tokens(block)
+        blocks.append(block)
+        remaining -= cost
+
+    blocks.reverse()
+    if omitted:
+        blocks.insert(0, f"（省略了更早的 {omitted} 个步骤）")
+    return "\n".join(blocks)
+
+
 async def replan_step(state: PlanExecute):
-    """重新规划"""
-    output = await get_replanner().ainvoke(state)
+    """重新规划（已完成步骤压缩到 token 预算内）"""
+    output = await get_replanner().ainvoke({
+        **state,
+        "past_steps": compact_past_steps(state.get("past_steps") or []),
+    })
     
     if isinstance(output.action, Response):
         return {"response": output.action.response}
     else:
-        return {"plan": output.action.steps}
+        return {"plan": output.action.steps, "depends_on": output.action.depends_on}
 
 
 def should_end(state: PlanExecute):
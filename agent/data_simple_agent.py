@@ -3,13 +3,14 @@
 基于 LangChain Agent 实现
 
 该模块实现了一个数据分析 Agent，能够理解自然语言查询需求，
-并调用三个内部工具（execute_sql_query、get_table_schema、search_knowledge_graph）
+并调用内部工具（execute_sql_query、get_table_schema、search_metadata、
+search_historical_queries、suggest_join_path、search_knowledge_graph）
 完成数据查询和分析任务。
 
 Agent 工作流程：
 1. 理解用户问题
 2. 如有需要，先用 get_table_schema 了解表结构
-3. 用 search_knowledge_graph 查找相关业务知识
+3. 用 search_metadata 查找相关表、字段和历史查询（必要时再用 search_knowledge_graph）
 4. 生成并执行 SQL 查询
 5. 整理结果回答用户
 
@@ -29,11 +30,23 @@ Agent 工作流程：
 """
 
 from langchain.agents import create_agent
-from tools import execute_sql_query, search_knowledge_graph, get_table_schema
+from tools import (
+    execute_sql_query,
+    search_knowledge_graph,
+    get_table_schema,
+    search_metadata,
+    search_historical_queries,
+    suggest_join_path,
+    fetch_query_result,
+    analyze_data,
+    query_workspace,
+)
 from dotenv import load_dotenv
 import os
 from langchain_openai import ChatOpenAI
 
+from agent.budget import BudgetMiddleware
+
 # 加载环境变量
 load_dotenv()
 
@@ -47,19 +60,32 @@ SYSTEM_PROMPT = """你是一个专业的数据分析智能体。
 ## 调用工具
 1. **execute_sql_query** - 执行 SQL 查询（仅支持 SELECT）
 2. **get_table_schema** - 获取数据库表结构
-3. **search_knowledge_graph** - 搜索知识图谱（业务逻辑、历史 SQL）
+3. **search_metadata** - 搜索本地元数据（表、字段含义、历史 Redash 查询），毫秒级返回
+4. **search_historical_queries** - 按候选表 / 关键词查找 Redash 历史 SQL，毫秒级返回
+5. **suggest_join_path** - 给出多张表之间的关联路径和 JOIN 子句（来自历史 SQL）
+6. **search_knowledge_graph** - 搜索知识图谱（业务逻辑、历史 SQL），较慢
+7. **fetch_query_result** - 分页读取 execute_sql_query 保存的完整结果（result_id）
+8. **analyze_data** - 在服务端统计查询结果（列分布、分组聚合、时间趋势、异常值），传入 result_id 或 sql
+9. **query_workspace** - 在本会话之前的查询结果（r1、r2 ...）上执行本地 SQL，毫秒级
 
 ## 工作流程
 1. 理解用户问题
 2. 如有需要，先用 get_table_schema 了解表结构
-3. 用 search_knowledge_graph 查找相关业务知识
-4. 生成并执行 SQL 查询
+3. 用 search_metadata 查找相关表、字段和历史查询，仍不清楚时再用 search_knowledge_graph
+4. 确定候选表后用 search_historical_queries 参考历史写法，再生成并执行 SQL 查询
 5. 整理结果回答用户
 
 ## 重要提示
-- 调用 execute_sql_query 和 get_table_schema 时，必须使用 system 消息中提供的数据库连接参数
-- search_knowledge_graph 不需要数据库连接
+- execute_sql_query 和 get_table_schema 自动连接当前会话的数据库，不需要也不能传入连接参数
+- search_metadata、search_historical_queries、suggest_join_path 和 search_knowledge_graph 不需要数据库连接
+- 涉及多张表时，先用 suggest_join_path 获取关联条件，不要猜测关联字段
+- 需要多张表的结构时，给 get_table_schema 一次传入表名列表，不要逐个调用
+- 查找相关表时，给 get_table_schema 传入 question（用户问题），只返回最相关的表和字段
+- 表很多时，get_table_schema 无参调用返回业务域分组概览，再传入 domain / granularity 查看组内表
 - SQL 查询默认限制 100 行，如需更多数据请添加 LIMIT 子句
+- 结果较大时 execute_sql_query 只返回前几行、列统计和 result_id，需要更多行时用 fetch_query_result 分页读取，不要重复执行 SQL
+- 需要统计、趋势或异常时用 analyze_data，不要逐行阅读数据自己计算
+- 追问（按某维度拆分、缩小时间范围等）时，如果之前的结果（workspace_table）已包含所需数据，用 query_workspace 在本地计算，不要重新查询 MySQL
 
 请用清晰、专业的方式回答用户的数据分析问题。
 """
@@ -105,14 +131,22 @@ def get_agent():
         tools = [
             execute_sql_query,
             search_knowledge_graph,
-            get_table_schema
+            get_table_schema,
+            search_metadata,
+            search_historical_queries,
+            suggest_join_path,
+            fetch_query_result,
+            analyze_data,
+            query_workspace
         ]
 
         # 创建 Agent
         _agent = create_agent(
             model=model,
             tools=tools,
-            system_prompt=SYSTEM_PROMPT
+            system_prompt=SYSTEM_PROMPT,
+            # 绑定了 AgentBudget 时限制耗时、LLM 和 SQL 调用次数（见 agent/budget.py）
+            middleware=[BudgetMiddleware()]
         )
 
     return _agent
@@ -138,14 +172,7 @@ if __name__ == "__main__":
         {"messages": [
             {
                 "role": "system",
-                "content": """数据库配置：
-- host: localhost
-- port: 3306
-- username: root
-- password:
-- database: test
-
-调用 execute_sql_query 和 get_table_schema 时必须传入这些参数。"""
+                "content": "当前数据库: test"
             },
             {"role": "user", "content": "还款率是如何计算的"}
         ]}
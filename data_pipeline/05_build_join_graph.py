@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+构建表关联图：解析 redash_queries.json 中的 SQL，提取等值关联条件（a.col = b.col），
+按出现次数写入 metadata/join_graph.json，供 MCP 服务的 suggest_join_path 工具使用
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+# 复用 MCP 服务中的解析逻辑
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from db_mcp.join_graph import build_join_graph  # noqa: E402
+
+# 配置
+REDASH_QUERIES_FILE = Path(__file__).parent.parent / "metadata" / "redash_queries.json"
+OUTPUT_FILE = Path(__file__).parent.parent / "metadata" / "join_graph.json"
+
+
+def main():
+    if not REDASH_QUERIES_FILE.exists():
+        print(f"❌ 未找到 {REDASH_QUERIES_FILE}，请先运行 03_get_redash_query.py")
+        return
+
+    with open(REDASH_QUERIES_FILE, 'r', encoding='utf-8') as f:
+        queries = json.load(f).get('queries', [])
+
+    print(f"📝 正在解析 {len(queries)} 个查询的关联条件...")
+    start_time = time.time()
+    graph = build_join_graph(queries)
+    edges = graph.edges()
+
+    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
+        json.dump(graph.to_payload(), f, ensure_ascii=False, indent=2)
+
+    print(f"\n✅ 处理完成！耗时 {time.time() - start_time:.1f} 秒")
+    print(f"共 {len(graph)} 个表，{len(edges)} 条关联")
+    for edge in sorted(edges, key=lambda e: -e.count)[:10]:
+        print(f"   {edge.left_table}.{edge.left_column} = {edge.right_table}.{edge.right_column}  ({edge.count} 次)")
+    print(f"数据已保存至: {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+构建表热度索引：统计 redash_queries.json 中每张表被多少查询、多少仪表板使用以及最近使用时间，
+写入 metadata/table_popularity.json，供 MCP 服务排序表摘要、模糊匹配和元数据搜索结果
+"""
+
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# 复用 MCP 服务中的统计逻辑
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from db_mcp.popularity import compute_table_popularity  # noqa: E402
+
+# 配置
+REDASH_QUERIES_FILE = Path(__file__).parent.parent / "metadata" / "redash_queries.json"
+OUTPUT_FILE = Path(__file__).parent.parent / "metadata" / "table_popularity.json"
+
+
+def main():
+    if not REDASH_QUERIES_FILE.exists():
+        print(f"❌ 未找到 {REDASH_QUERIES_FILE}，请先运行 03_get_redash_query.py")
+        return
+
+    with open(REDASH_QUERIES_FILE, 'r', encoding='utf-8') as f:
+        queries = json.load(f).get('queries', [])
+
+    print(f"📝 正在统计 {len(queries)} 个查询的表使用情况...")
+    start_time = time.time()
+    tables = compute_table_popularity(queries)
+
+    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
+        json.dump({
+            "generated_at": datetime.now().isoformat(),
+            "total_queries": len(queries),
+            "tables": tables,
+        }, f, ensure_ascii=False, indent=2)
+
+    print(f"\n✅ 处理完成！耗时 {time.time() - start_time:.1f} 秒")
+    print(f"共 {len(tables)} 个表")
+    for name, info in sorted(tables.items(), key=lambda x: -x[1]["score"])[:10]:
+        print(f"   {name}: {info['query_count']} 个查询, {info['dashboard_count']} 个仪表板, 热度 {info['score']:.2f}")
+    print(f"数据已保存至: {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    main()
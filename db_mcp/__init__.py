@@ -8,23 +8,32 @@ DB MCP Server 模块
     uvicorn db_mcp.server:app ...   # 或 uvicorn 启动
 """
 
-from .server import mcp, start_server, app, get_current_db_config, get_current_db_key
-
-from .connection_pool import (
-    get_engine,
-    get_pool,
-    get_session,
-    execute_query,
-    execute_query_many,
-    close_pool,
-    close_all_pools,
-    get_pool_stats,
-    get_pool_stats_async,
-    get_pool_info,
-    test_connection,
-    AsyncDBConnection,
-    AsyncDBSession,
-)
+from importlib import import_module
+
+# 导出名称 -> 所在子模块。按需导入：server 模块导入时会创建 FastMCP 应用、注册工具并初始化日志，
+# 只用到 db_mcp.join_graph / db_mcp.popularity 等子模块的离线脚本（data_pipeline/）不应触发
+_EXPORTS = {
+    **{name: ".server" for name in (
+        "mcp", "start_server", "app", "get_current_db_config", "get_current_db_key",
+    )},
+    **{name: ".connection_pool" for name in (
+        "get_engine", "get_pool", "get_session",
+        "execute_query", "execute_query_many",
+        "close_pool", "close_all_pools",
+        "get_pool_stats", "get_pool_stats_async", "get_pool_info",
+        "test_connection", "AsyncDBConnection", "AsyncDBSession",
+    )},
+}
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
 
 __all__ = [
     "mcp", "start_server", "app",
@@ -0,0 +1,27 @@
+"""
+环境变量配置读取
+
+各模块在导入时读取自己的配置项，格式错误时使用默认值，不阻止服务启动。
+导入本模块时加载 .env，保证读取配置前环境变量已就绪。
+
+使用示例：
+    from db_mcp.config import get_int_env
+
+    DB_POOL_SIZE = get_int_env("DB_POOL_SIZE", 5)
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+
+def get_int_env(key: str, default: int) -> int:
+    """从环境变量读取整数配置（未设置或不是整数时返回默认值）"""
+    try:
+        value = os.getenv(key, str(default))
+        return int(value)
+    except (ValueError, TypeError):
+        return default
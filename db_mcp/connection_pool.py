@@ -28,7 +28,6 @@
 """
 
 import asyncio
-import os
 import time
 from typing import Dict, Any, List, Optional, Tuple
 from urllib.parse import quote_plus
@@ -45,6 +44,7 @@ from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from dotenv import load_dotenv
 
+from .config import get_int_env
 from .logger import get_logger
 
 # 加载环境变量
@@ -66,20 +66,12 @@ _pools_lock = asyncio.Lock()
 # 配置（从环境变量读取）
 # ============================================================================
 
-def _get_int_env(key: str, default: int) -> int:
-    """从环境变量读取整数配置"""
-    try:
-        value = os.getenv(key, str(default))
-        return int(value)
-    except (ValueError, TypeError):
-        return default
-
 # 连接池配置
-DEFAULT_POOL_SIZE = _get_int_env("DB_POOL_SIZE", 5)
-DEFAULT_MAX_OVERFLOW = _get_int_env("DB_MAX_OVERFLOW", 10)
-DEFAULT_POOL_TIMEOUT = _get_int_env("DB_POOL_TIMEOUT", 30)
-DEFAULT_POOL_RECYCLE = _get_int_env("DB_POOL_RECYCLE", 3600)
-DB_POOL_MAX_SIZE = _get_int_env("DB_POOL_MAX_SIZE", 50)  # 最大连接池数量限制
+DEFAULT_POOL_SIZE = get_int_env("DB_POOL_SIZE", 5)
+DEFAULT_MAX_OVERFLOW = get_int_env("DB_MAX_OVERFLOW", 10)
+DEFAULT_POOL_TIMEOUT = get_int_env("DB_POOL_TIMEOUT", 30)
+DEFAULT_POOL_RECYCLE = get_int_env("DB_POOL_RECYCLE", 3600)
+DB_POOL_MAX_SIZE = get_int_env("DB_POOL_MAX_SIZE", 50)  # 最大连接池数量限制
 
 # ============================================================================
 # 辅助函数
@@ -0,0 +1,125 @@
+"""
+请求级数据库上下文
+
+SSE 模式下，每个 MCP 会话的消息循环运行在建立连接的 `GET /sse?db=xxx` 请求任务中，
+会话内的工具调用是该任务的子任务，会继承其 contextvars。中间件在处理 /sse 请求时
+把数据库标识符和连接配置写入 ContextVar，工具调用读取到的就是自己会话的配置，
+同一个 worker 上的多个会话互不覆盖（替代原来的模块级全局变量）。
+
+工具通过 resolve_connection() 取得连接参数，模型无需在每次调用中传入主机、密码等；
+会话已绑定配置时，调用方传入的连接参数一律忽略。
+
+使用示例：
+    from db_mcp.context import bind_db_context, reset_db_context, get_current_db_config
+
+    token = bind_db_context("singa", config)
+    try:
+        ...
+    finally:
+        reset_db_context(token)
+"""
+
+import uuid
+from contextvars import ContextVar, Token
+from typing import Any, Dict, NamedTuple, Optional
+
+from .logger import get_logger
+
+logger = get_logger("mcp.context")
+
+
+class DBContext(NamedTuple):
+    """当前会话的数据库上下文"""
+    db_key: str
+    config: Dict[str, Any]
+    # 每次绑定（即每个 /sse 连接）唯一，用于会话级状态（如结果工作区）
+    session_id: str = "default"
+
+
+_DEFAULT_CONTEXT = DBContext("default", {})
+
+_db_context: ContextVar[DBContext] = ContextVar("db_context", default=_DEFAULT_CONTEXT)
+
+
+def bind_db_context(db_key: str, config: Optional[Dict[str, Any]] = None) -> Token:
+    """
+    绑定当前任务（及其之后创建的子任务）的数据库上下文
+
+    Args:
+        db_key: 数据库标识符（URL 中的 ?db=）
+        config: 连接配置 {host, port, username, password, database}，未找到映射时为空
+
+    Returns:
+        用于 reset_db_context 的 Token
+    """
+    return _db_context.set(DBContext(db_key, dict(config or {}), uuid.uuid4().hex))
+
+
+def reset_db_context(token: Token):
+    """恢复绑定前的数据库上下文"""
+    _db_context.reset(token)
+
+
+def get_db_context() -> DBContext:
+    """当前会话的数据库上下文（未绑定时为 default / 空配置）"""
+    return _db_context.get()
+
+
+def get_current_db_config() -> Dict[str, Any]:
+    """当前会话的数据库连接配置"""
+    return _db_context.get().config
+
+
+def get_current_db_key() -> str:
+    """当前会话的数据库标识符"""
+    return _db_context.get().db_key
+
+
+def get_current_session_id() -> str:
+    """当前会话的唯一标识（未绑定时为 default）"""
+    return _db_context.get().session_id
+
+
+def resolve_connection(
+    host: Optional[str] = None,
+    port: Optional[int] = None,
+    username: Optional[str] = None,
+    password: Optional[str] = None,
+    database: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    工具使用的数据库连接参数
+
+    当前会话绑定了数据库配置时只使用会话配置，忽略调用方传入的参数：
+    InjectedToolArg 只是把连接参数从模型可见的 schema 中隐藏，模型在工具调用中
+    仍然可以传入 host 等参数。如果使用传入的 host 加会话中保存的密码，被提示注入的
+    Agent 就能把真实凭据发送到任意主机。
+
+    未绑定会话配置（直接调用工具、离线脚本）时才使用传入的参数，此时不存在可泄露的凭据。
+
+    Returns:
+        {host, port, username, password, database}
+    """
+    config = _db_context.get().config
+    if config.get("host"):
+        overrides = {
+            "host": host, "port": port, "username": username,
+            "password": password, "database": database,
+        }
+        ignored = sorted(k for k, v in overrides.items() if v is not None)
+        if ignored:
+            logger.warning(f"已绑定会话数据库配置，忽略传入的连接参数: {', '.join(ignored)}")
+        return {
+            "host": config["host"],
+            "port": config.get("port") or 3306,
+            "username": config.get("username") or "root",
+            "password": config.get("password") or "",
+            "database": config.get("database") or "information_schema",
+        }
+    return {
+        "host": host or "",
+        "port": port or 3306,
+        "username": username or "root",
+        "password": password or "",
+        "database": database or "information_schema",
+    }
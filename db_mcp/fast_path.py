@@ -0,0 +1,217 @@
+"""
+data_agent 快速路径
+
+客户端经常直接发送一条 SELECT 语句，或者 "显示 users 表的结构" 这类请求，
+这些请求不需要 LLM 理解：用确定性规则识别后直接调用对应工具，
+毫秒级返回，不进入 Agent 循环。
+
+- 原始 SQL：以 SELECT / WITH 开头、通过 validate_sql 校验，且 sqlglot 能解析为
+  SELECT / UNION 语句（可带 ```sql 代码块）；"Select the top users by revenue" 这类自然语言不会命中
+- 表结构请求：整句只包含表名和 "表结构 / schema / describe" 等意图词，
+  且表名能在当前数据库中解析（快照或表名索引）
+
+执行失败（如 SQL 语法错误、连接错误、表不存在）时返回 None，由调用方回退到 Agent，
+Agent 可以根据错误修正 SQL 或向用户解释（"describe churn" 这类请求可能是在问业务概念而不是表）。
+
+使用示例：
+    from db_mcp.fast_path import route_query, run_fast_path
+
+    route = route_query("SELECT COUNT(*) FROM users")   # ("sql", "SELECT COUNT(*) FROM users")
+    reply = await run_fast_path(route)                  # None 表示需要回退到 Agent
+"""
+
+import json
+import os
+import re
+import time
+from typing import Optional, Tuple
+
+from . import metrics
+from .connection_pool import get_engine
+from .context import resolve_connection
+from .logger import get_logger
+from .schema_snapshot import get_snapshot
+from .sql_validator import validate_sql, is_select_query
+from .table_index import make_index_key, resolve_table_name
+
+logger = get_logger("mcp.fast_path")
+
+# 是否启用快速路径（默认启用）
+DATA_AGENT_FAST_PATH = os.getenv("DATA_AGENT_FAST_PATH", "true").lower() == "true"
+
+# Markdown 代码块：```sql ... ```
+_CODE_BLOCK = re.compile(r"^```[a-zA-Z]*\s*\n?(?P<body>.*?)\n?```$", re.DOTALL)
+
+# 表名（允许 库名.表名 和反引号）
+_TABLE = r"`?(?P<table>[A-Za-z_][A-Za-z0-9_$]*(?:\.[A-Za-z_][A-Za-z0-9_$]*)?)`?"
+
+# 表结构意图：整句匹配，带其他分析要求（如 "并统计每个字段的空值率"）的请求不会命中
+_SCHEMA_PATTERNS = [
+    re.compile(p, re.IGNORECASE) for p in (
+        # 显示 users 表的结构 / users 表结构 / 查看 users 的字段
+        rf"^(?:请)?(?:显示|查看|看看|看一下|给我看|获取|查询|列出)?(?:一下)?\s*{_TABLE}\s*(?:表)?\s*的?\s*"
+        r"(?:表结构|结构|字段|字段信息|所有字段|列|schema|ddl)$",
+        # 表结构 users / users 表有哪些字段
+        rf"^(?:表结构|查看表结构|显示表结构)\s*[:：]?\s*{_TABLE}$",
+        rf"^{_TABLE}\s*表?\s*(?:有哪些|有什么|包含哪些)(?:字段|列)$",
+        # describe users / desc users / show columns from users / show create table users
+        rf"^(?:describe|desc)\s+(?:table\s+)?{_TABLE}$",
+        rf"^show\s+(?:full\s+)?(?:columns|fields)\s+(?:from|in)\s+{_TABLE}$",
+        rf"^show\s+create\s+table\s+{_TABLE}$",
+        # show me the structure of users / schema for table users / columns of users
+        r"^(?:(?:show|get|give|display|what(?:'s| is| are))\s+)?(?:me\s+)?(?:the\s+)?"
+        rf"(?:table\s+)?(?:structure|schema|columns|fields|definition)\s+(?:of|for)\s+(?:the\s+)?(?:table\s+)?{_TABLE}"
+        r"(?:\s+table)?$",
+        # show users table structure / users schema
+        rf"^(?:(?:show|get|display|describe)\s+)?(?:me\s+)?(?:the\s+)?{_TABLE}\s+(?:table\s+)?(?:structure|schema|columns)$",
+    )
+]
+
+# 句尾标点（匹配前去除）
+_TRAILING_PUNCTUATION = " \t\n。.？?！!；;"
+
+
+def _parses_as_select(sql: str) -> bool:
+    """sqlglot 能按 MySQL 方言解析为 SELECT / WITH ... SELECT / UNION 语句"""
+    import sqlglot
+    from sqlglot import exp
+
+    try:
+        expression = sqlglot.parse_one(sql, dialect="mysql")
+    except Exception:
+        return False
+    return isinstance(expression, (exp.Select, exp.Union, exp.With))
+
+
+def _extract_sql(query: str) -> Optional[str]:
+    """请求本身是一条只读 SQL 时返回该 SQL（去除代码块和末尾分号），否则返回 None"""
+    text = query.strip()
+    block = _CODE_BLOCK.match(text)
+    if block:
+        text = block.group("body").strip()
+    text = text.rstrip().rstrip(";").rstrip()
+    if not is_select_query(text):
+        return None
+    is_valid, _ = validate_sql(text)
+    if not is_valid or not _parses_as_select(text):
+        return None
+    return text
+
+
+def _extract_schema_table(query: str) -> Optional[str]:
+    """请求是查看某张表的结构时返回表名，否则返回 None"""
+    text = query.strip().rstrip(_TRAILING_PUNCTUATION)
+    for pattern in _SCHEMA_PATTERNS:
+        match = pattern.match(text)
+        if match:
+            return match.group("table")
+    return None
+
+
+def route_query(query: str) -> Optional[Tuple[str, str]]:
+    """
+    识别可以绕过 LLM 的请求
+
+    Args:
+        query: 用户请求
+
+    Returns:
+        ("sql", SQL) / ("schema", 表名)；需要 LLM 理解的请求返回 None
+    """
+    if not DATA_AGENT_FAST_PATH or not query:
+        return None
+    sql = _extract_sql(query)
+    if sql:
+        return "sql", sql
+    table = _extract_schema_table(query)
+    if table:
+        return "schema", table
+    return None
+
+
+def _is_error_response(output: str) -> bool:
+    """工具返回的是错误 JSON（success=false）"""
+    if not output.lstrip().startswith("{"):
+        return False
+    try:
+        return json.loads(output).get("success") is False
+    except (ValueError, AttributeError):
+        return False
+
+
+def _is_table_not_found(output: str) -> bool:
+    """get_table_schema 返回的是 "表 'x' 在数据库 'y' 中不存在" 提示"""
+    first_line = output.lstrip().split("\n", 1)[0]
+    return first_line.startswith("表 '") and first_line.endswith("中不存在")
+
+
+async def _resolve_schema_table(name: str) -> Optional[str]:
+    """
+    在当前会话的数据库中解析表名（先查快照，再查实时表名索引）
+
+    Returns:
+        实际表名；表不存在或无法连接时返回 None
+    """
+    connection = resolve_connection()
+    if not connection["host"]:
+        return None
+    database = connection["database"]
+    index_key = make_index_key(
+        connection["host"], connection["port"], connection["username"], database
+    )
+
+    snapshot = get_snapshot(index_key)
+    actual = snapshot.name_index.resolve(name) if snapshot is not None else None
+    if actual:
+        return actual
+
+    # 快照中没有（或无快照）时走实时表名索引，处理快照之后新建的表
+    try:
+        engine = await get_engine(
+            host=connection["host"],
+            port=connection["port"],
+            username=connection["username"],
+            password=connection["password"],
+            database="information_schema",
+        )
+        async with engine.connect() as conn:
+            actual, _ = await resolve_table_name(conn, index_key, database, name)
+    except Exception as e:
+        logger.warning(f"快速路径解析表名失败: {e}", extra={"table": name})
+        return None
+    return actual
+
+
+async def run_fast_path(route: Tuple[str, str]) -> Optional[str]:
+    """
+    直接执行快速路径请求
+
+    Args:
+        route: route_query 的返回值
+
+    Returns:
+        工具输出；执行失败时返回 None（调用方回退到 Agent）
+    """
+    from tools import execute_sql_query, get_table_schema
+
+    kind, value = route
+    start_time = time.monotonic()
+    if kind == "sql":
+        output = await execute_sql_query.ainvoke({"sql": value})
+    else:
+        table = await _resolve_schema_table(value)
+        if table is None:
+            metrics.increment("data_agent_fast_path_fallbacks", kind=kind)
+            logger.info(f"快速路径未找到表，回退到 Agent", extra={"kind": kind, "value": value})
+            return None
+        output = await get_table_schema.ainvoke({"table_name": table})
+
+    if _is_error_response(output) or (kind == "schema" and _is_table_not_found(output)):
+        metrics.increment("data_agent_fast_path_fallbacks", kind=kind)
+        logger.info(f"快速路径执行失败，回退到 Agent", extra={"kind": kind})
+        return None
+
+    metrics.increment("data_agent_fast_path", kind=kind)
+    metrics.observe("data_agent_fast_path_seconds", time.monotonic() - start_time, kind=kind)
+    logger.info(f"快速路径完成", extra={"kind": kind, "value": value[:200]})
+    return output
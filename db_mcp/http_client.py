@@ -0,0 +1,81 @@
+"""
+共享异步 HTTP 客户端
+
+进程内共享一个保持长连接的 httpx.AsyncClient（用于 LightRAG 等外部服务），
+在服务生命周期中创建和关闭；慢请求只挂起当前协程，不阻塞事件循环上的其他会话。
+
+配置（环境变量）：
+    HTTP_CONNECT_TIMEOUT     建立连接超时（秒），默认 5
+    HTTP_READ_TIMEOUT        读取响应超时（秒），默认 120
+    HTTP_MAX_CONNECTIONS     最大并发连接数，默认 50
+    HTTP_MAX_KEEPALIVE       最大保持的空闲连接数，默认 10
+
+使用示例：
+    from db_mcp.http_client import get_http_client
+
+    client = get_http_client()
+    response = await client.post(url, json=payload)
+"""
+
+from typing import Optional
+
+import httpx
+
+from .config import get_int_env
+from .logger import get_logger
+
+logger = get_logger("mcp.http_client")
+
+HTTP_CONNECT_TIMEOUT = get_int_env("HTTP_CONNECT_TIMEOUT", 5)
+HTTP_READ_TIMEOUT = get_int_env("HTTP_READ_TIMEOUT", 120)
+HTTP_MAX_CONNECTIONS = get_int_env("HTTP_MAX_CONNECTIONS", 50)
+HTTP_MAX_KEEPALIVE = get_int_env("HTTP_MAX_KEEPALIVE", 10)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    创建共享客户端（服务启动时调用）
+
+    Returns:
+        新的 httpx.AsyncClient 实例
+    """
+    global _client
+    _client = httpx.AsyncClient(
+        timeout=httpx.Timeout(
+            connect=HTTP_CONNECT_TIMEOUT,
+            read=HTTP_READ_TIMEOUT,
+            write=HTTP_CONNECT_TIMEOUT,
+            pool=HTTP_CONNECT_TIMEOUT,
+        ),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        ),
+    )
+    logger.info(
+        "HTTP 客户端已创建",
+        extra={
+            "connect_timeout": HTTP_CONNECT_TIMEOUT,
+            "read_timeout": HTTP_READ_TIMEOUT,
+            "max_connections": HTTP_MAX_CONNECTIONS,
+        }
+    )
+    return _client
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """获取共享客户端（未在生命周期中创建时延迟创建，便于脚本直接使用工具）"""
+    if _client is None or _client.is_closed:
+        return create_http_client()
+    return _client
+
+
+async def close_http_client():
+    """关闭共享客户端（服务关闭时调用）"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        logger.info("HTTP 客户端已关闭")
@@ -0,0 +1,310 @@
+"""
+表关联图
+
+从 Redash 历史 SQL 中提取等值关联条件（`a.col = b.col`，JOIN ... ON 与 WHERE 中均可），
+按出现次数构建加权无向图，用于回答"这几张表怎么关联"：
+- 两张表：最短（跳数最少、其次历史最常用）的关联路径
+- 多张表：以第一张表为起点，逐个连接最近的表（Steiner 树的贪心近似）
+
+比元数据中 LLM 推断的 related_table 可靠：每条边都来自真实运行过的 SQL。
+
+数据来源：
+    优先加载 `<METADATA_DIR>/join_graph.json`（data_pipeline/05_build_join_graph.py 生成）；
+    不存在时从 `<METADATA_DIR>/redash_queries.json` 现场解析。
+
+使用示例：
+    from db_mcp.join_graph import get_join_graph
+
+    path = get_join_graph().find_join_path(["sgo_orders", "users"])
+"""
+
+import heapq
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .logger import get_logger
+from .metadata_store import METADATA_DIR
+from .query_history import REDASH_QUERIES_FILE, normalize_table_name
+
+logger = get_logger("mcp.join_graph")
+
+# 预先构建的关联图文件名（位于 METADATA_DIR）
+JOIN_GRAPH_FILE = "join_graph.json"
+
+
+class JoinEdge(NamedTuple):
+    """一条关联边（left_table < right_table）"""
+    left_table: str
+    left_column: str
+    right_table: str
+    right_column: str
+    count: int
+
+
+# ============================================================================
+# SQL 解析
+# ============================================================================
+
+def _clean_sql(sql: str) -> str:
+    """清理 Redash SQL 中 sqlglot 无法解析的部分（与 03_get_redash_query.py 一致）"""
+    def replace_param(match):
+        param_name = match.group(1).strip().replace(" ", "_").replace(".", "_")
+        return f"'__PARAM_{param_name}__'"
+    sql = re.sub(r"\{\{\s*([^}]+?)\s*\}\}", replace_param, sql)
+    sql = re.sub(r"#(.*)$", r"-- \1", sql, flags=re.MULTILINE)
+    sql = re.sub(r"@\w+\s*:=\s*", "", sql)
+    return sql
+
+
+def extract_join_edges(sql: str) -> List[Tuple[str, str, str, str]]:
+    """
+    提取 SQL 中跨表的等值关联条件
+
+    按作用域（每个 SELECT / 子查询）解析别名，只保留两侧都能解析到实际表、
+    且不是同一张表的 `a.col = b.col`。
+
+    Args:
+        sql: SQL 文本
+
+    Returns:
+        [(表1, 字段1, 表2, 字段2)]，表名已归一且 表1 < 表2
+    """
+    import sqlglot
+    from sqlglot import exp
+    from sqlglot.optimizer.scope import traverse_scope
+
+    if not sql or not sql.strip():
+        return []
+    try:
+        statements = sqlglot.parse(_clean_sql(sql), dialect="mysql")
+    except Exception:
+        return []
+
+    edges = []
+    for statement in statements:
+        if statement is None:
+            continue
+        try:
+            scopes = list(traverse_scope(statement))
+        except Exception:
+            continue
+
+        for scope in scopes:
+            aliases = {
+                name: normalize_table_name(source.name)
+                for name, source in scope.sources.items()
+                if isinstance(source, exp.Table) and source.name
+            }
+            if len(set(aliases.values())) < 2:
+                continue
+
+            for eq in scope.expression.find_all(exp.EQ):
+                # 子查询中的条件由子查询自己的作用域处理
+                if eq.find_ancestor(exp.Select) is not scope.expression:
+                    continue
+                left, right = eq.left, eq.right
+                if not isinstance(left, exp.Column) or not isinstance(right, exp.Column):
+                    continue
+                left_table = aliases.get(left.table)
+                right_table = aliases.get(right.table)
+                if not left_table or not right_table or left_table == right_table:
+                    continue
+                left_column = left.name.casefold()
+                right_column = right.name.casefold()
+                if (left_table, left_column) > (right_table, right_column):
+                    left_table, left_column, right_table, right_column = (
+                        right_table, right_column, left_table, left_column
+                    )
+                edges.append((left_table, left_column, right_table, right_column))
+    return edges
+
+
+# ============================================================================
+# 关联图
+# ============================================================================
+
+class JoinGraph:
+    """
+    加权无向关联图
+
+    Args:
+        edges: JoinEdge 序列（同一对表可有多组关联字段）
+    """
+
+    def __init__(self, edges: Iterable[JoinEdge]):
+        # {表: {相邻表: [JoinEdge, ...]（按次数降序）}}
+        self._adjacency: Dict[str, Dict[str, List[JoinEdge]]] = {}
+        for edge in edges:
+            for a, b in ((edge.left_table, edge.right_table), (edge.right_table, edge.left_table)):
+                self._adjacency.setdefault(a, {}).setdefault(b, []).append(edge)
+        for neighbors in self._adjacency.values():
+            for edge_list in neighbors.values():
+                edge_list.sort(key=lambda e: -e.count)
+
+    def __len__(self) -> int:
+        return len(self._adjacency)
+
+    def __contains__(self, table: str) -> bool:
+        return normalize_table_name(table) in self._adjacency
+
+    def edges(self) -> List[JoinEdge]:
+        """全部关联边"""
+        seen = []
+        for table, neighbors in self._adjacency.items():
+            for other, edge_list in neighbors.items():
+                if table < other:
+                    seen.extend(edge_list)
+        return seen
+
+    def neighbors(self, table: str, limit: int = 10) -> List[JoinEdge]:
+        """与该表直接关联的表（每个相邻表取最常用的关联字段），按次数降序"""
+        neighbors = self._adjacency.get(normalize_table_name(table), {})
+        best = [edge_list[0] for edge_list in neighbors.values()]
+        best.sort(key=lambda e: -e.count)
+        return best[:limit]
+
+    def _pair_weight(self, a: str, b: str) -> int:
+        return sum(e.count for e in self._adjacency[a][b])
+
+    def _edge_cost(self, a: str, b: str) -> float:
+        """边的代价：每跳 1，历史使用次数越多越便宜（跳数优先，次数其次）"""
+        return 1.0 + 1.0 / self._pair_weight(a, b)
+
+    def _shortest_from(self, sources: Iterable[str], target: str) -> Optional[List[str]]:
+        """多源 Dijkstra：从已连接的表集合到 target 的最短路径"""
+        heap = [(0.0, table, None) for table in sources]
+        heapq.heapify(heap)
+        previous: Dict[str, Optional[str]] = {}
+        while heap:
+            cost, table, prev = heapq.heappop(heap)
+            if table in previous:
+                continue
+            previous[table] = prev
+            if table == target:
+                path = [table]
+                while previous[path[-1]] is not None:
+                    path.append(previous[path[-1]])
+                return path[::-1]
+            for other in self._adjacency.get(table, {}):
+                if other not in previous:
+                    heapq.heappush(heap, (cost + self._edge_cost(table, other), other, table))
+        return None
+
+    def find_join_path(self, tables: List[str]) -> Tuple[List[JoinEdge], List[str]]:
+        """
+        连接多张表的关联路径
+
+        Args:
+            tables: 表名列表（第一张作为起点）
+
+        Returns:
+            (按连接顺序的关联边, 无法连接的表)
+        """
+        terminals = []
+        for table in tables:
+            name = normalize_table_name(table)
+            if name and name not in terminals:
+                terminals.append(name)
+        if not terminals:
+            return [], []
+
+        connected = [terminals[0]] if terminals[0] in self._adjacency else []
+        unreachable = [] if connected else [terminals[0]]
+        path_edges: List[JoinEdge] = []
+
+        for target in terminals[1:]:
+            if target in connected:
+                continue
+            if not connected:
+                if target in self._adjacency:
+                    connected.append(target)
+                else:
+                    unreachable.append(target)
+                continue
+            path = self._shortest_from(connected, target)
+            if path is None:
+                unreachable.append(target)
+                continue
+            for a, b in zip(path, path[1:]):
+                if b not in connected:
+                    path_edges.append(self._adjacency[a][b][0])
+                    connected.append(b)
+        return path_edges, unreachable
+
+    def to_payload(self) -> Dict[str, list]:
+        return {"edges": [list(edge) for edge in self.edges()]}
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, list]) -> "JoinGraph":
+        return cls(JoinEdge(*row) for row in payload.get("edges") or [])
+
+
+def build_join_graph(queries: Iterable[dict]) -> JoinGraph:
+    """
+    从 Redash 查询列表构建关联图
+
+    同一条查询中重复出现的关联只计一次。
+
+    Args:
+        queries: redash_queries.json 中的 queries 列表
+
+    Returns:
+        JoinGraph
+    """
+    counts: Counter = Counter()
+    for query in queries:
+        counts.update(set(extract_join_edges(query.get("sql") or "")))
+    return JoinGraph(JoinEdge(*key, count) for key, count in counts.items())
+
+
+# ============================================================================
+# 全局实例
+# ============================================================================
+
+_graph: Optional[JoinGraph] = None
+_graph_lock = threading.Lock()
+
+
+def load_join_graph(metadata_dir: Optional[str] = None) -> JoinGraph:
+    """
+    加载关联图并替换全局实例
+
+    优先读取 join_graph.json；不存在时解析 redash_queries.json（较慢）。
+    """
+    global _graph
+    metadata_dir = metadata_dir or METADATA_DIR
+    start_time = time.time()
+    graph = JoinGraph([])
+
+    graph_path = os.path.join(metadata_dir, JOIN_GRAPH_FILE)
+    queries_path = os.path.join(metadata_dir, REDASH_QUERIES_FILE)
+    try:
+        if os.path.exists(graph_path):
+            with open(graph_path, "r", encoding="utf-8") as f:
+                graph = JoinGraph.from_payload(json.load(f))
+        elif os.path.exists(queries_path):
+            with open(queries_path, "r", encoding="utf-8") as f:
+                graph = build_join_graph(json.load(f).get("queries") or [])
+    except (OSError, ValueError, TypeError) as e:
+        logger.error(f"加载关联图失败: {e}")
+
+    with _graph_lock:
+        _graph = graph
+    logger.info(
+        f"表关联图已加载: {len(graph)} 个表, {len(graph.edges())} 条关联",
+        extra={"elapsed_ms": round((time.time() - start_time) * 1000, 2)}
+    )
+    return graph
+
+
+def get_join_graph() -> JoinGraph:
+    """获取全局关联图（未加载时同步加载一次）"""
+    graph = _graph
+    if graph is None:
+        graph = load_join_graph()
+    return graph
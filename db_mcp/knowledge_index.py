@@ -0,0 +1,366 @@
+"""
+本地知识索引（BM25）
+
+对本地元数据文件建立进程内倒排索引，毫秒级回答"哪张表 / 哪个字段 / 哪条历史查询"
+类问题，LightRAG 只作为兜底：
+- `<METADATA_DIR>/*_metadata.json`：表（注释、业务域、粒度）和字段（注释、类型）
+- `<METADATA_DIR>/online_dictionary.json`：线上数据字典的表 / 字段注释
+- `<METADATA_DIR>/redash_queries.json`：Redash 历史查询（名称、描述、用到的表、SQL）
+
+索引结构：
+- 分词复用 db_mcp.relevance.tokenize（CJK 单字 + 二元组，snake_case 拆分）
+- 倒排表为每个词项两段 array：文档 id（array('I')）与词频（array('H')）
+- 文档名称中的词项计两次（近似 BM25F 的字段加权），查询中直接出现文档名时加权
+- 每条结果带 match_ratio：文档覆盖的查询词项占比（按 idf 加权），BM25 得分是绝对值，
+  随查询长度和词项稀有度变化，判断"是否足够相关"时用 match_ratio 比较
+- 同一张表 / 同一个字段同时来自离线元数据和线上数据字典时，只返回得分最高的一条
+
+使用示例：
+    from db_mcp.knowledge_index import get_knowledge_index
+
+    hits = get_knowledge_index().search("NPL 率怎么计算", limit=5)
+    for hit in hits:
+        print(hit.kind, hit.name, hit.score)
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .logger import get_logger
+from .metadata_store import METADATA_DIR
+from .relevance import tokenize
+
+logger = get_logger("mcp.knowledge_index")
+
+# 文档类型
+KIND_TABLE = "table"
+KIND_COLUMN = "column"
+KIND_QUERY = "query"
+
+# BM25 参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+# 历史查询 SQL 参与索引的最大长度（避免超长 SQL 主导词频）
+_MAX_SQL_INDEX_CHARS = 4000
+# 查询中直接出现文档名（表名 / 字段名）时的得分倍数
+EXACT_NAME_BOOST = 2.0
+
+
+class KnowledgeDocument(NamedTuple):
+    """索引中的一条文档"""
+    kind: str
+    name: str
+    content: str
+    source: str
+
+
+class KnowledgeHit(NamedTuple):
+    """检索结果"""
+    score: float
+    kind: str
+    name: str
+    content: str
+    source: str
+    # 文档覆盖的查询词项占比（按 idf 加权，0~1）；查询中直接写出文档名时为 1
+    match_ratio: float = 0.0
+
+
+class KnowledgeIndex:
+    """
+    BM25 倒排索引
+
+    先通过 add_document 添加文档，再调用 build() 生成紧凑的倒排表。
+    """
+
+    def __init__(self):
+        self.documents: List[KnowledgeDocument] = []
+        self._doc_lengths = array("I")
+        self._postings_builder: Dict[str, Dict[int, int]] = {}
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._avg_length = 0.0
+        self.built_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    # ---------- 构建 ----------
+
+    def add_document(self, kind: str, name: str, content: str, source: str, index_text: str = ""):
+        """
+        添加文档
+
+        Args:
+            kind: 文档类型（table / column / query）
+            name: 名称（表名、表名.字段名、查询名）
+            content: 返回给调用方的内容
+            source: 来源文件名
+            index_text: 额外参与索引但不返回的文本（如 SQL）
+        """
+        doc_id = len(self.documents)
+        self.documents.append(KnowledgeDocument(kind, name, content, source))
+
+        terms = Counter(tokenize(name))
+        terms.update(terms.keys())  # 名称中的词项计两次
+        terms.update(tokenize(content))
+        if index_text:
+            terms.update(tokenize(index_text))
+
+        self._doc_lengths.append(sum(terms.values()))
+        for term, freq in terms.items():
+            self._postings_builder.setdefault(term, {})[doc_id] = min(freq, 0xFFFF)
+
+    def build(self):
+        """将构建期的 dict 倒排表转换为紧凑的 array 倒排表"""
+        postings = {}
+        for term, docs in self._postings_builder.items():
+            postings[term] = (array("I", docs.keys()), array("H", docs.values()))
+        self._postings = postings
+        self._postings_builder = {}
+        self._avg_length = (sum(self._doc_lengths) / len(self._doc_lengths)) if self._doc_lengths else 0.0
+        self.built_at = time.time()
+
+    # ---------- 检索 ----------
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        kinds: Optional[Iterable[str]] = None,
+    ) -> List[KnowledgeHit]:
+        """
+        BM25 检索
+
+        Args:
+            query: 查询文本
+            limit: 返回数量
+            kinds: 只返回指定类型的文档（可选）
+
+        Returns:
+            KnowledgeHit 列表，按得分降序
+        """
+        kinds = set(kinds) if kinds else None
+        scores, ratios = self._score(set(tokenize(query)))
+        hits = []
+        seen: Dict[Tuple[str, str], int] = {}
+        for doc_id, score in sorted(scores.items(), key=lambda x: (-x[1], x[0])):
+            doc = self.documents[doc_id]
+            if kinds and doc.kind not in kinds:
+                continue
+            # 同一张表 / 字段的其他来源：只合并来源，不重复返回
+            key = (doc.kind, doc.name.casefold())
+            if key in seen:
+                first = hits[seen[key]]
+                if doc.source not in first.source.split(", "):
+                    hits[seen[key]] = first._replace(source=f"{first.source}, {doc.source}")
+                continue
+            if len(hits) >= limit:
+                continue
+            seen[key] = len(hits)
+            hits.append(KnowledgeHit(
+                round(score, 4), doc.kind, doc.name, doc.content, doc.source, round(ratios[doc_id], 4)
+            ))
+        return hits
+
+    def search_ids(self, query: str, limit: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        BM25 检索，返回文档下标
+
+        Args:
+            query: 查询文本
+            limit: 返回数量（可选，默认全部命中文档）
+
+        Returns:
+            [(文档下标, 得分)]，按得分降序
+        """
+        scores, _ = self._score(set(tokenize(query)))
+        ranked = sorted(scores.items(), key=lambda x: (-x[1], x[0]))
+        return ranked[:limit] if limit is not None else ranked
+
+    def _score(self, query_terms: set) -> Tuple[Dict[int, float], Dict[int, float]]:
+        """
+        计算命中文档的 BM25 得分和查询词项覆盖率
+
+        Returns:
+            ({文档下标: 得分}, {文档下标: match_ratio})
+        """
+        if not query_terms or not self.documents:
+            return {}, {}
+
+        n = len(self.documents)
+        avg_length = self._avg_length or 1.0
+        scores: Dict[int, float] = {}
+        matched: Dict[int, float] = {}
+        total_idf = 0.0
+
+        for term in query_terms:
+            posting = self._postings.get(term)
+            df = len(posting[0]) if posting is not None else 0
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            # 索引中不存在的词项也计入分母（问题里有本地元数据没有的内容）
+            total_idf += idf
+            if posting is None:
+                continue
+            doc_ids, freqs = posting
+            for doc_id, freq in zip(doc_ids, freqs):
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (BM25_K1 + 1) / (freq + norm)
+                matched[doc_id] = matched.get(doc_id, 0.0) + idf
+
+        ratios = {doc_id: idf / total_idf for doc_id, idf in matched.items()}
+
+        # 查询里直接写出了表名 / 字段名时，对应文档优先
+        for doc_id in scores:
+            name = self.documents[doc_id].name.casefold()
+            if name in query_terms or name.rsplit(".", 1)[-1] in query_terms:
+                scores[doc_id] *= EXACT_NAME_BOOST
+                ratios[doc_id] = 1.0
+
+        return scores, ratios
+
+    def stats(self) -> Dict[str, int]:
+        """统计信息"""
+        kinds = Counter(doc.kind for doc in self.documents)
+        return {
+            "documents": len(self.documents),
+            "terms": len(self._postings),
+            **{f"{kind}s": count for kind, count in kinds.items()},
+        }
+
+
+# ============================================================================
+# 数据源加载
+# ============================================================================
+
+def _add_metadata_file(index: KnowledgeIndex, path: str):
+    """添加 01_build_metadata.py 生成的 <database>_metadata.json"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    source = os.path.basename(path)
+
+    for table in data.get("tables") or []:
+        table_name = table.get("table_name")
+        if not table_name:
+            continue
+        parts = [table.get("table_comment") or ""]
+        if table.get("business_domain"):
+            parts.append(f"业务域: {table['business_domain']}")
+        if table.get("granularity"):
+            parts.append(f"粒度: {table['granularity']}")
+        index.add_document(KIND_TABLE, table_name, "；".join(p for p in parts if p), source)
+
+        for column in table.get("columns") or []:
+            column_name = column.get("column_name")
+            if not column_name:
+                continue
+            content = f"{column.get('comment') or ''}（{column.get('data_type') or ''}）"
+            if column.get("related_table"):
+                content += f" 关联: {column['related_table']}.{column.get('related_column') or ''}"
+            index.add_document(KIND_COLUMN, f"{table_name}.{column_name}", content, source)
+
+
+def _add_online_dictionary(index: KnowledgeIndex, path: str):
+    """添加线上数据字典 online_dictionary.json（{表名: {table_comment, columns}}）"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    source = os.path.basename(path)
+
+    for table_name, info in data.items():
+        info = info or {}
+        index.add_document(KIND_TABLE, table_name, info.get("table_comment") or "", source)
+        for column_name, comment in (info.get("columns") or {}).items():
+            index.add_document(KIND_COLUMN, f"{table_name}.{column_name}", comment or "", source)
+
+
+def _add_redash_queries(index: KnowledgeIndex, path: str):
+    """添加 03_get_redash_query.py 生成的 redash_queries.json"""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    source = os.path.basename(path)
+
+    for query in data.get("queries") or []:
+        name = query.get("name") or f"query_{query.get('id')}"
+        parts = []
+        if query.get("description"):
+            parts.append(query["description"])
+        if query.get("tables_used"):
+            parts.append(f"用到的表: {', '.join(query['tables_used'])}")
+        if query.get("related_dashboards"):
+            parts.append(f"仪表板: {', '.join(query['related_dashboards'])}")
+        sql = query.get("sql") or ""
+        content = "；".join(parts)
+        if sql:
+            content += f"\nSQL (Redash #{query.get('id')}):\n{sql}"
+        index.add_document(KIND_QUERY, name, content, source, sql[:_MAX_SQL_INDEX_CHARS])
+
+
+def build_knowledge_index(metadata_dir: Optional[str] = None) -> KnowledgeIndex:
+    """
+    从元数据目录构建索引，单个文件失败只记录日志
+
+    Args:
+        metadata_dir: 元数据目录，默认 METADATA_DIR
+
+    Returns:
+        构建完成的 KnowledgeIndex
+    """
+    metadata_dir = metadata_dir or METADATA_DIR
+    index = KnowledgeIndex()
+    start_time = time.time()
+
+    sources = []
+    if os.path.isdir(metadata_dir):
+        for filename in sorted(os.listdir(metadata_dir)):
+            path = os.path.join(metadata_dir, filename)
+            if filename.endswith("_metadata.json"):
+                sources.append((_add_metadata_file, path))
+            elif filename == "online_dictionary.json":
+                sources.append((_add_online_dictionary, path))
+            elif filename == "redash_queries.json":
+                sources.append((_add_redash_queries, path))
+
+    for loader, path in sources:
+        try:
+            loader(index, path)
+        except (OSError, ValueError, AttributeError) as e:
+            logger.error(f"加载知识文件失败 {path}: {e}")
+
+    index.build()
+    logger.info(
+        f"本地知识索引已构建: {index.stats()}",
+        extra={"elapsed_ms": round((time.time() - start_time) * 1000, 2)}
+    )
+    return index
+
+
+# ============================================================================
+# 全局实例
+# ============================================================================
+
+_index: Optional[KnowledgeIndex] = None
+_index_lock = threading.Lock()
+
+
+def load_knowledge_index(metadata_dir: Optional[str] = None) -> KnowledgeIndex:
+    """重新构建并替换全局索引（服务启动时调用）"""
+    global _index
+    index = build_knowledge_index(metadata_dir)
+    with _index_lock:
+        _index = index
+    return index
+
+
+def get_knowledge_index() -> KnowledgeIndex:
+    """获取全局索引（未加载时同步构建一次）"""
+    index = _index
+    if index is None:
+        with _index_lock:
+            index = _index
+        if index is None:
+            index = load_knowledge_index()
+    return index
@@ -0,0 +1,298 @@
+"""
+离线元数据存储
+
+加载 data_pipeline/01_build_metadata.py 生成的 `metadata/<database>_metadata.json`
+（LLM 补全的表/字段业务注释、业务域、粒度、PII 标记、推断关联），
+在运行时与 information_schema 的实时结构合并输出。
+
+内存布局：
+    JSON 只在加载时解析一次，随后转换为按数据库划分的列式结构：
+    - 所有字符串进入同一个去重字符串池，表/字段只保存整数 id
+    - 表属性、字段属性分别存放在 array / bytearray 中
+    - 每张表的字段是一段连续区间（偏移数组），按表名 casefold 建立哈希索引
+    常驻内存约为 json.load 得到的嵌套 dict（每个字段一个 dict）的 1/4。
+
+使用示例：
+    from db_mcp.metadata_store import get_metadata_store
+
+    store = get_metadata_store()
+    table = store.get_table("singa_bi", "sgo_orders")
+    if table:
+        print(table.comment, table.business_domain)
+        columns = store.get_columns("singa_bi", "sgo_orders")
+"""
+
+import glob
+import json
+import os
+import threading
+from array import array
+from typing import Dict, List, NamedTuple, Optional
+
+from .logger import get_logger
+
+logger = get_logger("mcp.metadata_store")
+
+# 元数据目录（默认为项目根目录下的 metadata/）
+DEFAULT_METADATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "metadata")
+METADATA_DIR = os.getenv("METADATA_DIR", DEFAULT_METADATA_DIR)
+
+# 字段标记位
+_FLAG_PRIMARY_KEY = 0x01
+_FLAG_PII = 0x02
+
+# 字符串池中空字符串的 id
+_EMPTY = 0
+# 无关联字段
+_NO_RELATION = -1
+
+
+class ColumnMetadata(NamedTuple):
+    """字段元数据（按需构造的只读视图）"""
+    column_name: str
+    data_type: str
+    comment: str
+    is_primary_key: bool
+    is_pii: bool
+    related_table: str
+    related_column: str
+
+
+class TableMetadata(NamedTuple):
+    """表元数据（按需构造的只读视图）"""
+    table_name: str
+    comment: str
+    business_domain: str
+    granularity: str
+    column_count: int
+
+
+class _StringPool:
+    """去重字符串池：字符串 <-> 整数 id"""
+
+    def __init__(self):
+        self.strings: List[str] = [""]
+        self._ids: Dict[str, int] = {"": _EMPTY}
+
+    def add(self, value: Optional[str]) -> int:
+        if not value:
+            return _EMPTY
+        string_id = self._ids.get(value)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.strings.append(value)
+            self._ids[value] = string_id
+        return string_id
+
+    def freeze(self):
+        """加载完成后释放反向映射，只保留 id -> 字符串"""
+        self._ids = {}
+
+
+class _DatabaseMetadata:
+    """单个数据库的列式元数据"""
+
+    __slots__ = (
+        "database", "table_lookup",
+        "table_names", "table_comments", "table_domains", "table_granularities",
+        "column_offsets", "column_names", "column_types", "column_comments",
+        "column_flags", "column_related_tables", "column_related_columns",
+    )
+
+    def __init__(self, database: str):
+        self.database = database
+        self.table_lookup: Dict[str, int] = {}
+        self.table_names = array("I")
+        self.table_comments = array("I")
+        self.table_domains = array("I")
+        self.table_granularities = array("I")
+        self.column_offsets = array("I", [0])
+        self.column_names = array("I")
+        self.column_types = array("I")
+        self.column_comments = array("I")
+        self.column_flags = bytearray()
+        self.column_related_tables = array("i")
+        self.column_related_columns = array("i")
+
+
+class MetadataStore:
+    """
+    离线元数据存储（按数据库、表名索引）
+
+    所有查询均为大小写不敏感。
+    """
+
+    def __init__(self):
+        self._pool = _StringPool()
+        self._databases: Dict[str, _DatabaseMetadata] = {}
+
+    # ---------- 构建 ----------
+
+    def add_database(self, database: str, tables: List[dict]):
+        """
+        添加一个数据库的元数据（格式同 01_build_metadata.py 的输出）
+
+        Args:
+            database: 数据库名
+            tables: 表元数据列表
+        """
+        pool = self._pool
+        db = self._databases.setdefault(database.casefold(), _DatabaseMetadata(database))
+
+        for table in tables:
+            table_name = table.get("table_name")
+            if not table_name or table_name.casefold() in db.table_lookup:
+                continue
+
+            db.table_lookup[table_name.casefold()] = len(db.table_names)
+            db.table_names.append(pool.add(table_name))
+            db.table_comments.append(pool.add(table.get("table_comment")))
+            db.table_domains.append(pool.add(table.get("business_domain")))
+            db.table_granularities.append(pool.add(table.get("granularity")))
+
+            for column in table.get("columns") or []:
+                flags = 0
+                if column.get("is_primary_key"):
+                    flags |= _FLAG_PRIMARY_KEY
+                if column.get("is_pii"):
+                    flags |= _FLAG_PII
+                related_table = column.get("related_table")
+                related_column = column.get("related_column")
+
+                db.column_names.append(pool.add(column.get("column_name")))
+                db.column_types.append(pool.add(column.get("data_type")))
+                db.column_comments.append(pool.add(column.get("comment")))
+                db.column_flags.append(flags)
+                db.column_related_tables.append(pool.add(related_table) if related_table else _NO_RELATION)
+                db.column_related_columns.append(pool.add(related_column) if related_column else _NO_RELATION)
+
+            db.column_offsets.append(len(db.column_names))
+
+    def freeze(self):
+        """加载完成后调用，释放构建期使用的辅助结构"""
+        self._pool.freeze()
+
+    # ---------- 查询 ----------
+
+    def _table_id(self, database: str, table_name: str):
+        db = self._databases.get((database or "").casefold())
+        if db is None or not table_name:
+            return None, None
+        return db, db.table_lookup.get(table_name.casefold())
+
+    def has_database(self, database: str) -> bool:
+        """是否有该数据库的元数据"""
+        return (database or "").casefold() in self._databases
+
+    def get_table(self, database: str, table_name: str) -> Optional[TableMetadata]:
+        """
+        获取表元数据
+
+        Args:
+            database: 数据库名
+            table_name: 表名
+
+        Returns:
+            TableMetadata，不存在时返回 None
+        """
+        db, table_id = self._table_id(database, table_name)
+        if table_id is None:
+            return None
+        s = self._pool.strings
+        return TableMetadata(
+            table_name=s[db.table_names[table_id]],
+            comment=s[db.table_comments[table_id]],
+            business_domain=s[db.table_domains[table_id]],
+            granularity=s[db.table_granularities[table_id]],
+            column_count=db.column_offsets[table_id + 1] - db.column_offsets[table_id],
+        )
+
+    def get_columns(self, database: str, table_name: str) -> Dict[str, ColumnMetadata]:
+        """
+        获取表的字段元数据
+
+        Args:
+            database: 数据库名
+            table_name: 表名
+
+        Returns:
+            {casefold(字段名): ColumnMetadata}，表不存在时返回空字典
+        """
+        db, table_id = self._table_id(database, table_name)
+        if table_id is None:
+            return {}
+        s = self._pool.strings
+        columns = {}
+        for i in range(db.column_offsets[table_id], db.column_offsets[table_id + 1]):
+            flags = db.column_flags[i]
+            related_table = db.column_related_tables[i]
+            related_column = db.column_related_columns[i]
+            name = s[db.column_names[i]]
+            columns[name.casefold()] = ColumnMetadata(
+                column_name=name,
+                data_type=s[db.column_types[i]],
+                comment=s[db.column_comments[i]],
+                is_primary_key=bool(flags & _FLAG_PRIMARY_KEY),
+                is_pii=bool(flags & _FLAG_PII),
+                related_table=s[related_table] if related_table != _NO_RELATION else "",
+                related_column=s[related_column] if related_column != _NO_RELATION else "",
+            )
+        return columns
+
+    def stats(self) -> Dict[str, int]:
+        """统计信息"""
+        return {
+            "databases": len(self._databases),
+            "tables": sum(len(db.table_names) for db in self._databases.values()),
+            "columns": sum(len(db.column_names) for db in self._databases.values()),
+            "strings": len(self._pool.strings),
+        }
+
+
+# ============================================================================
+# 全局实例
+# ============================================================================
+
+_store: Optional[MetadataStore] = None
+_store_lock = threading.Lock()
+
+
+def load_metadata_store(metadata_dir: Optional[str] = None) -> MetadataStore:
+    """
+    从元数据目录加载所有 `*_metadata.json` 并替换全局实例
+
+    单个文件解析失败只记录日志，不影响其他文件。
+
+    Args:
+        metadata_dir: 元数据目录，默认 METADATA_DIR
+
+    Returns:
+        新的 MetadataStore 实例
+    """
+    global _store
+    metadata_dir = metadata_dir or METADATA_DIR
+    store = MetadataStore()
+
+    for path in sorted(glob.glob(os.path.join(metadata_dir, "*_metadata.json"))):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            database = data.get("database") or os.path.basename(path)[:-len("_metadata.json")]
+            store.add_database(database, data.get("tables") or [])
+        except (OSError, ValueError) as e:
+            logger.error(f"加载元数据文件失败 {path}: {e}")
+
+    store.freeze()
+    with _store_lock:
+        _store = store
+
+    logger.info(f"离线元数据已加载: {store.stats()}")
+    return store
+
+
+def get_metadata_store() -> MetadataStore:
+    """获取全局元数据存储（未加载时同步加载一次）"""
+    store = _store
+    if store is None:
+        store = load_metadata_store()
+    return store
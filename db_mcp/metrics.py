@@ -0,0 +1,118 @@
+"""
+进程内运行指标
+
+轻量的计数器 / 数值 / 耗时分布指标注册表，由 `/metrics` 端点以 JSON 输出。
+指标名带可选标签，格式化为 `name{k=v,...}`。
+耗时分布保留最近 OBSERVATION_WINDOW 个样本，用于计算分位数。
+
+使用示例：
+    from db_mcp import metrics
+
+    metrics.increment("lightrag_cache_hits", cache="lightrag")
+    metrics.set_gauge("lightrag_cache_size", 42, cache="lightrag")
+    metrics.observe("lightrag_latency_seconds", 3.2, mode="mix")
+    p90 = metrics.percentile("lightrag_latency_seconds", 90, mode="mix")
+    print(metrics.snapshot())
+"""
+
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+# 每个耗时分布保留的样本数
+OBSERVATION_WINDOW = 500
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = {}
+_gauges: Dict[str, float] = {}
+_observations: Dict[str, Deque[float]] = {}
+
+
+def _metric_key(name: str, labels: Dict[str, Any]) -> str:
+    """生成带标签的指标名"""
+    if not labels:
+        return name
+    label_str = ",".join(f"{k}={labels[k]}" for k in sorted(labels))
+    return f"{name}{{{label_str}}}"
+
+
+def increment(name: str, value: float = 1, **labels):
+    """计数器累加"""
+    key = _metric_key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name: str, value: float, **labels):
+    """设置当前值类指标"""
+    key = _metric_key(name, labels)
+    with _lock:
+        _gauges[key] = value
+
+
+def observe(name: str, value: float, **labels):
+    """记录一个样本（如耗时秒数）"""
+    key = _metric_key(name, labels)
+    with _lock:
+        window = _observations.get(key)
+        if window is None:
+            window = _observations[key] = deque(maxlen=OBSERVATION_WINDOW)
+        window.append(value)
+
+
+def percentile(name: str, p: float, min_samples: int = 1, **labels) -> Optional[float]:
+    """
+    最近样本的分位数
+
+    Args:
+        name: 指标名
+        p: 分位（0-100）
+        min_samples: 样本数少于该值时返回 None
+
+    Returns:
+        分位数值，样本不足时返回 None
+    """
+    with _lock:
+        samples = sorted(_observations.get(_metric_key(name, labels), ()))
+    if len(samples) < max(min_samples, 1):
+        return None
+    index = min(int(round(p / 100 * (len(samples) - 1))), len(samples) - 1)
+    return samples[index]
+
+
+def get_counter(name: str, **labels) -> float:
+    """读取计数器当前值"""
+    with _lock:
+        return _counters.get(_metric_key(name, labels), 0)
+
+
+def snapshot() -> Dict[str, Dict[str, float]]:
+    """所有指标的快照"""
+    with _lock:
+        observations = {key: sorted(window) for key, window in _observations.items()}
+        result = {
+            "counters": dict(sorted(_counters.items())),
+            "gauges": dict(sorted(_gauges.items())),
+        }
+
+    summaries = {}
+    for key, samples in sorted(observations.items()):
+        if not samples:
+            continue
+        last = len(samples) - 1
+        summaries[key] = {
+            "count": len(samples),
+            "p50": round(samples[int(round(0.5 * last))], 4),
+            "p90": round(samples[int(round(0.9 * last))], 4),
+            "p99": round(samples[int(round(0.99 * last))], 4),
+        }
+    result["observations"] = summaries
+    return result
+
+
+def reset():
+    """清空所有指标"""
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _observations.clear()
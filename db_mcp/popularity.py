@@ -0,0 +1,185 @@
+"""
+表热度索引
+
+根据 Redash 历史查询统计每张表的真实使用情况（被多少查询使用、被多少仪表板使用、
+最近一次使用时间），计算 0~1 的热度分，用于排序：
+- get_table_schema 的表摘要 / 分组浏览 / "你是不是要找"提示
+- search_metadata 的表和字段结果
+
+热度分 = log1p(查询数) + DASHBOARD_WEIGHT * log1p(仪表板数)，乘以按最近使用时间的
+指数衰减（半衰期 RECENCY_HALF_LIFE_DAYS 天，相对于导出数据中最新的查询时间，
+避免导出较早时所有表一起衰减），再除以最大值归一化。
+
+数据来源：
+    优先加载 `<METADATA_DIR>/table_popularity.json`（data_pipeline/06_build_table_popularity.py 生成）；
+    不存在时从 `<METADATA_DIR>/redash_queries.json` 现场统计。
+
+使用示例：
+    from db_mcp.popularity import get_popularity
+
+    score = get_popularity().score("sgo_orders")   # 0.0 ~ 1.0
+"""
+
+import json
+import math
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional
+
+from .logger import get_logger
+from .metadata_store import METADATA_DIR
+from .query_history import REDASH_QUERIES_FILE, normalize_table_name
+
+logger = get_logger("mcp.popularity")
+
+# 热度文件名（位于 METADATA_DIR）
+POPULARITY_FILE = "table_popularity.json"
+
+# 仪表板使用相对普通查询的权重（仪表板是持续在用的报表）
+DASHBOARD_WEIGHT = 2.0
+# 最近使用时间的半衰期（天）
+RECENCY_HALF_LIFE_DAYS = 180
+# 相关度得分的热度加成：最热的表得分 × (1 + POPULARITY_BOOST)
+POPULARITY_BOOST = 0.5
+
+
+def _parse_time(value: str) -> Optional[datetime]:
+    """解析 Redash 返回的 ISO 时间"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def compute_table_popularity(
+    queries: Iterable[dict],
+    now: Optional[datetime] = None,
+) -> Dict[str, dict]:
+    """
+    统计表热度
+
+    Args:
+        queries: redash_queries.json 中的 queries 列表
+        now: 计算最近使用衰减的参考时间（默认为查询中最新的更新时间）
+
+    Returns:
+        {表名: {query_count, dashboard_count, last_used, score}}，score 归一化到 0~1
+    """
+    stats: Dict[str, dict] = {}
+
+    for query in queries:
+        dashboards = set(query.get("related_dashboards") or [])
+        used_at = query.get("updated_at") or query.get("created_at") or ""
+        for table in {normalize_table_name(t) for t in query.get("tables_used") or [] if t}:
+            entry = stats.setdefault(table, {
+                "query_count": 0, "dashboards": set(), "last_used": "",
+            })
+            entry["query_count"] += 1
+            entry["dashboards"].update(dashboards)
+            if used_at > entry["last_used"]:
+                entry["last_used"] = used_at
+
+    last_used = {table: _parse_time(entry["last_used"]) for table, entry in stats.items()}
+    known_times = [t for t in last_used.values() if t is not None]
+    if now is None and known_times:
+        now = max(known_times)
+    # 没有时间信息的表按最早的时间处理
+    oldest = min(known_times, default=now)
+
+    raw_scores = {}
+    for table, entry in stats.items():
+        usage = math.log1p(entry["query_count"]) + DASHBOARD_WEIGHT * math.log1p(len(entry["dashboards"]))
+        used_at = last_used[table] or oldest
+        if now is not None and used_at is not None:
+            age_days = max((now - used_at).total_seconds() / 86400, 0)
+            usage *= 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+        raw_scores[table] = usage
+
+    max_score = max(raw_scores.values(), default=0) or 1.0
+    return {
+        table: {
+            "query_count": entry["query_count"],
+            "dashboard_count": len(entry["dashboards"]),
+            "last_used": entry["last_used"],
+            "score": round(raw_scores[table] / max_score, 6),
+        }
+        for table, entry in sorted(stats.items())
+    }
+
+
+class TablePopularity:
+    """
+    表热度查询
+
+    Args:
+        tables: compute_table_popularity 的结果
+    """
+
+    def __init__(self, tables: Dict[str, dict]):
+        self._scores: Dict[str, float] = {
+            normalize_table_name(name): float(info.get("score") or 0.0)
+            for name, info in tables.items()
+        }
+        self._tables = tables
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def score(self, table_name: str) -> float:
+        """表热度（0~1，未使用过的表为 0）"""
+        return self._scores.get(normalize_table_name(table_name), 0.0)
+
+    def boost(self, relevance: float, table_name: str) -> float:
+        """按热度放大相关度得分（相关度为 0 时仍为 0，热度不会让无关的表排到前面）"""
+        return relevance * (1.0 + POPULARITY_BOOST * self.score(table_name))
+
+    def info(self, table_name: str) -> Optional[dict]:
+        """表的使用统计（query_count / dashboard_count / last_used / score）"""
+        return self._tables.get(normalize_table_name(table_name))
+
+
+# ============================================================================
+# 全局实例
+# ============================================================================
+
+_popularity: Optional[TablePopularity] = None
+_popularity_lock = threading.Lock()
+
+
+def load_popularity(metadata_dir: Optional[str] = None) -> TablePopularity:
+    """加载表热度并替换全局实例；两个文件都不存在时为空（所有表热度为 0）"""
+    global _popularity
+    metadata_dir = metadata_dir or METADATA_DIR
+    tables: Dict[str, dict] = {}
+
+    popularity_path = os.path.join(metadata_dir, POPULARITY_FILE)
+    queries_path = os.path.join(metadata_dir, REDASH_QUERIES_FILE)
+    try:
+        if os.path.exists(popularity_path):
+            with open(popularity_path, "r", encoding="utf-8") as f:
+                tables = json.load(f).get("tables") or {}
+        elif os.path.exists(queries_path):
+            with open(queries_path, "r", encoding="utf-8") as f:
+                tables = compute_table_popularity(json.load(f).get("queries") or [])
+    except (OSError, ValueError, AttributeError) as e:
+        logger.error(f"加载表热度失败: {e}")
+
+    popularity = TablePopularity(tables)
+    with _popularity_lock:
+        _popularity = popularity
+    logger.info(f"表热度已加载: {len(popularity)} 个表")
+    return popularity
+
+
+def get_popularity() -> TablePopularity:
+    """获取全局表热度（未加载时同步加载一次）"""
+    popularity = _popularity
+    if popularity is None:
+        popularity = load_popularity()
+    return popularity
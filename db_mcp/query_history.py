@@ -0,0 +1,260 @@
+"""
+历史查询检索
+
+基于 data_pipeline/03_get_redash_query.py 导出的 `redash_queries.json`，
+在本地按"用到的表"和关键词检索经过验证的历史 SQL，作为生成 SQL 的 few-shot 参考。
+
+索引结构：
+- 表名 -> 查询下标的倒排表（表名去掉 schema 前缀和反引号、大小写折叠）
+- SQL 指纹：去注释、字面量替换为 ?、合并空白后取哈希；
+  指纹相同的查询（Redash 中大量复制的查询）只返回一个代表，并给出重复次数
+- 关键词：查询名称、描述、仪表板名称上的 BM25（复用 KnowledgeIndex）
+
+排序：命中表的 IDF 之和（越少见的表越有区分度）+ 表覆盖率 + 关键词得分，
+被仪表板引用的查询略微加权（已在生产中使用）。
+
+使用示例：
+    from db_mcp.query_history import get_query_history
+
+    hits = get_query_history().search(tables=["sgo_orders"], keywords="放款金额", limit=3)
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from .knowledge_index import KnowledgeIndex
+from .logger import get_logger
+from .metadata_store import METADATA_DIR
+
+logger = get_logger("mcp.query_history")
+
+# 历史查询文件名（位于 METADATA_DIR）
+REDASH_QUERIES_FILE = "redash_queries.json"
+
+# 关键词得分相对表命中得分的权重
+KEYWORD_WEIGHT = 0.5
+# 每个引用仪表板的加分（对数衰减）
+DASHBOARD_BONUS = 0.5
+
+_COMMENT_RE = re.compile(r"--[^\n]*|#[^\n]*|/\*.*?\*/", re.S)
+_STRING_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_PARAM_RE = re.compile(r"\{\{[^}]*\}\}")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_table_name(name: str) -> str:
+    """表名归一：去反引号和 schema 前缀，大小写折叠"""
+    name = (name or "").strip().replace("`", "")
+    return name.rsplit(".", 1)[-1].casefold()
+
+
+def sql_fingerprint(sql: str) -> str:
+    """
+    SQL 指纹：结构相同、只有字面量 / 参数不同的 SQL 得到相同指纹
+
+    Args:
+        sql: SQL 文本（可含 Redash {{ 参数 }}）
+
+    Returns:
+        16 位十六进制指纹
+    """
+    text = _COMMENT_RE.sub(" ", sql or "")
+    text = _PARAM_RE.sub("?", text)
+    text = _STRING_RE.sub("?", text)
+    text = _NUMBER_RE.sub("?", text)
+    text = _IN_LIST_RE.sub("(?)", text)
+    text = _SPACE_RE.sub(" ", text).strip().rstrip(";").casefold()
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+class HistoricalQuery(NamedTuple):
+    """一条历史查询"""
+    id: int
+    name: str
+    description: str
+    sql: str
+    tables: tuple
+    dashboards: tuple
+    updated_at: str
+    fingerprint: str
+
+
+class HistoryHit(NamedTuple):
+    """检索结果"""
+    score: float
+    query: HistoricalQuery
+    matched_tables: List[str]
+    duplicates: int
+
+
+class QueryHistory:
+    """
+    历史查询索引
+
+    Args:
+        queries: redash_queries.json 中的 queries 列表
+    """
+
+    def __init__(self, queries: Iterable[dict]):
+        self.queries: List[HistoricalQuery] = []
+        self._table_postings: Dict[str, List[int]] = {}
+        self._fingerprint_groups: Dict[str, List[int]] = {}
+        self._keyword_index = KnowledgeIndex()
+
+        for raw in queries:
+            sql = raw.get("sql") or ""
+            if not sql.strip():
+                continue
+            tables = tuple(sorted({
+                normalize_table_name(t) for t in raw.get("tables_used") or [] if t
+            }))
+            query = HistoricalQuery(
+                id=raw.get("id"),
+                name=raw.get("name") or "",
+                description=raw.get("description") or "",
+                sql=sql,
+                tables=tables,
+                dashboards=tuple(raw.get("related_dashboards") or ()),
+                updated_at=raw.get("updated_at") or raw.get("created_at") or "",
+                fingerprint=sql_fingerprint(sql),
+            )
+            query_id = len(self.queries)
+            self.queries.append(query)
+            for table in tables:
+                self._table_postings.setdefault(table, []).append(query_id)
+            self._fingerprint_groups.setdefault(query.fingerprint, []).append(query_id)
+            self._keyword_index.add_document(
+                "query", query.name, query.description, REDASH_QUERIES_FILE,
+                " ".join(query.dashboards + query.tables)
+            )
+
+        self._keyword_index.build()
+
+    def __len__(self) -> int:
+        return len(self.queries)
+
+    def search(
+        self,
+        tables: Optional[Iterable[str]] = None,
+        keywords: Optional[str] = None,
+        limit: int = 3,
+    ) -> List[HistoryHit]:
+        """
+        按候选表和关键词检索历史查询
+
+        Args:
+            tables: 候选表名（可选）
+            keywords: 关键词 / 问题描述（可选）
+            limit: 返回数量（指纹去重后）
+
+        Returns:
+            HistoryHit 列表，按得分降序
+        """
+        wanted = {normalize_table_name(t) for t in tables or () if t and t.strip()}
+        n = len(self.queries) or 1
+        scores: Dict[int, float] = {}
+        matched: Dict[int, List[str]] = {}
+
+        # ========== 1. 表命中：IDF 之和 + 覆盖率 ==========
+        for table in wanted:
+            postings = self._table_postings.get(table, ())
+            if not postings:
+                continue
+            idf = math.log(1 + n / len(postings))
+            for query_id in postings:
+                scores[query_id] = scores.get(query_id, 0.0) + idf
+                matched.setdefault(query_id, []).append(table)
+
+        if wanted:
+            for query_id, hit_tables in matched.items():
+                query_tables = self.queries[query_id].tables
+                # 命中的表占查询所用表的比例越高，越贴近需求（少带无关 JOIN）
+                scores[query_id] += len(hit_tables) / max(len(query_tables), 1)
+
+        # ========== 2. 关键词（关键词索引的文档下标与查询下标一致） ==========
+        if keywords and keywords.strip():
+            for query_id, score in self._keyword_index.search_ids(keywords):
+                scores[query_id] = scores.get(query_id, 0.0) + KEYWORD_WEIGHT * score
+
+        # ========== 3. 仪表板加权、指纹去重 ==========
+        for query_id in scores:
+            scores[query_id] += DASHBOARD_BONUS * math.log1p(len(self.queries[query_id].dashboards))
+
+        # 同一指纹只保留一条：得分最高，其次被仪表板引用最多、最近更新
+        def rank_key(query_id: int) -> tuple:
+            query = self.queries[query_id]
+            return scores[query_id], len(query.dashboards), query.updated_at
+
+        best_by_fingerprint: Dict[str, int] = {}
+        for query_id in scores:
+            fingerprint = self.queries[query_id].fingerprint
+            current = best_by_fingerprint.get(fingerprint)
+            if current is None or rank_key(query_id) > rank_key(current):
+                best_by_fingerprint[fingerprint] = query_id
+
+        ranked = sorted(best_by_fingerprint.items(), key=lambda x: rank_key(x[1]), reverse=True)
+
+        return [
+            HistoryHit(
+                score=round(scores[query_id], 4),
+                query=self.queries[query_id],
+                matched_tables=sorted(matched.get(query_id, [])),
+                duplicates=len(self._fingerprint_groups[fingerprint]) - 1,
+            )
+            for fingerprint, query_id in ranked[:limit]
+        ]
+
+    def stats(self) -> Dict[str, int]:
+        """统计信息"""
+        return {
+            "queries": len(self.queries),
+            "tables": len(self._table_postings),
+            "fingerprints": len(self._fingerprint_groups),
+        }
+
+
+# ============================================================================
+# 全局实例
+# ============================================================================
+
+_history: Optional[QueryHistory] = None
+_history_lock = threading.Lock()
+
+
+def load_query_history(metadata_dir: Optional[str] = None) -> QueryHistory:
+    """从 METADATA_DIR/redash_queries.json 加载并替换全局索引；文件不存在时为空索引"""
+    global _history
+    path = os.path.join(metadata_dir or METADATA_DIR, REDASH_QUERIES_FILE)
+    start_time = time.time()
+    queries = []
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                queries = json.load(f).get("queries") or []
+        except (OSError, ValueError, AttributeError) as e:
+            logger.error(f"加载历史查询失败 {path}: {e}")
+
+    history = QueryHistory(queries)
+    with _history_lock:
+        _history = history
+    logger.info(
+        f"历史查询索引已加载: {history.stats()}",
+        extra={"elapsed_ms": round((time.time() - start_time) * 1000, 2)}
+    )
+    return history
+
+
+def get_query_history() -> QueryHistory:
+    """获取全局历史查询索引（未加载时同步加载一次）"""
+    history = _history
+    if history is None:
+        history = load_query_history()
+    return history
@@ -0,0 +1,149 @@
+"""
+词法相关度排序
+
+按用户问题对表、字段做轻量的词法相关度排序，并估算文本 token 数，
+用于在 token 预算内只输出最相关的表结构信息。
+
+分词规则（CJK 感知）：
+- 英文/数字：按非字母数字及下划线切分，转小写，去掉简单复数后缀；
+  同时保留完整的 snake_case 标识符（如 sgo_orders）
+- 中日韩文字：连续片段切成单字和相邻二元组（bigram），无需分词词典
+
+使用示例：
+    from db_mcp.relevance import rank_documents, estimate_tokens
+
+    ranked = rank_documents("最近7天放款金额", [("sgo_orders", "订单表 放款时间"), ...])
+    tokens = estimate_tokens("some text")
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+# 标识符（含下划线）与 CJK 连续片段
+_TOKEN_RE = re.compile(r"[A-Za-z0-9_]+|[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]+")
+_CJK_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]")
+
+# 问题中常见但对定位表无帮助的词
+STOPWORDS = frozenset({
+    "the", "a", "an", "of", "and", "or", "to", "in", "for", "by", "with", "on", "is", "are",
+    "what", "how", "many", "much", "show", "me", "list", "get", "all", "table", "tables",
+    "select", "from", "where", "count",
+    "的", "了", "是", "和", "与", "在", "查", "询", "查询", "多少", "哪些", "一下", "怎么", "如何",
+    "表", "数据", "统计", "显示",
+})
+
+
+def _normalize_word(word: str) -> str:
+    """英文词归一：小写 + 去掉简单复数后缀"""
+    word = word.lower()
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        word = word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    CJK 感知分词
+
+    Args:
+        text: 任意文本（问题、表名、注释）
+
+    Returns:
+        词项列表（可能包含重复项）
+    """
+    if not text:
+        return []
+    tokens = []
+    for chunk in _TOKEN_RE.findall(text):
+        if _CJK_RE.match(chunk):
+            tokens.extend(chunk)
+            tokens.extend(chunk[i:i + 2] for i in range(len(chunk) - 1))
+            continue
+        parts = [p for p in chunk.split("_") if p]
+        if len(parts) > 1:
+            tokens.append(chunk.lower())
+        tokens.extend(_normalize_word(p) for p in parts)
+    return [t for t in tokens if t not in STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    粗略估算文本的 LLM token 数
+
+    CJK 字符约 1 token/字，其余字符约 4 字符/token。
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def rank_documents(
+    query: str,
+    documents: Sequence[Tuple[str, str]],
+    name_weight: float = 2.0,
+) -> List[Tuple[float, int]]:
+    """
+    按查询对文档做 IDF 加权的词项重叠打分
+
+    Args:
+        query: 查询文本（通常是用户问题）
+        documents: (名称, 描述文本) 序列；名称命中的权重更高
+        name_weight: 名称命中的权重倍数
+
+    Returns:
+        [(得分, 文档下标)]，按得分降序；得分为 0 的文档排在最后并保持原顺序
+    """
+    query_terms = set(tokenize(query))
+    if not query_terms:
+        return [(0.0, i) for i in range(len(documents))]
+
+    doc_terms: List[Tuple[set, set]] = []
+    df: Counter = Counter()
+    for name, description in documents:
+        name_terms = set(tokenize(name))
+        all_terms = name_terms | set(tokenize(description))
+        doc_terms.append((name_terms, all_terms))
+        df.update(all_terms & query_terms)
+
+    n = len(documents)
+    idf: Dict[str, float] = {
+        term: math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+        for term in query_terms
+    }
+
+    scored = []
+    for i, (name_terms, all_terms) in enumerate(doc_terms):
+        score = 0.0
+        for term in query_terms & all_terms:
+            score += idf[term] * (name_weight if term in name_terms else 1.0)
+        scored.append((score, i))
+
+    scored.sort(key=lambda x: (-x[0], x[1]))
+    return scored
+
+
+def take_within_budget(
+    blocks: Iterable[str],
+    token_budget: int,
+) -> Tuple[List[str], int]:
+    """
+    按顺序选取文本块，直到累计 token 数超过预算
+
+    至少保留第一个块，避免预算过小时输出为空。
+
+    Returns:
+        (选中的文本块, 被省略的块数量)
+    """
+    blocks = list(blocks)
+    kept: List[str] = []
+    used = 0
+    for block in blocks:
+        cost = estimate_tokens(block)
+        if kept and used + cost > token_budget:
+            break
+        kept.append(block)
+        used += cost
+    return kept, len(blocks) - len(kept)
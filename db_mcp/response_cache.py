@@ -0,0 +1,310 @@
+"""
+响应缓存
+
+TTL + LRU 的进程内缓存，用于缓存耗时的外部查询结果（如 LightRAG 知识检索）：
+- 相同 key 的并发请求合并为一次计算（single-flight），其余请求等待同一结果
+- get_or_compute_many 把多个未命中的 key 交给一次批量计算，同样与进行中的计算合并
+- 只缓存成功结果，计算抛出的异常会传递给所有等待者且不写入缓存
+- 计算方被取消时不影响等待者：等待者重新检查缓存，其中一个接手计算
+- 可选持久化到本地 JSON 文件，服务重启后继续使用未过期的条目
+- 命中 / 未命中 / 合并 / 淘汰次数计入 db_mcp.metrics
+
+使用示例：
+    from db_mcp.response_cache import ResponseCache
+
+    cache = ResponseCache("lightrag", max_entries=512, ttl=3600)
+    value, cached = await cache.get_or_compute(key, lambda: query_remote(...))
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from . import metrics
+from .logger import get_logger
+
+logger = get_logger("mcp.response_cache")
+
+# 计算方被取消时写入共享 future 的标记，等待者据此重试
+_LEADER_CANCELLED = object()
+
+
+class ResponseCache:
+    """
+    TTL + LRU 缓存（带 single-flight 请求合并）
+
+    Args:
+        name: 缓存名称（用于指标标签和日志）
+        max_entries: 最大条目数，超出后淘汰最久未使用的条目
+        ttl: 条目有效期（秒）
+        persist_path: 持久化文件路径（可选，为空时不持久化）
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = 512,
+        ttl: int = 3600,
+        persist_path: Optional[str] = None,
+    ):
+        self.name = name
+        self.max_entries = max(max_entries, 1)
+        self.ttl = ttl
+        self.persist_path = persist_path or None
+        # key -> (过期时间戳, 值)
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        _caches[name] = self
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # ---------- 基本读写 ----------
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        读取缓存
+
+        Returns:
+            (是否命中, 值)
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: str, value: Any):
+        """写入缓存并按 LRU 淘汰"""
+        self._entries[key] = (time.time() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            metrics.increment("cache_evictions", cache=self.name)
+        metrics.set_gauge("cache_size", len(self._entries), cache=self.name)
+
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+        metrics.set_gauge("cache_size", 0, cache=self.name)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[Any]],
+        store_key: Optional[Callable[[Any], str]] = None,
+    ) -> Tuple[Any, bool]:
+        """
+        读取缓存，未命中时计算并写入；相同 key 的并发调用只计算一次
+
+        Args:
+            key: 缓存 key
+            factory: 返回协程的无参函数，未命中时调用
+            store_key: 按计算结果决定写入的 key（可选，默认写入 key）。
+                结果不能代表 key 时（如对冲查询由其他模式返回）写入对应的 key，
+                key 本身保持未命中
+
+        Returns:
+            (值, 是否来自缓存或合并的请求)
+        """
+        while True:
+            hit, value = self.get(key)
+            if hit:
+                metrics.increment("cache_hits", cache=self.name)
+                return value, True
+
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            metrics.increment("cache_coalesced", cache=self.name)
+            value = await asyncio.shield(pending)
+            if value is not _LEADER_CANCELLED:
+                return value, True
+            # 计算方被取消（如其会话断开）：重新检查缓存，必要时由本请求接手计算
+
+        metrics.increment("cache_misses", cache=self.name)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await factory()
+        except asyncio.CancelledError:
+            # 不取消共享的 future：其他会话的等待者收到标记后重试，而不是一起被取消
+            self._release(key, future)
+            future.set_result(_LEADER_CANCELLED)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        else:
+            self.set(store_key(value) if store_key else key, value)
+            future.set_result(value)
+            return value, False
+        finally:
+            self._release(key, future)
+
+    async def get_or_compute_many(
+        self,
+        keys: List[str],
+        factory: Callable[[List[str]], Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        """
+        批量版 get_or_compute：缓存中没有、也不在计算中的 key 交给一次 factory 调用，
+        其他调用正在计算的 key 等待其结果（与 get_or_compute 共用计算中标记）
+
+        Args:
+            keys: 缓存 key 列表
+            factory: 接收未命中 key 列表、返回 {key: 值} 的函数；结果中缺少的 key 记为 None
+
+        Returns:
+            {key: 值}
+        """
+        values: Dict[str, Any] = {}
+        while True:
+            missing = []
+            waiting = {}
+            for key in keys:
+                if key in values or key in waiting or key in missing:
+                    continue
+                hit, value = self.get(key)
+                if hit:
+                    metrics.increment("cache_hits", cache=self.name)
+                    values[key] = value
+                elif key in self._inflight:
+                    metrics.increment("cache_coalesced", cache=self.name)
+                    waiting[key] = self._inflight[key]
+                else:
+                    missing.append(key)
+
+            if missing:
+                metrics.increment("cache_misses", len(missing), cache=self.name)
+                loop = asyncio.get_running_loop()
+                futures = {key: loop.create_future() for key in missing}
+                self._inflight.update(futures)
+                try:
+                    computed = await factory(missing)
+                except asyncio.CancelledError:
+                    for key, future in futures.items():
+                        self._release(key, future)
+                        future.set_result(_LEADER_CANCELLED)
+                    raise
+                except Exception as e:
+                    for future in futures.values():
+                        future.set_exception(e)
+                        future.exception()
+                    raise
+                else:
+                    for key, future in futures.items():
+                        values[key] = computed.get(key)
+                        self.set(key, values[key])
+                        future.set_result(values[key])
+                finally:
+                    for key, future in futures.items():
+                        self._release(key, future)
+
+            for key, pending in waiting.items():
+                value = await asyncio.shield(pending)
+                if value is not _LEADER_CANCELLED:
+                    values[key] = value
+            # 等待的计算方被取消时，剩余的 key 重新检查缓存，必要时由本请求接手计算
+            if all(key in values for key in keys):
+                return values
+
+    def _release(self, key: str, future: asyncio.Future):
+        """移除 key 的计算中标记（只移除自己登记的 future）"""
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+
+    # ---------- 持久化 ----------
+
+    def load(self) -> int:
+        """从持久化文件加载未过期的条目，返回加载数量"""
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return 0
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                items: List[list] = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"加载缓存文件失败 {self.persist_path}: {e}")
+            return 0
+
+        now = time.time()
+        loaded = 0
+        for key, expires_at, value in items:
+            if expires_at > now:
+                self._entries[key] = (expires_at, value)
+                loaded += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        metrics.set_gauge("cache_size", len(self._entries), cache=self.name)
+        logger.info(f"缓存 {self.name} 已加载 {loaded} 条")
+        return loaded
+
+    def save(self) -> int:
+        """将未过期的条目写入持久化文件（按 LRU 顺序），返回写入数量"""
+        if not self.persist_path:
+            return 0
+        now = time.time()
+        items = [
+            [key, expires_at, value]
+            for key, (expires_at, value) in self._entries.items()
+            if expires_at > now
+        ]
+        try:
+            directory = os.path.dirname(self.persist_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.persist_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(items, f, ensure_ascii=False)
+            os.replace(tmp_path, self.persist_path)
+        except (OSError, TypeError) as e:
+            logger.error(f"写入缓存文件失败 {self.persist_path}: {e}")
+            return 0
+        logger.info(f"缓存 {self.name} 已保存 {len(items)} 条")
+        return len(items)
+
+
+# ============================================================================
+# 全局注册表
+# ============================================================================
+
+_caches: Dict[str, ResponseCache] = {}
+
+
+def load_all_caches() -> int:
+    """加载所有启用持久化的缓存（服务启动时调用）"""
+    return sum(cache.load() for cache in _caches.values())
+
+
+def save_all_caches() -> int:
+    """保存所有启用持久化的缓存（服务关闭时调用）"""
+    return sum(cache.save() for cache in _caches.values())
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """各缓存的条目数和命中统计"""
+    stats = {}
+    for name, cache in _caches.items():
+        hits = metrics.get_counter("cache_hits", cache=name)
+        coalesced = metrics.get_counter("cache_coalesced", cache=name)
+        misses = metrics.get_counter("cache_misses", cache=name)
+        total = hits + coalesced + misses
+        stats[name] = {
+            "size": len(cache),
+            "max_entries": cache.max_entries,
+            "ttl": cache.ttl,
+            "hits": hits,
+            "coalesced": coalesced,
+            "misses": misses,
+            "hit_rate": round((hits + coalesced) / total, 4) if total else 0.0,
+        }
+    return stats
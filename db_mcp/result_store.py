@@ -0,0 +1,147 @@
+"""
+查询结果存储
+
+execute_sql_query 的结果超出输出预算时，完整结果保存在服务端，只把前几行和
+列统计返回给 LLM，并附上 result_id；之后可用 fetch_query_result 分页获取、
+用 analyze_data 做统计，而不必把上万行 JSON 放进对话历史。
+
+- 存储基于 ResponseCache（TTL + LRU，不持久化），条目数和有效期可配置
+- result_id 绑定创建时的会话（session_id，与会话工作区相同），连接同一数据库的其他会话也无法读取
+
+使用示例：
+    from db_mcp.result_store import store_result, get_result
+
+    result_id = store_result(sql, columns, rows)
+    stored = get_result(result_id)
+"""
+
+import json
+import time
+import uuid
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from .config import get_int_env
+from .context import get_current_session_id
+from .relevance import estimate_tokens
+from .response_cache import ResponseCache
+
+# 单次工具输出的 token 预算（超出时返回前几行 + 列统计 + result_id）
+TOOL_OUTPUT_TOKEN_BUDGET = get_int_env("TOOL_OUTPUT_TOKEN_BUDGET", 3000)
+# 保存的查询结果数量和有效期（秒）
+RESULT_STORE_SIZE = get_int_env("RESULT_STORE_SIZE", 64)
+RESULT_STORE_TTL = get_int_env("RESULT_STORE_TTL", 1800)
+
+# 列统计中高频值的数量和每个值的最大字符数
+_TOP_VALUES = 5
+_TOP_VALUE_CHARS = 100
+
+_store = ResponseCache("query_results", max_entries=RESULT_STORE_SIZE, ttl=RESULT_STORE_TTL)
+
+
+class StoredResult(NamedTuple):
+    """保存的查询结果"""
+    result_id: str
+    session_id: str
+    sql: str
+    columns: List[str]
+    rows: List[Dict[str, Any]]
+    created_at: float
+
+
+def store_result(sql: str, columns: List[str], rows: List[Dict[str, Any]]) -> str:
+    """
+    保存查询结果
+
+    Args:
+        sql: 执行的 SQL
+        columns: 列名列表
+        rows: 行数据（字典列表）
+
+    Returns:
+        result_id
+    """
+    result_id = f"res_{uuid.uuid4().hex[:16]}"
+    _store.set(result_id, StoredResult(
+        result_id, get_current_session_id(), sql, list(columns), rows, time.time()
+    ))
+    return result_id
+
+
+def get_result(result_id: str) -> Optional[StoredResult]:
+    """读取保存的查询结果（不存在、已过期或属于其他会话时返回 None）"""
+    hit, stored = _store.get((result_id or "").strip())
+    if not hit or stored.session_id != get_current_session_id():
+        return None
+    return stored
+
+
+def column_stats(columns: List[str], rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    逐列统计：非空数、空值数、不同值数；数值列给出最小 / 最大 / 平均值，
+    其他列给出最常见的几个值
+
+    Args:
+        columns: 列名列表
+        rows: 行数据
+
+    Returns:
+        {列名: 统计信息}
+    """
+    stats = {}
+    for column in columns:
+        values = [row.get(column) for row in rows]
+        present = [v for v in values if v is not None]
+        info: Dict[str, Any] = {
+            "non_null": len(present),
+            "nulls": len(values) - len(present),
+        }
+        numbers = [v for v in present if isinstance(v, (int, float)) and not isinstance(v, bool)]
+        if present and len(numbers) == len(present):
+            info["min"] = min(numbers)
+            info["max"] = max(numbers)
+            info["mean"] = round(sum(numbers) / len(numbers), 4)
+            info["distinct"] = len(set(numbers))
+        else:
+            counts: Dict[str, int] = {}
+            for v in present:
+                key = str(v)[:_TOP_VALUE_CHARS]
+                counts[key] = counts.get(key, 0) + 1
+            info["distinct"] = len(counts)
+            info["top_values"] = sorted(counts.items(), key=lambda x: -x[1])[:_TOP_VALUES]
+        stats[column] = info
+    return stats
+
+
+def rows_within_budget(rows: List[Dict[str, Any]], token_budget: int) -> int:
+    """在 token 预算内最多能放下的行数（至少 1 行）"""
+    used = 0
+    for i, row in enumerate(rows):
+        used += estimate_tokens(json.dumps(row, ensure_ascii=False, default=str)) + 1
+        if used > token_budget:
+            return max(i, 1)
+    return len(rows)
+
+
+def shape_rows(
+    columns: List[str],
+    rows: List[Dict[str, Any]],
+    token_budget: int = TOOL_OUTPUT_TOKEN_BUDGET,
+) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Dict[str, Any]]]]:
+    """
+    按输出预算裁剪行数据
+
+    Args:
+        columns: 列名列表
+        rows: 行数据
+        token_budget: token 预算
+
+    Returns:
+        (预算内的前几行, 列统计)；未超出预算时列统计为 None
+    """
+    if estimate_tokens(json.dumps(rows, ensure_ascii=False, default=str)) <= token_budget:
+        return rows, None
+    stats = column_stats(columns, rows)
+    stats_tokens = estimate_tokens(json.dumps(stats, ensure_ascii=False, default=str))
+    # 列统计优先，剩余预算放前几行（至少留一半预算给行数据）
+    row_budget = max(token_budget - stats_tokens, token_budget // 2)
+    return rows[:rows_within_budget(rows, row_budget)], stats
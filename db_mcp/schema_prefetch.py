@@ -0,0 +1,123 @@
+"""
+表结构预取
+
+data_agent 几乎每次都是先一轮 LLM 调用、再调用 get_table_schema。问题到达时在后台
+按词项把问题与表名、表注释（及离线元数据的业务注释）匹配，把最可能用到的表结构
+提前读入缓存，与第一次 LLM 调用并行；Agent 第一次查表结构时直接命中缓存。
+
+- 连接池在预取时建立（首次访问该数据库时省去建连耗时）
+- 快照中已有的表本来就在内存中，只预取快照之外的表（无快照或快照之后新建的表）
+- 预取失败只记录日志，不影响 Agent 执行
+
+使用示例：
+    from db_mcp.schema_prefetch import start_schema_prefetch
+
+    start_schema_prefetch(question)   # 立即返回，后台执行
+"""
+
+import asyncio
+import time
+from typing import List, Set
+
+from . import metrics
+from .config import get_int_env
+from .connection_pool import get_engine
+from .context import resolve_connection
+from .logger import get_logger
+from .metadata_store import get_metadata_store
+from .relevance import rank_documents
+from .schema_snapshot import get_snapshot, get_cached_table_details
+from .table_index import get_table_index, make_index_key
+
+logger = get_logger("mcp.schema_prefetch")
+
+# 每个问题预取的表数量，0 表示关闭预取
+SCHEMA_PREFETCH_TABLES = get_int_env("SCHEMA_PREFETCH_TABLES", 5)
+
+# 后台任务的强引用（避免任务在完成前被垃圾回收）
+_tasks: Set[asyncio.Task] = set()
+
+
+def _candidate_tables(question: str, database: str, tables: List[tuple], limit: int) -> List[str]:
+    """
+    按问题相关度选出候选表
+
+    Args:
+        question: 用户问题
+        database: 数据库名
+        tables: [(表名, 表注释)]
+        limit: 最多返回的表数量
+
+    Returns:
+        相关度大于 0 的前 limit 个表名
+    """
+    metadata = get_metadata_store()
+    documents = []
+    for name, comment in tables:
+        table_meta = metadata.get_table(database, name)
+        text = comment or ""
+        if table_meta:
+            text += f" {table_meta.comment} {table_meta.business_domain}"
+        documents.append((name, text))
+    return [tables[i][0] for score, i in rank_documents(question, documents)[:limit] if score > 0]
+
+
+async def prefetch_schemas(question: str) -> List[str]:
+    """
+    预取与问题相关的表结构
+
+    Args:
+        question: 用户问题
+
+    Returns:
+        预取（读入缓存）的表名列表
+    """
+    connection = resolve_connection()
+    if not connection["host"] or SCHEMA_PREFETCH_TABLES <= 0:
+        return []
+
+    start_time = time.monotonic()
+    database = connection["database"]
+    index_key = make_index_key(
+        connection["host"], connection["port"], connection["username"], database
+    )
+    try:
+        engine = await get_engine(
+            host=connection["host"],
+            port=connection["port"],
+            username=connection["username"],
+            password=connection["password"],
+            database="information_schema",
+        )
+        snapshot = get_snapshot(index_key)
+        async with engine.connect() as conn:
+            if snapshot is not None:
+                tables = [(t.name, t.comment) for t in snapshot.sorted_tables()]
+            else:
+                index = await get_table_index(conn, index_key, database)
+                tables = [(name, index.comment(name)) for name in index.names()]
+
+            candidates = _candidate_tables(question, database, tables, SCHEMA_PREFETCH_TABLES)
+            live = [t for t in candidates if snapshot is None or t not in snapshot.tables]
+            if live:
+                await get_cached_table_details(conn, index_key, database, live)
+    except Exception as e:
+        metrics.increment("schema_prefetch_errors")
+        logger.warning(f"表结构预取失败: {e}", extra={"database": database})
+        return []
+
+    metrics.increment("schema_prefetch_tables", len(live))
+    metrics.observe("schema_prefetch_seconds", time.monotonic() - start_time)
+    logger.info(
+        f"表结构预取完成",
+        extra={"database": database, "candidates": candidates, "fetched": live}
+    )
+    return live
+
+
+def start_schema_prefetch(question: str) -> asyncio.Task:
+    """在后台启动表结构预取（继承当前会话的数据库上下文），立即返回任务"""
+    task = asyncio.create_task(prefetch_schemas(question))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return task
@@ -0,0 +1,544 @@
+"""
+表结构快照
+
+为 db_mapping 中的每个数据库在本地磁盘保存一份表结构快照（表、字段、索引），
+服务启动时直接加载，不必每次重启都从 information_schema 重新读取全部结构。
+
+增量刷新：
+    后台任务定期读取 TABLES（CREATE_TIME / UPDATE_TIME）和每张表的字段数，
+    与快照对比，只对新增或发生变化的表重新读取字段和索引，删除的表直接移除。
+
+存储格式：
+    `<SCHEMA_SNAPSHOT_DIR>/<db_key>.json.gz`，gzip 压缩的 JSON，
+    表/字段/索引均为定长数组（不重复存储键名）。
+
+使用示例：
+    from db_mcp.schema_snapshot import get_snapshot, refresh_snapshot
+
+    snapshot = get_snapshot(index_key)
+    if snapshot:
+        table = snapshot.tables.get(snapshot.name_index.resolve("users"))
+"""
+
+import asyncio
+import gzip
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, text
+
+from .config import get_int_env
+from .connection_pool import get_engine
+from .logger import get_logger
+from .response_cache import ResponseCache
+from .table_index import TABLE_INDEX_TTL, TableNameIndex, invalidate_table_index, make_index_key
+
+logger = get_logger("mcp.schema_snapshot")
+
+# 快照目录（默认为项目根目录下的 snapshots/）
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "snapshots")
+SCHEMA_SNAPSHOT_DIR = os.getenv("SCHEMA_SNAPSHOT_DIR", DEFAULT_SNAPSHOT_DIR)
+# 后台增量刷新间隔（秒），0 表示只在启动时刷新一次
+SCHEMA_SNAPSHOT_REFRESH_INTERVAL = get_int_env("SCHEMA_SNAPSHOT_REFRESH_INTERVAL", 600)
+
+# 快照文件格式版本
+SNAPSHOT_FORMAT_VERSION = 1
+# IN (...) 查询每批的表数量
+_FETCH_BATCH_SIZE = 500
+# 快照之外的表实时读取的字段 / 索引缓存条目数（有效期与表名索引相同）
+TABLE_DETAILS_CACHE_SIZE = get_int_env("TABLE_DETAILS_CACHE_SIZE", 2000)
+
+_details_cache = ResponseCache("table_details", max_entries=TABLE_DETAILS_CACHE_SIZE, ttl=TABLE_INDEX_TTL)
+
+
+# ============================================================================
+# 字段 / 索引批量读取（表结构工具与快照刷新共用）
+# ============================================================================
+
+# 字段元组: (COLUMN_NAME, DATA_TYPE, COLUMN_TYPE, IS_NULLABLE, COLUMN_DEFAULT, COLUMN_COMMENT, EXTRA)
+# 索引元组: (INDEX_NAME, COLUMN_NAME, INDEX_TYPE, NON_UNIQUE)
+
+async def fetch_table_details(
+    conn,
+    database: str,
+    table_names: Optional[List[str]] = None,
+) -> Tuple[Dict[str, List[tuple]], Dict[str, List[tuple]]]:
+    """
+    批量读取表的字段和索引信息
+
+    Args:
+        conn: information_schema 上的异步连接
+        database: 数据库名
+        table_names: 表名列表；为 None 时读取整个库
+
+    Returns:
+        ({表名: [字段元组]}, {表名: [索引元组]})
+    """
+    columns: Dict[str, List[tuple]] = {}
+    indexes: Dict[str, List[tuple]] = {}
+
+    if table_names is None:
+        batches = [None]
+    else:
+        batches = [
+            table_names[i:i + _FETCH_BATCH_SIZE]
+            for i in range(0, len(table_names), _FETCH_BATCH_SIZE)
+        ]
+
+    for batch in batches:
+        table_filter = "AND TABLE_NAME IN :table_names" if batch is not None else ""
+        params: Dict[str, Any] = {"database": database}
+        if batch is not None:
+            params["table_names"] = batch
+
+        columns_sql = text(f"""
+            SELECT
+                TABLE_NAME,
+                COLUMN_NAME,
+                DATA_TYPE,
+                COLUMN_TYPE,
+                IS_NULLABLE,
+                COLUMN_DEFAULT,
+                COLUMN_COMMENT,
+                EXTRA,
+                ORDINAL_POSITION
+            FROM COLUMNS
+            WHERE TABLE_SCHEMA = :database
+            {table_filter}
+            ORDER BY TABLE_NAME, ORDINAL_POSITION
+        """)
+
+        # 索引信息（用于识别主键）
+        indexes_sql = text(f"""
+            SELECT
+                TABLE_NAME,
+                INDEX_NAME,
+                COLUMN_NAME,
+                INDEX_TYPE,
+                NON_UNIQUE
+            FROM STATISTICS
+            WHERE TABLE_SCHEMA = :database
+            {table_filter}
+            ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX
+        """)
+
+        if batch is not None:
+            columns_sql = columns_sql.bindparams(bindparam("table_names", expanding=True))
+            indexes_sql = indexes_sql.bindparams(bindparam("table_names", expanding=True))
+
+        result = await conn.execute(columns_sql, params)
+        for row in result.fetchall():
+            columns.setdefault(row[0], []).append((
+                row[1], row[2], row[3], row[4], row[5], row[6] or "", row[7] or ""
+            ))
+
+        result = await conn.execute(indexes_sql, params)
+        for row in result.fetchall():
+            indexes.setdefault(row[0], []).append((row[1], row[2], row[3], row[4]))
+
+    return columns, indexes
+
+
+async def get_cached_table_details(
+    conn,
+    index_key: str,
+    database: str,
+    table_names: List[str],
+) -> Tuple[Dict[str, List[tuple]], Dict[str, List[tuple]]]:
+    """
+    带缓存的 fetch_table_details：缓存中没有的表一次批量读取后写入缓存
+
+    用于快照中没有的表（无快照或快照之后新建的表），预取和表结构工具共用。
+    其他调用（如后台预取）正在读取的表不重复查询，等待其结果。
+
+    Returns:
+        ({表名: [字段元组]}, {表名: [索引元组]})
+    """
+    keys = {f"{index_key}|{name}": name for name in table_names}
+
+    async def fetch(missing_keys: List[str]) -> Dict[str, tuple]:
+        missing = [keys[key] for key in missing_keys]
+        live_columns, live_indexes = await fetch_table_details(conn, database, missing)
+        return {
+            key: (live_columns.get(keys[key], []), live_indexes.get(keys[key], []))
+            for key in missing_keys
+        }
+
+    details = await _details_cache.get_or_compute_many(list(keys), fetch)
+    columns: Dict[str, List[tuple]] = {}
+    indexes: Dict[str, List[tuple]] = {}
+    for key, name in keys.items():
+        columns[name], indexes[name] = details[key]
+    return columns, indexes
+
+
+def column_dicts(columns: List[tuple]) -> List[Dict[str, Any]]:
+    """字段元组转为 format_table_info 使用的字典"""
+    return [
+        {
+            "column_name": c[0],
+            "data_type": c[1],
+            "column_type": c[2],
+            "is_nullable": c[3],
+            "column_default": c[4],
+            "column_comment": c[5] or "",
+            "extra": c[6] or "",
+        }
+        for c in columns
+    ]
+
+
+def index_dicts(indexes: List[tuple]) -> List[Dict[str, Any]]:
+    """索引元组转为 format_table_info 使用的字典"""
+    return [
+        {
+            "index_name": i[0],
+            "column_name": i[1],
+            "index_type": i[2],
+            "non_unique": i[3],
+        }
+        for i in indexes
+    ]
+
+
+# ============================================================================
+# 快照结构
+# ============================================================================
+
+class TableSnapshot:
+    """单张表的结构快照"""
+
+    __slots__ = (
+        "name", "comment", "engine", "table_rows",
+        "create_time", "update_time", "column_count",
+        "columns", "indexes",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        comment: str,
+        engine: str,
+        table_rows: int,
+        create_time: Optional[str],
+        update_time: Optional[str],
+        column_count: int,
+        columns: List[tuple],
+        indexes: List[tuple],
+    ):
+        self.name = name
+        self.comment = comment
+        self.engine = engine
+        self.table_rows = table_rows
+        self.create_time = create_time
+        self.update_time = update_time
+        self.column_count = column_count
+        self.columns = columns
+        self.indexes = indexes
+
+    def to_row(self) -> list:
+        return [
+            self.name, self.comment, self.engine, self.table_rows,
+            self.create_time, self.update_time, self.column_count,
+            [list(c) for c in self.columns],
+            [list(i) for i in self.indexes],
+        ]
+
+    @classmethod
+    def from_row(cls, row: list) -> "TableSnapshot":
+        return cls(
+            row[0], row[1], row[2], row[3], row[4], row[5], row[6],
+            [tuple(c) for c in row[7]],
+            [tuple(i) for i in row[8]],
+        )
+
+
+class SchemaSnapshot:
+    """
+    单个数据库的结构快照
+
+    Args:
+        db_key: db_mapping 中的标识符
+        config: 数据库连接配置（host / port / username / database）
+        tables: {表名: TableSnapshot}
+        refreshed_at: 最近一次刷新时间戳
+    """
+
+    def __init__(
+        self,
+        db_key: str,
+        config: Dict[str, Any],
+        tables: Dict[str, TableSnapshot],
+        refreshed_at: Optional[float] = None,
+    ):
+        self.db_key = db_key
+        self.host = config.get("host")
+        self.port = config.get("port")
+        self.username = config.get("username")
+        self.database = config.get("database")
+        self.tables = tables
+        self.refreshed_at = refreshed_at or time.time()
+        self._name_index: Optional[TableNameIndex] = None
+
+    @property
+    def index_key(self) -> str:
+        return make_index_key(self.host, self.port, self.username, self.database)
+
+    @property
+    def name_index(self) -> TableNameIndex:
+        """基于快照构建的表名索引（首次访问时构建）"""
+        if self._name_index is None:
+            self._name_index = TableNameIndex(
+                (t.name, t.comment) for t in self.tables.values()
+            )
+        return self._name_index
+
+    def sorted_tables(self) -> List[TableSnapshot]:
+        """按表名排序的表列表"""
+        return [self.tables[name] for name in sorted(self.tables)]
+
+    # ---------- 持久化 ----------
+
+    def to_payload(self) -> Dict[str, Any]:
+        return {
+            "version": SNAPSHOT_FORMAT_VERSION,
+            "db_key": self.db_key,
+            "host": self.host,
+            "port": self.port,
+            "username": self.username,
+            "database": self.database,
+            "refreshed_at": self.refreshed_at,
+            "tables": [t.to_row() for t in self.sorted_tables()],
+        }
+
+    @classmethod
+    def from_payload(cls, payload: Dict[str, Any]) -> "SchemaSnapshot":
+        tables = {}
+        for row in payload.get("tables", []):
+            table = TableSnapshot.from_row(row)
+            tables[table.name] = table
+        return cls(payload["db_key"], payload, tables, payload.get("refreshed_at"))
+
+    def save(self, snapshot_dir: Optional[str] = None) -> str:
+        """写入快照文件（先写临时文件再替换，避免读到半个文件）"""
+        path = snapshot_path(self.db_key, snapshot_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(self.to_payload(), f, ensure_ascii=False, separators=(",", ":"), default=str)
+        os.replace(tmp_path, path)
+        return path
+
+
+def snapshot_path(db_key: str, snapshot_dir: Optional[str] = None) -> str:
+    """快照文件路径"""
+    safe_key = "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in db_key)
+    return os.path.join(snapshot_dir or SCHEMA_SNAPSHOT_DIR, f"{safe_key}.json.gz")
+
+
+# ============================================================================
+# 全局快照表
+# ============================================================================
+
+# key: make_index_key(...)，value: SchemaSnapshot
+_snapshots: Dict[str, SchemaSnapshot] = {}
+_refresh_locks: Dict[str, asyncio.Lock] = {}
+
+
+def get_snapshot(index_key: str) -> Optional[SchemaSnapshot]:
+    """获取数据库的结构快照（未加载时返回 None）"""
+    return _snapshots.get(index_key)
+
+
+def load_snapshot(db_key: str, config: Dict[str, Any]) -> Optional[SchemaSnapshot]:
+    """
+    从磁盘加载单个数据库的快照
+
+    连接配置与快照记录的不一致（例如映射修改了 host）时忽略该文件。
+    """
+    path = snapshot_path(db_key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            payload = json.load(f)
+        if payload.get("version") != SNAPSHOT_FORMAT_VERSION:
+            logger.warning(f"快照版本不匹配，忽略: {path}")
+            return None
+        snapshot = SchemaSnapshot.from_payload(payload)
+    except (OSError, ValueError, KeyError, IndexError) as e:
+        logger.error(f"加载快照失败 {path}: {e}")
+        return None
+
+    expected_key = make_index_key(
+        config.get("host"), config.get("port"), config.get("username"), config.get("database")
+    )
+    if snapshot.index_key != expected_key:
+        logger.warning(f"快照与当前映射配置不一致，忽略: {db_key}")
+        return None
+
+    _snapshots[snapshot.index_key] = snapshot
+    logger.info(f"已加载表结构快照: {db_key}（{len(snapshot.tables)} 个表）")
+    return snapshot
+
+
+def load_snapshots(mapping: Dict[str, Dict[str, Any]]) -> int:
+    """
+    加载 db_mapping 中所有数据库的快照
+
+    Returns:
+        成功加载的数量
+    """
+    return sum(1 for db_key, config in mapping.items() if load_snapshot(db_key, config))
+
+
+async def refresh_snapshot(db_key: str, config: Dict[str, Any]) -> SchemaSnapshot:
+    """
+    增量刷新单个数据库的快照
+
+    对比 CREATE_TIME / UPDATE_TIME 和字段数，只重新读取变化的表；
+    没有旧快照时读取整个库。有变化时写回磁盘。
+
+    Args:
+        db_key: db_mapping 标识符
+        config: 数据库连接配置
+
+    Returns:
+        刷新后的 SchemaSnapshot
+    """
+    database = config["database"]
+    index_key = make_index_key(config["host"], config["port"], config["username"], database)
+    lock = _refresh_locks.setdefault(index_key, asyncio.Lock())
+
+    async with lock:
+        previous = _snapshots.get(index_key)
+        start_time = time.time()
+
+        engine = await get_engine(
+            host=config["host"],
+            port=config["port"],
+            username=config["username"],
+            password=config.get("password", ""),
+            database="information_schema",
+        )
+
+        async with engine.connect() as conn:
+            tables_sql = text("""
+                SELECT TABLE_NAME, TABLE_COMMENT, ENGINE, TABLE_ROWS, CREATE_TIME, UPDATE_TIME
+                FROM TABLES
+                WHERE TABLE_SCHEMA = :database
+                AND TABLE_TYPE = 'BASE TABLE'
+            """)
+            result = await conn.execute(tables_sql, {"database": database})
+            live_tables = result.fetchall()
+
+            counts_sql = text("""
+                SELECT TABLE_NAME, COUNT(*)
+                FROM COLUMNS
+                WHERE TABLE_SCHEMA = :database
+                GROUP BY TABLE_NAME
+            """)
+            result = await conn.execute(counts_sql, {"database": database})
+            column_counts = {row[0]: row[1] for row in result.fetchall()}
+
+            previous_tables = previous.tables if previous else {}
+            changed = []
+            for row in live_tables:
+                name = row[0]
+                old = previous_tables.get(name)
+                if (
+                    old is None
+                    or old.create_time != _time_str(row[4])
+                    or old.update_time != _time_str(row[5])
+                    or old.column_count != column_counts.get(name, 0)
+                ):
+                    changed.append(name)
+
+            live_names = {row[0] for row in live_tables}
+            removed = [name for name in previous_tables if name not in live_names]
+
+            if previous is None:
+                columns, indexes = await fetch_table_details(conn, database)
+            elif changed:
+                columns, indexes = await fetch_table_details(conn, database, changed)
+            else:
+                columns, indexes = {}, {}
+
+        changed_set = set(changed)
+        tables: Dict[str, TableSnapshot] = {}
+        for row in live_tables:
+            name = row[0]
+            if name in changed_set:
+                tables[name] = TableSnapshot(
+                    name=name,
+                    comment=row[1] or "",
+                    engine=row[2] or "",
+                    table_rows=row[3] or 0,
+                    create_time=_time_str(row[4]),
+                    update_time=_time_str(row[5]),
+                    column_count=column_counts.get(name, 0),
+                    columns=columns.get(name, []),
+                    indexes=indexes.get(name, []),
+                )
+            else:
+                old = previous_tables[name]
+                # 结构未变化，只更新估算行数等轻量信息
+                old.comment = row[1] or ""
+                old.table_rows = row[3] or 0
+                tables[name] = old
+
+        snapshot = SchemaSnapshot(db_key, config, tables)
+        _snapshots[index_key] = snapshot
+
+        if changed or removed:
+            # 实时表名索引可能还保留已删除 / 缺少新建的表，下次使用时重新加载
+            invalidate_table_index(index_key)
+            try:
+                await asyncio.to_thread(snapshot.save)
+            except OSError as e:
+                logger.error(f"写入快照失败 ({db_key}): {e}")
+
+        logger.info(
+            f"表结构快照已刷新: {db_key}",
+            extra={
+                "tables": len(tables),
+                "changed": len(changed),
+                "removed": len(removed),
+                "elapsed_ms": round((time.time() - start_time) * 1000, 2),
+            }
+        )
+        return snapshot
+
+
+async def refresh_all_snapshots(mapping: Dict[str, Dict[str, Any]]):
+    """依次刷新所有映射数据库的快照，单个失败不影响其他"""
+    for db_key, config in list(mapping.items()):
+        try:
+            await refresh_snapshot(db_key, config)
+        except Exception as e:
+            logger.error(f"刷新快照失败 ({db_key}): {e}")
+
+
+async def snapshot_refresh_loop(get_mapping):
+    """
+    后台刷新循环：启动时立即刷新一次，之后按间隔增量刷新
+
+    Args:
+        get_mapping: 返回当前 db_mapping 字典的函数（映射可能在运行期间变化）
+    """
+    while True:
+        await refresh_all_snapshots(get_mapping())
+        if SCHEMA_SNAPSHOT_REFRESH_INTERVAL <= 0:
+            return
+        await asyncio.sleep(SCHEMA_SNAPSHOT_REFRESH_INTERVAL)
+
+
+def _time_str(value) -> Optional[str]:
+    """CREATE_TIME / UPDATE_TIME 统一为字符串，便于比较和持久化"""
+    if value is None:
+        return None
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
@@ -5,6 +5,7 @@ DB Analysis MCP Server (SSE)
     http://localhost:8000/sse?db=singa
 """
 
+import asyncio
 import os
 from contextlib import asynccontextmanager
 from typing import Dict, Any
@@ -20,6 +21,13 @@ from starlette.middleware import Middleware
 import uvicorn
 
 from .logger import configure_logging, get_logger
+from .context import (
+    bind_db_context,
+    reset_db_context,
+    get_db_context,
+    get_current_db_config,
+    get_current_db_key,
+)
 
 # ---------- 初始化 ----------
 
@@ -39,10 +47,6 @@ logger = get_logger("mcp.server")
 _db_mapping: Dict[str, Dict[str, Any]] = {}
 _db_mapping_service = None  # 延迟初始化
 
-# 当前请求上下文（每次请求由中间件更新）
-_current_db_config: Dict[str, Any] = {}
-_current_db_key: str = "default"
-
 
 def _get_mapping_service():
     """获取 DBMappingService 单例（延迟初始化）"""
@@ -96,16 +100,6 @@ def refresh_db_mapping() -> Dict[str, Dict[str, Any]]:
     return load_db_mapping()
 
 
-# ---------- 当前请求上下文（中间件 / tool 使用） ----------
-
-def get_current_db_config() -> Dict[str, Any]:
-    return _current_db_config
-
-
-def get_current_db_key() -> str:
-    return _current_db_key
-
-
 # ---------- MCP 实例 & 工具注册 ----------
 
 mcp = FastMCP(
@@ -134,7 +128,7 @@ async def root(request):
     db_keys = list(_db_mapping.keys()) if _db_mapping else []
     return JSONResponse({
         "message": "MCP Server running",
-        "endpoints": {"/sse": "MCP SSE", "/health": "健康检查", "/refresh": "刷新映射"},
+        "endpoints": {"/sse": "MCP SSE", "/health": "健康检查", "/refresh": "刷新映射", "/metrics": "运行指标"},
         "available_databases": db_keys,
         "total": len(db_keys),
         "usage": "/sse?db=<database_name>",
@@ -149,19 +143,70 @@ async def refresh_mapping(request):
     return JSONResponse({"status": "ok", "total": len(db_keys), "available_databases": db_keys})
 
 
+async def metrics_endpoint(request):
+    """运行指标（计数器、缓存命中率等）"""
+    from . import metrics
+    from .response_cache import cache_stats
+    return JSONResponse({**metrics.snapshot(), "caches": cache_stats()})
+
+
 # ---------- 生命周期 ----------
 
 @asynccontextmanager
 async def lifespan(app):
-    """启动时加载映射，关闭时清理连接池"""
+    """启动时加载映射、离线元数据和表结构快照并创建 HTTP 客户端，关闭时逐一清理"""
     logger.info("MCP Server 启动中...")
     mapping = load_db_mapping()
     db_keys = list(mapping.keys())
     if db_keys:
         logger.info(f"可用数据库 ({len(db_keys)}): {', '.join(db_keys)}")
 
+    # 加载离线元数据（业务注释、业务域等），供表结构查询合并使用
+    from .metadata_store import load_metadata_store
+    await asyncio.to_thread(load_metadata_store)
+
+    # 构建本地知识索引（元数据、数据字典、Redash 历史查询），供 search_metadata 使用
+    from .knowledge_index import load_knowledge_index
+    await asyncio.to_thread(load_knowledge_index)
+
+    # 历史查询索引（表 -> Redash 查询、SQL 指纹），供 search_historical_queries 使用
+    from .query_history import load_query_history
+    await asyncio.to_thread(load_query_history)
+
+    # 表关联图（历史 SQL 中的等值关联），供 suggest_join_path 使用
+    from .join_graph import load_join_graph
+    await asyncio.to_thread(load_join_graph)
+
+    # 表热度（历史查询数、仪表板数、最近使用），用于表摘要、模糊匹配和元数据搜索排序
+    from .popularity import load_popularity
+    await asyncio.to_thread(load_popularity)
+
+    # 加载本地表结构快照，并在后台增量刷新（只重新读取有变化的表）
+    from .schema_snapshot import load_snapshots, snapshot_refresh_loop
+    loaded = await asyncio.to_thread(load_snapshots, mapping)
+    logger.info(f"表结构快照已加载: {loaded}/{len(mapping)}")
+    refresh_task = asyncio.create_task(snapshot_refresh_loop(lambda: _db_mapping))
+
+    # 共享的异步 HTTP 客户端（LightRAG 查询）
+    from .http_client import create_http_client, close_http_client
+    create_http_client()
+
+    # 加载持久化的响应缓存（LightRAG 查询结果等）
+    from .response_cache import load_all_caches, save_all_caches
+    await asyncio.to_thread(load_all_caches)
+
     yield
 
+    await asyncio.to_thread(save_all_caches)
+
+    refresh_task.cancel()
+    try:
+        await refresh_task
+    except asyncio.CancelledError:
+        pass
+
+    await close_http_client()
+
     try:
         from .connection_pool import close_all_pools
         await close_all_pools()
@@ -174,13 +219,18 @@ async def lifespan(app):
 # ---------- 纯 ASGI 中间件：从 URL ?db= 解析数据库配置 ----------
 
 class DatabaseConfigMiddleware:
-    """纯 ASGI 中间件，从 query_string 中提取 db 参数并设置当前请求的数据库配置"""
+    """
+    纯 ASGI 中间件，从 query_string 中提取 db 参数并绑定当前请求的数据库上下文
+
+    上下文存放在 ContextVar 中（见 context.py）：/sse 请求内运行的 MCP 会话及其工具调用
+    都能读到该会话自己的配置，并发会话之间互不影响；请求结束后恢复。
+    """
 
     def __init__(self, app):
         self.app = app
 
     async def __call__(self, scope, receive, send):
-        global _current_db_config, _current_db_key
+        token = None
 
         if scope["type"] in ("http", "websocket"):
             qs = scope.get("query_string", b"").decode()
@@ -188,15 +238,21 @@ class DatabaseConfigMiddleware:
                 params = parse_qs(qs)
                 if "db" in params:
                     db_key = params["db"][0]
-                    _current_db_key = db_key
                     db_config = get_db_config(db_key)
                     if db_config:
-                        _current_db_config = db_config
                         logger.debug(f"数据库映射: {db_key}")
                     else:
                         logger.warning(f"未找到映射: {db_key}")
+                    token = bind_db_context(db_key, db_config)
 
-        await self.app(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if token is not None:
+                # 连接结束（SSE 会话关闭）时释放该会话的结果工作区
+                from .workspace import drop_workspace
+                drop_workspace(get_db_context().session_id)
+                reset_db_context(token)
 
 
 # ---------- Starlette 应用 ----------
@@ -209,6 +265,7 @@ app = Starlette(
         Route("/", endpoint=root),
         Route("/health", endpoint=health_check),
         Route("/refresh", endpoint=refresh_mapping),
+        Route("/metrics", endpoint=metrics_endpoint),
         Mount("/", app=mcp.sse_app()),
     ],
 )
@@ -229,6 +286,7 @@ def start_server():
   SSE:     http://{host}:{port}/sse?db=<name>
   Health:  http://{host}:{port}/health
   Refresh: http://{host}:{port}/refresh
+  Metrics: http://{host}:{port}/metrics
   Workers: {workers}
 {'=' * 45}""")
 
@@ -0,0 +1,295 @@
+"""
+表名索引
+
+为每个数据库在进程内维护一份表名索引，表名解析与"你是不是要找"提示
+都在本地完成，不再对 information_schema.TABLES 做 LOWER()/LIKE 全表扫描。
+
+索引结构：
+- 精确匹配：表名 -> 表名
+- 大小写不敏感：casefold(表名) -> 表名
+- 模糊匹配：三元组（trigram）倒排索引召回候选，再用编辑距离重排序
+
+使用示例：
+    from db_mcp.table_index import get_table_index, make_index_key
+
+    index = await get_table_index(conn, make_index_key(host, port, username, database), database)
+    actual_name = index.resolve("Users")
+    suggestions = index.suggest("usres")
+"""
+
+import asyncio
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from .config import get_int_env
+from .logger import get_logger
+
+logger = get_logger("mcp.table_index")
+
+# 索引缓存有效期（秒），过期后下一次访问时重新加载
+TABLE_INDEX_TTL = get_int_env("TABLE_INDEX_TTL", 300)
+# 未命中时，索引超过该时长（秒）则重新加载一次（处理新建表）
+TABLE_INDEX_MISS_REFRESH = get_int_env("TABLE_INDEX_MISS_REFRESH", 30)
+
+
+# ============================================================================
+# 相似度辅助函数
+# ============================================================================
+
+def _trigrams(s: str) -> set:
+    """生成带边界填充的三元组集合"""
+    padded = f"  {s} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a: str, b: str) -> int:
+    """Levenshtein 编辑距离（两行滚动数组）"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            ))
+        previous = current
+    return previous[-1]
+
+
+# ============================================================================
+# 索引
+# ============================================================================
+
+class TableNameIndex:
+    """
+    单个数据库的表名索引
+
+    Args:
+        tables: (表名, 表注释) 序列
+    """
+
+    # 模糊匹配的最低三元组相似度（Dice 系数）
+    MIN_SIMILARITY = 0.3
+    # 进入编辑距离重排序的候选数量
+    RERANK_CANDIDATES = 20
+
+    def __init__(self, tables: Iterable[Tuple[str, str]]):
+        self._names: List[str] = []
+        self._folded: List[str] = []
+        self._comments: Dict[str, str] = {}
+        self._exact: Dict[str, str] = {}
+        self._casefold: Dict[str, str] = {}
+        self._trigram_postings: Dict[str, List[int]] = {}
+        self._trigram_counts: List[int] = []
+        self.loaded_at = time.time()
+
+        for name, comment in tables:
+            if not name or name in self._exact:
+                continue
+            folded = name.casefold()
+            table_id = len(self._names)
+            self._names.append(name)
+            self._folded.append(folded)
+            self._comments[name] = comment or ""
+            self._exact[name] = name
+            self._casefold.setdefault(folded, name)
+
+            grams = _trigrams(folded)
+            self._trigram_counts.append(len(grams))
+            for gram in grams:
+                self._trigram_postings.setdefault(gram, []).append(table_id)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name: str) -> bool:
+        return self.resolve(name) is not None
+
+    @property
+    def age(self) -> float:
+        """索引已存在的秒数"""
+        return time.time() - self.loaded_at
+
+    def names(self) -> List[str]:
+        """按字母序返回全部表名"""
+        return sorted(self._names)
+
+    def comment(self, name: str) -> str:
+        """获取表注释（表名需为实际表名）"""
+        return self._comments.get(name, "")
+
+    def resolve(self, name: str) -> Optional[str]:
+        """
+        解析实际表名：先精确匹配，再大小写不敏感匹配
+
+        Args:
+            name: 用户或 LLM 给出的表名（允许带 `schema.` 前缀和反引号）
+
+        Returns:
+            实际表名，未找到返回 None
+        """
+        if not name:
+            return None
+        name = name.strip().strip("`")
+        if "." in name:
+            name = name.rsplit(".", 1)[-1].strip("`")
+        if name in self._exact:
+            return name
+        return self._casefold.get(name.casefold())
+
+    def suggest(
+        self,
+        name: str,
+        limit: int = 10,
+        popularity: Optional[Callable[[str], float]] = None
+    ) -> List[str]:
+        """
+        "你是不是要找"：返回与 name 最相似的表名
+
+        子串匹配优先（兼容原 LIKE '%name%' 的行为），其余候选按三元组
+        相似度召回、编辑距离排序；编辑距离相同时常用的表优先。
+
+        Args:
+            name: 查询的表名
+            limit: 最多返回的数量
+            popularity: 表名 -> 热度的函数（可选，如 get_popularity().score）
+
+        Returns:
+            相似表名列表，按相似度降序
+        """
+        if not name:
+            return []
+        query = name.strip().strip("`").casefold()
+        if "." in query:
+            query = query.rsplit(".", 1)[-1].strip("`")
+
+        query_grams = _trigrams(query)
+        overlap: Dict[int, int] = {}
+        for gram in query_grams:
+            for table_id in self._trigram_postings.get(gram, ()):
+                overlap[table_id] = overlap.get(table_id, 0) + 1
+
+        scored = []
+        for table_id, shared in overlap.items():
+            dice = 2.0 * shared / (len(query_grams) + self._trigram_counts[table_id])
+            is_substring = query in self._folded[table_id]
+            if is_substring or dice >= self.MIN_SIMILARITY:
+                scored.append((is_substring, dice, table_id))
+
+        # 子串匹配的候选优先，其次按三元组相似度截取候选
+        scored.sort(key=lambda x: (not x[0], -x[1]))
+        candidates = scored[:self.RERANK_CANDIDATES]
+
+        reranked = sorted(
+            candidates,
+            key=lambda x: (
+                not x[0],
+                _edit_distance(query, self._folded[x[2]]),
+                -popularity(self._names[x[2]]) if popularity else 0.0,
+                -x[1],
+                self._names[x[2]],
+            ),
+        )
+        return [self._names[table_id] for _, _, table_id in reranked[:limit]]
+
+
+# ============================================================================
+# 缓存与加载
+# ============================================================================
+
+# key: make_index_key(...)，value: TableNameIndex
+_indexes: Dict[str, TableNameIndex] = {}
+_index_locks: Dict[str, asyncio.Lock] = {}
+
+
+def make_index_key(host: str, port: int, username: str, database: str) -> str:
+    """生成表名索引的缓存 key（与连接池 key 同构）"""
+    return f"{host}:{port}@{username}@{database}"
+
+
+async def _load_table_index(conn, database: str) -> TableNameIndex:
+    """从 information_schema.TABLES 加载表名索引"""
+    tables_sql = text("""
+        SELECT TABLE_NAME, TABLE_COMMENT
+        FROM TABLES
+        WHERE TABLE_SCHEMA = :database
+        AND TABLE_TYPE = 'BASE TABLE'
+    """)
+    result = await conn.execute(tables_sql, {"database": database})
+    index = TableNameIndex((row[0], row[1] or "") for row in result.fetchall())
+    logger.info(f"表名索引已加载: {database}（{len(index)} 个表）")
+    return index
+
+
+async def get_table_index(
+    conn,
+    index_key: str,
+    database: str,
+    force_reload: bool = False,
+) -> TableNameIndex:
+    """
+    获取数据库的表名索引（带 TTL 缓存）
+
+    Args:
+        conn: information_schema 上的异步连接
+        index_key: 缓存 key，见 make_index_key
+        database: 目标数据库名
+        force_reload: 是否忽略缓存强制重新加载
+
+    Returns:
+        TableNameIndex 实例
+    """
+    index = _indexes.get(index_key)
+    if index is not None and not force_reload and index.age < TABLE_INDEX_TTL:
+        return index
+
+    lock = _index_locks.setdefault(index_key, asyncio.Lock())
+    async with lock:
+        # 等锁期间可能已被其他协程加载
+        current = _indexes.get(index_key)
+        if current is not None and current is not index and current.age < TABLE_INDEX_TTL:
+            return current
+        if current is not None and not force_reload and current.age < TABLE_INDEX_TTL:
+            return current
+
+        index = await _load_table_index(conn, database)
+        _indexes[index_key] = index
+        return index
+
+
+async def resolve_table_name(
+    conn,
+    index_key: str,
+    database: str,
+    table_name: str,
+) -> Tuple[Optional[str], TableNameIndex]:
+    """
+    解析实际表名；未命中且索引不是刚加载的，则重新加载一次再试
+
+    Returns:
+        (实际表名或 None, 使用的索引)
+    """
+    index = await get_table_index(conn, index_key, database)
+    actual = index.resolve(table_name)
+    if actual is None and index.age > TABLE_INDEX_MISS_REFRESH:
+        index = await get_table_index(conn, index_key, database, force_reload=True)
+        actual = index.resolve(table_name)
+    return actual, index
+
+
+def invalidate_table_index(index_key: Optional[str] = None):
+    """
+    使表名索引失效
+
+    Args:
+        index_key: 指定 key；为空时清空全部索引
+    """
+    if index_key is None:
+        _indexes.clear()
+    else:
+        _indexes.pop(index_key, None)
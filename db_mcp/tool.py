@@ -1,13 +1,16 @@
 """
 MCP Tools - 数据分析工具定义
-只暴露 data_agent 工具，其他工具由 Agent 内部调用
+默认只暴露 data_agent 工具，其他工具由 Agent 内部调用
 
-该模块负责注册 MCP 工具到服务器。对外只暴露一个 data_agent 工具，
+该模块负责注册 MCP 工具到服务器。默认对外只暴露一个 data_agent 工具，
 该工具内部会调用 LangChain Agent，Agent 会根据需要调用三个内部工具：
 - execute_sql_query: 执行 SQL 查询
 - get_table_schema: 获取表结构
 - search_knowledge_graph: 搜索知识图谱
 
+设置 MCP_EXPOSE_LOW_LEVEL_TOOLS=true 时，Agent 内部工具也直接注册为 MCP 工具，
+自带 LLM 的客户端可以自己驱动 SQL，不再经过服务端 Agent。
+
 使用方式：
     # 该模块会被 server.py 自动导入和调用
     from .tool import register_tools
@@ -16,8 +19,30 @@ MCP Tools - 数据分析工具定义
 
 import os
 import json
+import time
+import asyncio
+import inspect
 from typing import Optional, Dict, Any
 
+from mcp.server.fastmcp import Context
+from mcp.types import ToolAnnotations
+
+from .fast_path import route_query, run_fast_path
+from .schema_prefetch import start_schema_prefetch
+from .logger import get_logger
+
+logger = get_logger("mcp.tool")
+
+# LLM 输出 token 的进度通知合并发送：累计字符数或间隔（秒）达到任一阈值时发送一次
+PROGRESS_TOKEN_FLUSH_CHARS = 200
+PROGRESS_TOKEN_FLUSH_INTERVAL = 0.5
+# 工具参数 / 结果在进度通知中的预览长度
+PROGRESS_PREVIEW_CHARS = 500
+
+# 是否把 Agent 内部工具（execute_sql_query、get_table_schema 等）直接注册为 MCP 工具。
+# 自带 LLM 的客户端（Cursor、Claude Desktop 等）可以自己调用这些工具，不再经过服务端 Agent
+MCP_EXPOSE_LOW_LEVEL_TOOLS = os.getenv("MCP_EXPOSE_LOW_LEVEL_TOOLS", "false").lower() == "true"
+
 
 # ============================================================================
 # 数据库配置获取函数
@@ -25,30 +50,24 @@ from typing import Optional, Dict, Any
 
 def get_current_db_config_from_server() -> Dict[str, Any]:
     """
-    从 server 模块获取当前请求的数据库配置
+    获取当前会话的数据库配置（由中间件绑定到请求上下文）
 
     Returns:
         当前数据库配置字典，包含 host, port, username, password, database
     """
-    try:
-        from .server import get_current_db_config
-        return get_current_db_config()
-    except ImportError:
-        return {}
+    from .context import get_current_db_config
+    return get_current_db_config()
 
 
 def get_current_db_key_from_server() -> str:
     """
-    从 server 模块获取当前请求的数据库标识符
+    获取当前会话的数据库标识符（由中间件绑定到请求上下文）
 
     Returns:
         数据库标识符字符串
     """
-    try:
-        from .server import get_current_db_key
-        return get_current_db_key()
-    except ImportError:
-        return "default"
+    from .context import get_current_db_key
+    return get_current_db_key()
 
 
 def get_default_db_config() -> Dict[str, Any]:
@@ -61,6 +80,153 @@ def get_default_db_config() -> Dict[str, Any]:
     return get_current_db_config_from_server()
 
 
+# ============================================================================
+# 流式进度通知
+# ============================================================================
+
+def _preview(value: Any) -> str:
+    """工具参数 / 结果的文本预览"""
+    content = getattr(value, "content", value)
+    if not isinstance(content, str):
+        try:
+            content = json.dumps(content, ensure_ascii=False, default=str)
+        except (TypeError, ValueError):
+            content = str(content)
+    if len(content) > PROGRESS_PREVIEW_CHARS:
+        content = content[:PROGRESS_PREVIEW_CHARS] + "..."
+    return content
+
+
+def _extract_reply(result: Any) -> str:
+    """从 Agent 的最终状态中提取最后一条有内容的消息"""
+    if isinstance(result, dict) and "messages" in result:
+        for msg in reversed(result["messages"]):
+            if hasattr(msg, "content") and msg.content:
+                return msg.content
+            elif isinstance(msg, dict) and msg.get("content"):
+                return msg["content"]
+    return str(result)
+
+
+class _ProgressReporter:
+    """
+    把 Agent 事件转成 MCP 进度通知
+
+    客户端请求中带 progressToken 时才会真正发送（由 FastMCP 判断）；
+    发送失败（如客户端已断开）只记录日志，不影响 Agent 执行。
+    """
+
+    def __init__(self, ctx: Optional[Context]):
+        self.ctx = ctx
+        self.step = 0
+        self._tokens: list = []
+        self._token_chars = 0
+        self._last_flush = time.monotonic()
+
+    async def send(self, message: str):
+        if self.ctx is None:
+            return
+        self.step += 1
+        try:
+            await self.ctx.report_progress(self.step, None, message)
+        except Exception as e:
+            logger.debug(f"进度通知发送失败: {e}")
+
+    async def add_token(self, text: str):
+        """累积 LLM 输出片段，达到阈值时合并发送"""
+        self._tokens.append(text)
+        self._token_chars += len(text)
+        if (
+            self._token_chars >= PROGRESS_TOKEN_FLUSH_CHARS
+            or time.monotonic() - self._last_flush >= PROGRESS_TOKEN_FLUSH_INTERVAL
+        ):
+            await self.flush_tokens()
+
+    async def flush_tokens(self):
+        self._last_flush = time.monotonic()
+        if not self._tokens:
+            return
+        text = "".join(self._tokens)
+        self._tokens.clear()
+        self._token_chars = 0
+        await self.send(text)
+
+
+async def _run_agent_with_progress(agent, inputs: dict, ctx: Optional[Context]) -> str:
+    """
+    流式运行 Agent，工具开始 / 结束和 LLM 输出片段作为进度通知转发给客户端
+
+    Args:
+        agent: LangChain Agent（CompiledStateGraph）
+        inputs: Agent 输入
+        ctx: FastMCP 请求上下文
+
+    Returns:
+        Agent 的最终回复
+    """
+    reporter = _ProgressReporter(ctx)
+    final_state = None
+
+    async for event in agent.astream_events(inputs, version="v2"):
+        kind = event["event"]
+        if kind == "on_chat_model_stream":
+            content = getattr(event["data"].get("chunk"), "content", "")
+            if isinstance(content, str) and content:
+                await reporter.add_token(content)
+        elif kind == "on_tool_start":
+            await reporter.flush_tokens()
+            await reporter.send(f"调用工具 {event['name']}: {_preview(event['data'].get('input'))}")
+        elif kind == "on_tool_end":
+            await reporter.send(f"工具 {event['name']} 完成: {_preview(event['data'].get('output'))}")
+        elif kind == "on_chain_end" and not event.get("parent_ids"):
+            # 顶层图结束，输出即最终状态
+            final_state = event["data"].get("output")
+
+    await reporter.flush_tokens()
+    return _extract_reply(final_state)
+
+
+# ============================================================================
+# 底层工具直接暴露
+# ============================================================================
+
+def _register_langchain_tool(mcp, lc_tool):
+    """
+    把 LangChain 工具注册为 MCP 工具
+
+    MCP 参数与模型可见的参数一致（tool_call_schema），连接参数等 InjectedToolArg
+    不暴露给客户端，调用时由 resolve_connection() 取当前会话绑定的配置。
+    """
+    signature = inspect.signature(lc_tool.coroutine)
+    visible = lc_tool.tool_call_schema.model_fields
+    parameters = [p for name, p in signature.parameters.items() if name in visible]
+
+    async def handler(**kwargs) -> str:
+        return await lc_tool.ainvoke(kwargs)
+
+    handler.__name__ = lc_tool.name
+    handler.__signature__ = signature.replace(parameters=parameters)
+    mcp.add_tool(
+        handler,
+        name=lc_tool.name,
+        description=lc_tool.description,
+        annotations=ToolAnnotations(readOnlyHint=True),
+    )
+
+
+def register_low_level_tools(mcp):
+    """
+    把 Agent 内部工具直接注册为 MCP 工具（MCP_EXPOSE_LOW_LEVEL_TOOLS=true 时启用）
+
+    工具使用当前会话（URL 中的 ?db=）绑定的数据库，客户端无需传入连接参数。
+    """
+    import tools
+
+    for name in tools.__all__:
+        _register_langchain_tool(mcp, getattr(tools, name))
+    logger.info(f"已直接暴露 {len(tools.__all__)} 个底层工具", extra={"tools": tools.__all__})
+
+
 # ============================================================================
 # 工具注册
 # ============================================================================
@@ -76,11 +242,15 @@ def register_tools(mcp):
 
     注册的工具：
         - data_agent: 数据分析智能体（自然语言查询接口）
+        - MCP_EXPOSE_LOW_LEVEL_TOOLS=true 时另外注册 execute_sql_query、get_table_schema 等底层工具
     """
+    if MCP_EXPOSE_LOW_LEVEL_TOOLS:
+        register_low_level_tools(mcp)
 
     @mcp.tool()
     async def data_agent(
-        query: str
+        query: str,
+        ctx: Context
     ) -> str:
         """
         数据分析智能体 - 通过自然语言查询和分析数据库
@@ -100,6 +270,15 @@ def register_tools(mcp):
         - get_table_schema: 获取表结构
         - search_knowledge_graph: 搜索知识图谱进行问答（业务逻辑、历史 SQL、BI库里的表和字段命名规则）
 
+        直接发送的 SELECT 语句和 "显示 X 表的结构" 这类请求不经过 LLM，
+        直接执行并返回工具结果（DATA_AGENT_FAST_PATH=false 可关闭）。
+
+        每次调用有耗时、LLM 调用次数和 SQL 调用次数预算（AGENT_MAX_SECONDS / AGENT_MAX_LLM_CALLS /
+        AGENT_MAX_SQL_CALLS），用完时根据已获得的结果返回部分回答。
+
+        执行过程中以 MCP 进度通知流式推送工具调用、查询结果预览和模型输出片段
+        （客户端请求需携带 progressToken）。
+
         Args:
             query: 用户的数据分析问题或查询需求
 
@@ -139,51 +318,48 @@ def register_tools(mcp):
         # 获取当前数据库标识符用于日志
         db_key = get_current_db_key_from_server()
 
+        # 快速路径：原始 SQL / 表结构请求直接执行，不经过 LLM（失败时回退到 Agent）
+        route = route_query(query)
+        if route is not None:
+            await _ProgressReporter(ctx).send(f"快速路径: {route[0]}")
+            reply = await run_fast_path(route)
+            if reply is not None:
+                return reply
+
+        # 与第一次 LLM 调用并行预取可能用到的表结构
+        start_schema_prefetch(query)
+
+        budget_token = None
         try:
             from agent.data_simple_agent import get_agent
+            from agent.budget import AgentBudget, bind_budget
 
             agent = get_agent()
-            # 使用 ainvoke 异步调用 Agent（工具是 async 的，必须用 ainvoke）
-            result = await agent.ainvoke({
+            # 本次调用的耗时 / LLM / SQL 预算，用完时返回部分回答
+            budget = AgentBudget()
+            budget_token = bind_budget(budget)
+            # 流式执行 Agent（工具是 async 的，必须用异步接口），过程中推送进度通知
+            run = _run_agent_with_progress(agent, {
                 "messages": [
                     {
                         "role": "system",
-                        "content": f"""你是一个数据分析智能体。当前数据库配置（标识符: {db_key}）：
-- 主机: {config['host']}
-- 端口: {config['port']}
-- 用户: {config['username']}
-- 数据库: {config['database']}
-
-可用工具：
-1. execute_sql_query - 执行 SQL 查询（需要传入数据库连接参数）
-2. get_table_schema - 获取表结构（需要传入数据库连接参数）
-3. search_knowledge_graph - 搜索知识图谱（业务逻辑、历史 SQL）
-
-重要：调用 execute_sql_query 和 get_table_schema 时，必须传入以下参数：
-- host: {config['host']}
-- port: {config['port']}
-- username: {config['username']}
-- password: {config['password']}
-- database: {config['database']}
-"""
+                        "content": f"当前数据库: {config['database']}（标识符: {db_key}），"
+                                   f"execute_sql_query 和 get_table_schema 已自动连接该数据库"
                     },
                     {
                         "role": "user",
                         "content": query
                     }
                 ]
-            })
-
-            # 提取最终回复
-            if isinstance(result, dict) and "messages" in result:
-                messages = result["messages"]
-                for msg in reversed(messages):
-                    if hasattr(msg, "content") and msg.content:
-                        return msg.content
-                    elif isinstance(msg, dict) and msg.get("content"):
-                        return msg["content"]
-
-            return str(result)
+            }, ctx)
+            try:
+                return await asyncio.wait_for(run, budget.hard_timeout)
+            except asyncio.TimeoutError:
+                return budget.partial_answer()
 
         except Exception as e:
             return f"Agent 调用失败: {str(e)}"
+        finally:
+            if budget_token is not None:
+                from agent.budget import reset_budget
+                reset_budget(budget_token)
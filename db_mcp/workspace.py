@@ -0,0 +1,216 @@
+"""
+会话级结果工作区
+
+每个 MCP 会话在进程内保留最近的查询结果（内存 SQLite，每个结果一张表 r1、r2 ...），
+追问（"按渠道拆分"、"只看上周"）可以直接在这些结果上筛选、聚合、关联，
+数据不覆盖时才重新查询 MySQL。
+
+内存上限：
+- 每个会话最多 WORKSPACE_MAX_TABLES 张表、约 WORKSPACE_MAX_MB MB 数据，超出时淘汰最久未使用的表
+- 最多保留 WORKSPACE_MAX_SESSIONS 个会话的工作区，超出时淘汰最久未使用的会话
+- SSE 连接关闭时由中间件释放该会话的工作区
+
+使用示例：
+    from db_mcp.workspace import save_result, query_workspace
+
+    table = await save_result(sql, columns, rows)          # "r1"
+    columns, rows = await query_workspace("SELECT channel, SUM(amount) FROM r1 GROUP BY channel")
+"""
+
+import asyncio
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import metrics
+from .config import get_int_env
+from .context import get_current_session_id
+from .logger import get_logger
+
+logger = get_logger("mcp.workspace")
+
+# 单个会话保留的最大表数和数据量（MB）
+WORKSPACE_MAX_TABLES = get_int_env("WORKSPACE_MAX_TABLES", 20)
+WORKSPACE_MAX_MB = get_int_env("WORKSPACE_MAX_MB", 64)
+# 最多同时保留工作区的会话数
+WORKSPACE_MAX_SESSIONS = get_int_env("WORKSPACE_MAX_SESSIONS", 200)
+# 工作区查询最多返回的行数
+WORKSPACE_QUERY_LIMIT = 10000
+
+
+class WorkspaceTable:
+    """工作区中的一张结果表"""
+
+    __slots__ = ("name", "sql", "columns", "row_count", "size_bytes", "created_at")
+
+    def __init__(self, name: str, sql: str, columns: List[str], row_count: int, size_bytes: int):
+        self.name = name
+        self.sql = sql
+        self.columns = columns
+        self.row_count = row_count
+        self.size_bytes = size_bytes
+        self.created_at = time.time()
+
+
+def _column_type(values: List[Any]) -> str:
+    """按取值推断 SQLite 列类型"""
+    present = [v for v in values if v is not None]
+    if present and all(isinstance(v, int) and not isinstance(v, bool) for v in present):
+        return "INTEGER"
+    if present and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present):
+        return "REAL"
+    return "TEXT"
+
+
+def _quote(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+class SessionWorkspace:
+    """
+    单个会话的工作区（内存 SQLite）
+
+    所有 SQLite 操作在线程中执行，并由锁串行化（同一会话的并发工具调用共享一个连接）。
+    """
+
+    def __init__(self, max_tables: int = WORKSPACE_MAX_TABLES, max_bytes: int = WORKSPACE_MAX_MB * 1024 * 1024):
+        self.max_tables = max(max_tables, 1)
+        self.max_bytes = max_bytes
+        self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self._lock = threading.Lock()
+        self._tables: "OrderedDict[str, WorkspaceTable]" = OrderedDict()
+        self._next_id = 1
+
+    @property
+    def size_bytes(self) -> int:
+        return sum(t.size_bytes for t in self._tables.values())
+
+    def tables(self) -> List[WorkspaceTable]:
+        """工作区中的表（最近使用的在后）"""
+        return list(self._tables.values())
+
+    def _drop(self, name: str):
+        self._tables.pop(name, None)
+        self._conn.execute(f"DROP TABLE IF EXISTS {_quote(name)}")
+        metrics.increment("workspace_evictions")
+
+    def save(self, sql: str, columns: List[str], rows: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        保存一个结果集为新表
+
+        Returns:
+            表名；单个结果超过会话上限时不保存，返回 None
+        """
+        size_bytes = len(json.dumps(rows, ensure_ascii=False, default=str).encode("utf-8"))
+        if size_bytes > self.max_bytes:
+            return None
+
+        with self._lock:
+            name = f"r{self._next_id}"
+            self._next_id += 1
+
+            column_types = [_column_type([row.get(c) for row in rows]) for c in columns]
+            self._conn.execute(
+                f"CREATE TABLE {_quote(name)} ("
+                + ", ".join(f"{_quote(c)} {t}" for c, t in zip(columns, column_types))
+                + ")"
+            )
+            placeholders = ", ".join("?" for _ in columns)
+            self._conn.executemany(
+                f"INSERT INTO {_quote(name)} VALUES ({placeholders})",
+                [
+                    tuple(v if v is None or isinstance(v, (int, float, str)) else str(v)
+                          for v in (row.get(c) for c in columns))
+                    for row in rows
+                ],
+            )
+            self._tables[name] = WorkspaceTable(name, sql, list(columns), len(rows), size_bytes)
+
+            # LRU 淘汰（不淘汰刚写入的表）
+            while len(self._tables) > 1 and (
+                len(self._tables) > self.max_tables or self.size_bytes > self.max_bytes
+            ):
+                self._drop(next(iter(self._tables)))
+        return name
+
+    def query(self, sql: str, limit: int = WORKSPACE_QUERY_LIMIT) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """
+        在工作区上执行只读查询
+
+        Raises:
+            sqlite3.Error: SQL 错误或尝试写入
+        """
+        with self._lock:
+            self._conn.execute("PRAGMA query_only = ON")
+            try:
+                cursor = self._conn.execute(sql)
+                columns = [d[0] for d in cursor.description or []]
+                rows = [dict(zip(columns, row)) for row in cursor.fetchmany(limit)]
+            finally:
+                self._conn.execute("PRAGMA query_only = OFF")
+            # 查询用到的表标记为最近使用
+            for name in set(re.findall(r"\br\d+\b", sql.lower())):
+                if name in self._tables:
+                    self._tables.move_to_end(name)
+        return columns, rows
+
+    def close(self):
+        with self._lock:
+            self._tables.clear()
+            self._conn.close()
+
+
+# ============================================================================
+# 会话工作区管理
+# ============================================================================
+
+_workspaces: "OrderedDict[str, SessionWorkspace]" = OrderedDict()
+_workspaces_lock = threading.Lock()
+
+
+def get_workspace(create: bool = True) -> Optional[SessionWorkspace]:
+    """当前会话的工作区（create=False 时不存在则返回 None）"""
+    session_id = get_current_session_id()
+    with _workspaces_lock:
+        workspace = _workspaces.get(session_id)
+        if workspace is not None:
+            _workspaces.move_to_end(session_id)
+            return workspace
+        if not create:
+            return None
+        workspace = _workspaces[session_id] = SessionWorkspace()
+        while len(_workspaces) > WORKSPACE_MAX_SESSIONS:
+            _, evicted = _workspaces.popitem(last=False)
+            evicted.close()
+        metrics.set_gauge("workspace_sessions", len(_workspaces))
+    return workspace
+
+
+def drop_workspace(session_id: str):
+    """释放会话的工作区（SSE 连接关闭时调用）"""
+    with _workspaces_lock:
+        workspace = _workspaces.pop(session_id, None)
+        metrics.set_gauge("workspace_sessions", len(_workspaces))
+    if workspace is not None:
+        workspace.close()
+
+
+async def save_result(sql: str, columns: List[str], rows: List[Dict[str, Any]]) -> Optional[str]:
+    """把查询结果保存到当前会话的工作区，返回表名（空结果或超出上限时返回 None）"""
+    if not rows or not columns:
+        return None
+    workspace = get_workspace()
+    try:
+        return await asyncio.to_thread(workspace.save, sql, columns, rows)
+    except sqlite3.Error as e:
+        logger.warning(f"保存结果到工作区失败: {e}")
+        return None
+
+
+async def query_workspace(sql: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """在当前会话的工作区上执行只读 SQL"""
+    return await asyncio.to_thread(get_workspace().query, sql)
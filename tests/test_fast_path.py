@@ -0,0 +1,70 @@
+"""data_agent 快速路径：只有能确定处理的请求才绕过 Agent"""
+
+import pytest
+
+import tools
+from db_mcp import fast_path
+from db_mcp.table_index import TableNameIndex
+
+
+class _Snapshot:
+    name_index = TableNameIndex([("orders", "订单表")])
+
+
+class _StubSchemaTool:
+    def __init__(self, output: str = "表名: orders\n字段 ..."):
+        self.output = output
+        self.calls = []
+
+    async def ainvoke(self, args):
+        self.calls.append(args["table_name"])
+        return self.output
+
+
+@pytest.fixture
+def schema_tool(monkeypatch):
+    async def unreachable_engine(**kwargs):
+        raise ConnectionError("no database in tests")
+
+    monkeypatch.setattr(fast_path, "resolve_connection", lambda: {
+        "host": "db1", "port": 3306, "username": "root", "password": "", "database": "loan",
+    })
+    monkeypatch.setattr(fast_path, "get_snapshot", lambda index_key: _Snapshot())
+    monkeypatch.setattr(fast_path, "get_engine", unreachable_engine)
+    stub = _StubSchemaTool()
+    monkeypatch.setattr(tools, "get_table_schema", stub)
+    return stub
+
+
+async def test_schema_route_uses_resolved_table_name(schema_tool):
+    route = fast_path.route_query("显示 ORDERS 表的结构")
+
+    assert route == ("schema", "ORDERS")
+    assert await fast_path.run_fast_path(route) == schema_tool.output
+    assert schema_tool.calls == ["orders"]
+
+
+async def test_unknown_table_falls_back_to_agent(schema_tool):
+    for question in ("describe churn", "What is the structure of revenue"):
+        route = fast_path.route_query(question)
+
+        assert route is not None and route[0] == "schema"
+        assert await fast_path.run_fast_path(route) is None
+    assert schema_tool.calls == []
+
+
+async def test_table_not_found_output_falls_back_to_agent(schema_tool):
+    schema_tool.output = "表 'orders' 在数据库 'loan' 中不存在\n"
+
+    assert await fast_path.run_fast_path(("schema", "orders")) is None
+
+
+def test_prose_starting_with_select_is_not_routed_as_sql():
+    assert fast_path.route_query("Select the top users by revenue") is None
+    assert fast_path.route_query("select users who signed up yesterday") is None
+
+
+def test_sql_routes():
+    sql = "WITH t AS (SELECT id FROM orders) SELECT COUNT(*) FROM t"
+    assert fast_path.route_query(f"```sql\n{sql};\n```") == ("sql", sql)
+    assert fast_path.route_query("SELECT 1 UNION SELECT 2") == ("sql", "SELECT 1 UNION SELECT 2")
@@ -0,0 +1,116 @@
+"""get_table_schema 的字段渲染（主键识别与按预算选取）和表摘要 / 分组浏览的选择"""
+
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from db_mcp.metadata_store import ColumnMetadata, MetadataStore
+from db_mcp.schema_snapshot import column_dicts, index_dicts
+from tools import get_table_schema_tool as schema_tool
+from tools.get_table_schema_tool import UNCATEGORIZED, format_table_info
+
+COLUMNS = column_dicts([
+    ("created_at", "datetime", "datetime", "YES", None, "创建时间", ""),
+    ("loan_amount", "decimal", "decimal(18,2)", "YES", None, "放款金额", ""),
+    ("order_id", "bigint", "bigint", "NO", None, "", ""),
+    ("user_id", "bigint", "bigint", "YES", None, "用户ID", ""),
+])
+# information_schema.STATISTICS 中主键的 INDEX_NAME 为 PRIMARY，INDEX_TYPE 为 BTREE
+INDEXES = index_dicts([
+    ("PRIMARY", "order_id", "BTREE", 0),
+    ("idx_user", "user_id", "BTREE", 1),
+])
+
+
+def _column_lines(text: str):
+    return [line for line in text.splitlines() if line.startswith("  - ")]
+
+
+def test_primary_key_marked_from_primary_index():
+    lines = _column_lines(format_table_info("loan_order", "", COLUMNS, INDEXES))
+
+    assert lines[2].startswith("  - order_id (bigint) [主键")
+    assert not any("主键" in line for line in lines if "order_id" not in line)
+
+
+def test_primary_key_selected_first_within_budget():
+    # 预算只够一个字段：与问题无关的主键仍优先于相关字段
+    text = format_table_info(
+        "loan_order", "", COLUMNS, INDEXES, question="放款金额", token_budget=20
+    )
+    lines = _column_lines(text)
+
+    assert lines[0].startswith("  - order_id")
+    assert "未显示" in text
+
+    # 预算够两个字段：主键之后是与问题最相关的字段，输出保持原字段顺序
+    text = format_table_info(
+        "loan_order", "", COLUMNS, INDEXES, question="放款金额", token_budget=35
+    )
+    names = [line.split()[1] for line in _column_lines(text)]
+    assert names == ["loan_amount", "order_id"]
+
+
+def test_primary_key_falls_back_to_metadata():
+    column_meta = {
+        "order_id": ColumnMetadata("order_id", "bigint", "订单ID", True, False, "", ""),
+    }
+    lines = _column_lines(format_table_info("loan_order", "", COLUMNS, [], column_meta=column_meta))
+
+    assert "[主键" in lines[2]
+
+
+class _Engine:
+    @asynccontextmanager
+    async def connect(self):
+        yield None
+
+
+class _Snapshot:
+    def __init__(self, count: int):
+        self._tables = [
+            SimpleNamespace(name=f"t_{i:03d}", comment="", engine="InnoDB", table_rows=0)
+            for i in range(count)
+        ]
+
+    def sorted_tables(self):
+        return self._tables
+
+
+@pytest.fixture
+def large_database(monkeypatch):
+    async def get_engine(**kwargs):
+        return _Engine()
+
+    monkeypatch.setattr(schema_tool, "resolve_connection", lambda *args: {
+        "host": "db1", "port": 3306, "username": "root", "password": "", "database": "loan",
+    })
+    monkeypatch.setattr(schema_tool, "get_engine", get_engine)
+    monkeypatch.setattr(schema_tool, "get_snapshot", lambda index_key: _Snapshot(150))
+    monkeypatch.setattr(schema_tool, "SCHEMA_BROWSE_THRESHOLD", 100)
+
+
+def _store(database: str) -> MetadataStore:
+    store = MetadataStore()
+    store.add_database(database, [{"table_name": "t_000", "business_domain": "risk"}])
+    store.freeze()
+    return store
+
+
+async def test_large_database_without_metadata_returns_summary(large_database, monkeypatch):
+    monkeypatch.setattr(schema_tool, "get_metadata_store", lambda: _store("other_db"))
+
+    text = await schema_tool.get_table_schema.ainvoke({})
+
+    assert UNCATEGORIZED not in text
+    assert "t_149" in text
+
+
+async def test_large_database_with_metadata_returns_grouped_overview(large_database, monkeypatch):
+    monkeypatch.setattr(schema_tool, "get_metadata_store", lambda: _store("loan"))
+
+    text = await schema_tool.get_table_schema.ainvoke({})
+
+    assert "• risk (1)" in text
+    assert f"• {UNCATEGORIZED} (149)" in text
@@ -0,0 +1,27 @@
+"""db_mcp 包按需导入：离线脚本只用到的子模块不创建 MCP 服务"""
+
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+
+def _run(code: str) -> str:
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return result.stdout.strip()
+
+
+def test_pipeline_modules_do_not_import_server():
+    output = _run(
+        "import sys, db_mcp.join_graph, db_mcp.popularity; "
+        "print('db_mcp.server' in sys.modules, 'tools' in sys.modules)"
+    )
+    assert output.splitlines()[-1] == "False False"
+
+
+def test_package_exports_resolve_on_access():
+    output = _run("from db_mcp import start_server, get_engine; print(start_server.__module__, get_engine.__module__)")
+    assert output.splitlines()[-1] == "db_mcp.server db_mcp.connection_pool"
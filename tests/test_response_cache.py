@@ -0,0 +1,82 @@
+"""ResponseCache 的 single-flight 行为"""
+
+import asyncio
+
+import pytest
+
+from db_mcp.response_cache import ResponseCache
+
+
+def _counting_factory(delay: float = 0.2):
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return len(calls)
+
+    return factory, calls
+
+
+async def test_concurrent_requests_compute_once():
+    cache = ResponseCache("test_coalesce")
+    factory, calls = _counting_factory()
+
+    results = await asyncio.gather(*(cache.get_or_compute("k", factory) for _ in range(5)))
+
+    assert len(calls) == 1
+    assert sorted(cached for _, cached in results) == [False, True, True, True, True]
+
+
+async def test_leader_cancellation_does_not_cancel_waiters():
+    cache = ResponseCache("test_leader_cancel")
+    factory, calls = _counting_factory()
+
+    leader = asyncio.create_task(cache.get_or_compute("k", factory))
+    await asyncio.sleep(0.01)
+    waiters = [asyncio.create_task(cache.get_or_compute("k", factory)) for _ in range(3)]
+    await asyncio.sleep(0.05)
+    leader.cancel()
+
+    results = await asyncio.gather(*waiters)
+
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    # 一个等待者接手计算，其余等待者合并到新的计算上
+    assert len(calls) == 2
+    assert [value for value, _ in results] == [2, 2, 2]
+    assert not cache._inflight
+
+
+async def test_waiter_cancellation_does_not_affect_leader():
+    cache = ResponseCache("test_waiter_cancel")
+    factory, calls = _counting_factory()
+
+    leader = asyncio.create_task(cache.get_or_compute("k", factory))
+    await asyncio.sleep(0.01)
+    waiter = asyncio.create_task(cache.get_or_compute("k", factory))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+
+    assert await leader == (1, False)
+    assert waiter.cancelled()
+    assert len(calls) == 1
+
+
+async def test_batch_waits_for_keys_being_computed():
+    cache = ResponseCache("test_batch")
+    batches = []
+
+    async def factory(keys):
+        batches.append(sorted(keys))
+        await asyncio.sleep(0.2)
+        return {key: key.upper() for key in keys}
+
+    first = asyncio.create_task(cache.get_or_compute_many(["a", "b"], factory))
+    await asyncio.sleep(0.01)
+    second = await cache.get_or_compute_many(["b", "c"], factory)
+
+    assert batches == [["a", "b"], ["c"]]
+    assert second == {"b": "B", "c": "C"}
+    assert await first == {"a": "A", "b": "B"}
+    assert not cache._inflight
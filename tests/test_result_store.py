@@ -0,0 +1,23 @@
+"""保存的查询结果只能由创建它的会话读取"""
+
+import contextvars
+
+from db_mcp.context import bind_db_context
+from db_mcp.result_store import get_result, store_result
+
+
+def _in_session(db_key: str, func, *args):
+    """在新绑定的会话上下文中执行（每次绑定即一个新的 /sse 会话）"""
+    def run():
+        bind_db_context(db_key, {"host": "db1"})
+        return func(*args)
+    return contextvars.copy_context().run(run)
+
+
+def test_same_database_other_session_cannot_read_result():
+    owner = contextvars.copy_context()
+    owner.run(bind_db_context, "singa", {"host": "db1"})
+    result_id = owner.run(store_result, "SELECT 1", ["x"], [{"x": 1}])
+
+    assert owner.run(get_result, result_id).rows == [{"x": 1}]
+    assert _in_session("singa", get_result, result_id) is None
@@ -0,0 +1,88 @@
+"""表结构缓存：表结构工具与进行中的后台预取共享读取结果；快照刷新后实时表名索引失效"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+from db_mcp import schema_snapshot, table_index
+
+
+async def test_schema_call_waits_for_inflight_prefetch(monkeypatch):
+    fetched = []
+
+    async def fake_fetch_table_details(conn, database, table_names=None):
+        fetched.append(sorted(table_names))
+        await asyncio.sleep(0.2)
+        columns = {name: [(f"{name}_id", "bigint", "bigint", "NO", None, "", "")] for name in table_names}
+        return columns, {name: [] for name in table_names}
+
+    monkeypatch.setattr(schema_snapshot, "fetch_table_details", fake_fetch_table_details)
+    schema_snapshot._details_cache.clear()
+
+    prefetch = asyncio.create_task(
+        schema_snapshot.get_cached_table_details(None, "db1:3306:root/loan", "loan", ["orders", "users"])
+    )
+    await asyncio.sleep(0.01)
+    columns, indexes = await schema_snapshot.get_cached_table_details(
+        None, "db1:3306:root/loan", "loan", ["orders"]
+    )
+    await prefetch
+
+    assert fetched == [["orders", "users"]]
+    assert columns["orders"][0][0] == "orders_id"
+    assert indexes == {"orders": []}
+    schema_snapshot._details_cache.clear()
+
+
+class _Result:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def fetchall(self):
+        return self._rows
+
+
+class _Conn:
+    def __init__(self, tables):
+        self.tables = tables
+
+    async def execute(self, sql, params=None):
+        if "COUNT(*)" in str(sql):
+            return _Result([(name, 1) for name in self.tables])
+        return _Result([(name, "", "InnoDB", 0, None, None) for name in self.tables])
+
+
+class _Engine:
+    def __init__(self, conn):
+        self.conn = conn
+
+    @asynccontextmanager
+    async def connect(self):
+        yield self.conn
+
+
+async def test_snapshot_refresh_invalidates_live_table_index(monkeypatch):
+    conn = _Conn(["orders", "users"])
+
+    async def get_engine(**kwargs):
+        return _Engine(conn)
+
+    async def fake_fetch_table_details(conn, database, table_names=None):
+        return {}, {}
+
+    monkeypatch.setattr(schema_snapshot, "get_engine", get_engine)
+    monkeypatch.setattr(schema_snapshot, "fetch_table_details", fake_fetch_table_details)
+    monkeypatch.setattr(schema_snapshot.SchemaSnapshot, "save", lambda self, snapshot_dir=None: "")
+    config = {"host": "db1", "port": 3306, "username": "root", "password": "", "database": "loan"}
+    index_key = table_index.make_index_key("db1", 3306, "root", "loan")
+    monkeypatch.setitem(table_index._indexes, index_key, table_index.TableNameIndex([("orders", ""), ("users", "")]))
+
+    await schema_snapshot.refresh_snapshot("loan", config)
+    table_index._indexes[index_key] = table_index.TableNameIndex([("orders", ""), ("users", "")])
+    # 无变化的刷新保留索引；删除表后索引失效
+    await schema_snapshot.refresh_snapshot("loan", config)
+    assert index_key in table_index._indexes
+
+    conn.tables = ["orders"]
+    await schema_snapshot.refresh_snapshot("loan", config)
+    assert index_key not in table_index._indexes
+    schema_snapshot._snapshots.pop(index_key, None)
@@ -0,0 +1,112 @@
+"""
+search_knowledge_graph 的并发测试
+
+用本地的 LightRAG 替身服务（Starlette + uvicorn，运行在独立线程）验证：
+慢查询挂起期间，其他会话的查询仍然能正常完成，事件循环没有被阻塞。
+"""
+
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import pytest
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from db_mcp import http_client
+from tools.search_knowledge_tool import knowledge_cache, search_knowledge_graph
+
+# 替身服务中慢查询的耗时（秒）
+SLOW_SECONDS = 3
+
+
+async def _query(request: Request) -> JSONResponse:
+    payload = await request.json()
+    # slow...：所有模式都慢；mix-slow...：只有 naive 以外的模式慢
+    if payload["query"].startswith("slow") or (
+        payload["query"].startswith("mix-slow") and payload["mode"] != "naive"
+    ):
+        await asyncio.sleep(SLOW_SECONDS)
+    return JSONResponse({"response": f"answer: {payload['query']} ({payload['mode']})"})
+
+
+@pytest.fixture(scope="module")
+def lightrag_url():
+    """在独立线程中启动 LightRAG 替身服务，返回其地址"""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(
+        Starlette(routes=[Route("/query", _query, methods=["POST"])]),
+        log_level="warning",
+    ))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+@pytest.fixture(autouse=True)
+async def fresh_client(lightrag_url, monkeypatch):
+    """每个测试使用新的共享客户端和空缓存（客户端绑定在测试自己的事件循环上）"""
+    monkeypatch.setenv("LIGHTRAG_API_URL", lightrag_url)
+    knowledge_cache.clear()
+    yield
+    await http_client.close_http_client()
+    knowledge_cache.clear()
+
+
+async def _search(query: str) -> dict:
+    # naive 模式不触发对冲，慢查询会一直挂起
+    return json.loads(await search_knowledge_graph.ainvoke({"query": query, "mode": "naive"}))
+
+
+async def test_other_sessions_progress_while_slow_query_pending():
+    slow = asyncio.create_task(_search("slow question"))
+    await asyncio.sleep(0.2)
+
+    start = time.monotonic()
+    results = await asyncio.gather(*(_search(f"fast question {i}") for i in range(10)))
+    elapsed = time.monotonic() - start
+
+    assert all(r["success"] for r in results)
+    assert results[3]["results"] == "answer: fast question 3 (naive)"
+    assert elapsed < 1
+    assert not slow.done()
+
+    result = await slow
+    assert result["success"]
+    assert result["results"] == "answer: slow question (naive)"
+
+
+async def test_read_timeout_returns_error(monkeypatch):
+    monkeypatch.setattr(http_client, "HTTP_READ_TIMEOUT", 1)
+    http_client.create_http_client()
+
+    start = time.monotonic()
+    result = await _search("slow question")
+
+    assert not result["success"]
+    assert "超时" in result["message"]
+    assert time.monotonic() - start < SLOW_SECONDS
+
+
+async def test_hedged_naive_answer_not_cached_as_primary_mode(monkeypatch):
+    import tools.search_knowledge_tool as module
+
+    # 主模式立即超过对冲等待时间，naive 查询胜出
+    monkeypatch.setattr(module, "_hedge_delay", lambda mode: 0.1)
+    first = json.loads(await search_knowledge_graph.ainvoke({"query": "mix-slow hedged", "mode": "mix"}))
+
+    assert first["success"]
+    assert first["mode"] == "naive"
+    assert knowledge_cache.get(module.make_cache_key("mix-slow hedged", "naive"))[0]
+    assert not knowledge_cache.get(module.make_cache_key("mix-slow hedged", "mix"))[0]
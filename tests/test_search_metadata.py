@@ -0,0 +1,70 @@
+"""search_metadata 的本地命中判断（查询词项覆盖率）与多来源去重"""
+
+import json
+
+import pytest
+
+from db_mcp.knowledge_index import KIND_COLUMN, KIND_TABLE, KnowledgeIndex
+from tools import search_metadata_tool
+
+
+def _build_index() -> KnowledgeIndex:
+    index = KnowledgeIndex()
+    index.add_document(KIND_TABLE, "approval_info", "审批信息", "singa_bi_metadata.json")
+    index.add_document(KIND_COLUMN, "approval_info.machine_status", "机审状态（varchar）", "singa_bi_metadata.json")
+    index.add_document(KIND_COLUMN, "approval_info.machine_status", "机审状态", "online_dictionary.json")
+    index.add_document(KIND_COLUMN, "loan_order.loan_amount", "放款金额（decimal）", "singa_bi_metadata.json")
+    # 与 "NPL 率怎么计算" 只共享 npl 一个词项，但 npl 很稀有，BM25 绝对得分并不低
+    index.add_document(KIND_COLUMN, "npl_hourly.run_time", "NPL 任务运行时间（datetime）", "singa_bi_metadata.json")
+    for i in range(100):
+        index.add_document(KIND_COLUMN, f"filler_{i}.remark", "备注（varchar）", "singa_bi_metadata.json")
+    index.build()
+    return index
+
+
+class _StubKnowledgeGraph:
+    def __init__(self):
+        self.queries = []
+
+    async def ainvoke(self, args):
+        self.queries.append(args["query"])
+        return json.dumps({"success": True, "answer": "NPL 率 = 不良贷款余额 / 贷款总余额"}, ensure_ascii=False)
+
+
+@pytest.fixture
+def knowledge_graph(monkeypatch):
+    index = _build_index()
+    stub = _StubKnowledgeGraph()
+    monkeypatch.setattr(search_metadata_tool, "get_knowledge_index", lambda: index)
+    monkeypatch.setattr(search_metadata_tool, "search_knowledge_graph", stub)
+    return stub
+
+
+def test_duplicate_sources_returned_once():
+    hits = _build_index().search("machine_status", limit=5)
+
+    names = [hit.name for hit in hits]
+    assert names.count("approval_info.machine_status") == 1
+    assert set(hits[0].source.split(", ")) == {"singa_bi_metadata.json", "online_dictionary.json"}
+
+
+def test_match_ratio_reflects_query_coverage():
+    index = _build_index()
+
+    assert index.search("放款金额", limit=1)[0].match_ratio == 1.0
+    assert index.search("NPL 率怎么计算", limit=1)[0].match_ratio < 0.5
+
+
+async def test_relevant_query_answered_locally(knowledge_graph):
+    result = json.loads(await search_metadata_tool.search_metadata.ainvoke({"query": "放款金额"}))
+
+    assert result["source"] == "local"
+    assert result["results"][0]["name"] == "loan_order.loan_amount"
+    assert knowledge_graph.queries == []
+
+
+async def test_partial_term_match_falls_back_to_knowledge_graph(knowledge_graph):
+    result = json.loads(await search_metadata_tool.search_metadata.ainvoke({"query": "NPL 率怎么计算"}))
+
+    assert result["source"] == "lightrag"
+    assert knowledge_graph.queries == ["NPL 率怎么计算"]
@@ -6,9 +6,21 @@
 from .execute_sql_tool import execute_sql_query
 from .search_knowledge_tool import search_knowledge_graph
 from .get_table_schema_tool import get_table_schema
+from .search_metadata_tool import search_metadata
+from .search_historical_queries_tool import search_historical_queries
+from .suggest_join_path_tool import suggest_join_path
+from .fetch_query_result_tool import fetch_query_result
+from .analyze_data_tool import analyze_data
+from .query_workspace_tool import query_workspace
 
 __all__ = [
     "execute_sql_query",
     "search_knowledge_graph",
     "get_table_schema",
+    "search_metadata",
+    "search_historical_queries",
+    "suggest_join_path",
+    "fetch_query_result",
+    "analyze_data",
+    "query_workspace",
 ]
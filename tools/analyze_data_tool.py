@@ -0,0 +1,290 @@
+"""
+数据分析工具
+在服务端用 pandas 对查询结果做向量化统计（列分布、分组聚合、时间序列变化、异常值），
+只把紧凑的摘要返回给 LLM，避免 LLM 逐行阅读原始数据自行计算
+"""
+
+import asyncio
+import json
+import math
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+from langchain_core.tools import tool
+
+from db_mcp.result_store import get_result
+from db_mcp.errors import format_error_response, ErrorCode
+from db_mcp.logger import get_logger
+from .execute_sql_tool import execute_sql_query
+
+logger = get_logger("mcp.tool.analyze_data")
+
+# 按 SQL 分析时的最大行数
+_ANALYZE_SQL_LIMIT = 10000
+# 列可转换为数值 / 时间的最低比例
+_TYPE_DETECT_RATIO = 0.9
+# 异常值判定：IQR 倍数、时间序列 z-score 阈值
+_IQR_FACTOR = 1.5
+_ZSCORE_THRESHOLD = 3.0
+
+
+def _py(value: Any) -> Any:
+    """numpy / pandas 标量转为可 JSON 序列化的 Python 值（NaN 转为 None）"""
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float):
+        return None if math.isnan(value) or math.isinf(value) else round(value, 4)
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value
+
+
+def _to_list(value: Optional[Union[str, List[str]]]) -> List[str]:
+    if isinstance(value, str):
+        value = value.split(",")
+    return [v.strip() for v in value or [] if v and v.strip()]
+
+
+def _coerce_types(df: pd.DataFrame) -> pd.DataFrame:
+    """文本形式的数值 / 时间列转换为对应类型（可转换比例低于阈值时保持原样）"""
+    for column in df.columns:
+        series = df[column]
+        if not (series.dtype == object or pd.api.types.is_string_dtype(series)):
+            continue
+        present = series.notna().sum()
+        if not present:
+            continue
+        numeric = pd.to_numeric(series, errors="coerce")
+        if numeric.notna().sum() >= present * _TYPE_DETECT_RATIO:
+            df[column] = numeric
+            continue
+        if series.dropna().astype(str).str.match(r"^\d{4}-\d{2}-\d{2}").mean() >= _TYPE_DETECT_RATIO:
+            df[column] = pd.to_datetime(series, errors="coerce", format="ISO8601")
+    return df
+
+
+def _column_profiles(df: pd.DataFrame, top_n: int) -> Dict[str, Dict[str, Any]]:
+    """每列的分布：数值列为分位数和 IQR 异常值，时间列为范围，其他列为高频值"""
+    profiles = {}
+    for column in df.columns:
+        series = df[column]
+        info: Dict[str, Any] = {
+            "non_null": int(series.notna().sum()),
+            "nulls": int(series.isna().sum()),
+            "distinct": int(series.nunique()),
+        }
+        if pd.api.types.is_bool_dtype(series):
+            info["true_ratio"] = _py(series.mean())
+        elif pd.api.types.is_numeric_dtype(series):
+            desc = series.describe(percentiles=[0.25, 0.5, 0.75])
+            info.update({k: _py(desc[k]) for k in ("mean", "std", "min", "25%", "50%", "75%", "max") if k in desc})
+            q1, q3 = desc.get("25%"), desc.get("75%")
+            if q1 is not None and q3 is not None and not np.isnan(q1):
+                iqr = q3 - q1
+                mask = (series < q1 - _IQR_FACTOR * iqr) | (series > q3 + _IQR_FACTOR * iqr)
+                outliers = series[mask]
+                info["outliers"] = int(mask.sum())
+                if len(outliers):
+                    extreme = outliers.loc[(outliers - series.median()).abs().nlargest(5).index]
+                    info["outlier_examples"] = [
+                        {"row": int(i), "value": _py(v)} for i, v in extreme.items()
+                    ]
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            info["min"] = _py(series.min())
+            info["max"] = _py(series.max())
+        else:
+            counts = series.astype(str).where(series.notna()).value_counts().head(top_n)
+            total = info["non_null"] or 1
+            info["top_values"] = [
+                {"value": str(v)[:100], "count": int(c), "share": round(c / total, 4)}
+                for v, c in counts.items()
+            ]
+        profiles[column] = info
+    return profiles
+
+
+def _group_summary(
+    df: pd.DataFrame, group_by: List[str], metrics: List[str], top_n: int
+) -> Dict[str, Any]:
+    """按维度分组聚合（行数 + 各指标的 sum / mean），按第一个指标（或行数）降序取前 top_n 组"""
+    grouped = df.groupby(group_by, dropna=False)
+    table = grouped.size().to_frame("rows")
+    for metric in metrics:
+        table[f"{metric}_sum"] = grouped[metric].sum()
+        table[f"{metric}_mean"] = grouped[metric].mean()
+    sort_column = f"{metrics[0]}_sum" if metrics else "rows"
+    table = table.sort_values(sort_column, ascending=False)
+    groups = []
+    for key, row in table.head(top_n).iterrows():
+        keys = key if isinstance(key, tuple) else (key,)
+        groups.append({
+            **{g: _py(k) for g, k in zip(group_by, keys)},
+            **{c: _py(v) for c, v in row.items()},
+            "rows": int(row["rows"]),
+        })
+    return {"by": group_by, "total_groups": int(len(table)), "sorted_by": sort_column, "groups": groups}
+
+
+def _time_series(
+    df: pd.DataFrame, time_column: str, metrics: List[str], top_n: int
+) -> Dict[str, Any]:
+    """按日（跨度超过 90 天时按月）汇总，给出环比变化和 z-score 异常点"""
+    series_df = df.dropna(subset=[time_column]).set_index(time_column).sort_index()
+    if series_df.empty:
+        return {"column": time_column, "periods": []}
+    span_days = (series_df.index.max() - series_df.index.min()).days
+    freq = "MS" if span_days > 90 else "D"
+    resampled = series_df.resample(freq)
+    table = resampled.size().to_frame("rows")
+    for metric in metrics:
+        table[metric] = resampled[metric].sum()
+    value_column = metrics[0] if metrics else "rows"
+    values = table[value_column]
+    table["delta"] = values.diff()
+    table["pct_change"] = values.pct_change().replace([np.inf, -np.inf], np.nan)
+    std = values.std()
+    zscores = (values - values.mean()) / std if std else values * 0
+    anomalies = [
+        {"period": _py(idx), value_column: _py(values[idx]), "zscore": _py(z)}
+        for idx, z in zscores.items() if abs(z) >= _ZSCORE_THRESHOLD
+    ]
+    periods = [
+        {"period": _py(idx), **{c: _py(v) for c, v in row.items()}, "rows": int(row["rows"])}
+        for idx, row in table.tail(top_n).iterrows()
+    ]
+    return {
+        "column": time_column,
+        "freq": "month" if freq == "MS" else "day",
+        "value": value_column,
+        "total_periods": int(len(table)),
+        "periods": periods,
+        "anomalies": anomalies,
+    }
+
+
+def analyze_rows(
+    columns: List[str],
+    rows: List[Dict[str, Any]],
+    group_by: Optional[List[str]] = None,
+    metrics: Optional[List[str]] = None,
+    time_column: Optional[str] = None,
+    top_n: int = 10,
+) -> Dict[str, Any]:
+    """
+    对行数据做向量化统计
+
+    Args:
+        columns: 列名列表
+        rows: 行数据（字典列表）
+        group_by: 分组维度列（可选）
+        metrics: 指标列（可选，默认所有数值列）
+        time_column: 时间列（可选，默认第一个时间类型的列）
+        top_n: 高频值 / 分组 / 时间段的返回数量
+
+    Returns:
+        {row_count, columns, group_summary?, time_series?}
+    """
+    df = _coerce_types(pd.DataFrame(rows, columns=columns))
+    group_by = [c for c in group_by or [] if c in df.columns]
+    numeric_columns = [
+        c for c in df.columns
+        if pd.api.types.is_numeric_dtype(df[c]) and not pd.api.types.is_bool_dtype(df[c])
+    ]
+    if metrics:
+        metrics = [c for c in metrics if c in numeric_columns]
+    else:
+        metrics = [c for c in numeric_columns if c not in group_by]
+    if not time_column:
+        time_column = next((c for c in df.columns if pd.api.types.is_datetime64_any_dtype(df[c])), None)
+    elif time_column in df.columns and not pd.api.types.is_datetime64_any_dtype(df[time_column]):
+        df[time_column] = pd.to_datetime(df[time_column], errors="coerce")
+
+    summary: Dict[str, Any] = {
+        "row_count": int(len(df)),
+        "columns": _column_profiles(df, top_n),
+    }
+    if group_by:
+        summary["group_summary"] = _group_summary(df, group_by, metrics, top_n)
+    if time_column and time_column in df.columns:
+        summary["time_series"] = _time_series(df, time_column, metrics, top_n)
+    return summary
+
+
+@tool
+async def analyze_data(
+    result_id: Optional[str] = None,
+    sql: Optional[str] = None,
+    group_by: Optional[Union[str, List[str]]] = None,
+    metrics: Optional[Union[str, List[str]]] = None,
+    time_column: Optional[str] = None,
+    top_n: int = 10
+) -> str:
+    """
+    对查询结果做统计分析（在服务端计算，只返回摘要）：列分布、分组聚合、时间序列变化、异常值
+    需要统计、趋势、异常时使用，不要逐行阅读数据自己计算
+
+    Args:
+        result_id: execute_sql_query 返回的 result_id（与 sql 二选一）
+        sql: 要分析的 SELECT 语句（与 result_id 二选一，最多分析 10000 行）
+        group_by: 分组维度列（列表或逗号分隔），返回各组行数和指标的 sum / mean
+        metrics: 指标列（列表或逗号分隔），默认所有数值列
+        time_column: 时间列，默认自动识别；按日（跨度超过 90 天按月）汇总并给出环比和异常点
+        top_n: 高频值 / 分组 / 时间段的返回数量，默认 10
+
+    Returns:
+        JSON 格式的分析摘要，包含：
+        - success: 是否成功
+        - row_count: 分析的行数
+        - columns: 每列分布（数值列：均值、分位数、IQR 异常值；文本列：高频值及占比）
+        - group_summary: 分组聚合结果（传入 group_by 时）
+        - time_series: 时间序列汇总、变化量和 z-score 异常点（有时间列时）
+
+    Examples:
+        >>> await analyze_data.ainvoke({"result_id": "res_1a2b3c4d5e6f7a8b", "group_by": "channel"})
+        >>> await analyze_data.ainvoke({"sql": "SELECT loan_date, amount FROM loans WHERE loan_date >= '2024-01-01'"})
+    """
+    # ========== 1. 获取数据 ==========
+    if result_id:
+        stored = get_result(result_id)
+        if stored is None:
+            return format_error_response(
+                f"结果 '{result_id}' 不存在或已过期，请重新执行 SQL 或直接传入 sql",
+                ErrorCode.INVALID_PARAMS
+            )
+        columns, rows = stored.columns, stored.rows
+    elif sql and sql.strip():
+        response = json.loads(await execute_sql_query.ainvoke({"sql": sql, "limit": _ANALYZE_SQL_LIMIT}))
+        if not response.get("success"):
+            return json.dumps(response, ensure_ascii=False)
+        stored = get_result(response["result_id"]) if response.get("result_id") else None
+        columns = response.get("columns") or []
+        rows = stored.rows if stored else response.get("data") or []
+    else:
+        return format_error_response(
+            "result_id 和 sql 至少需要提供一个",
+            ErrorCode.MISSING_REQUIRED_PARAM
+        )
+
+    if not rows:
+        return json.dumps({"success": True, "row_count": 0, "message": "没有数据可分析"}, ensure_ascii=False)
+
+    # ========== 2. 向量化统计（CPU 计算放到线程中，不阻塞事件循环） ==========
+    top_n = max(1, min(top_n, 50))
+    try:
+        summary = await asyncio.to_thread(
+            analyze_rows, columns, rows, _to_list(group_by), _to_list(metrics), time_column, top_n
+        )
+    except Exception as e:
+        logger.error(f"数据分析失败: {e}", exc_info=True)
+        return format_error_response(f"数据分析失败: {e}", ErrorCode.UNKNOWN_ERROR)
+
+    logger.info(
+        f"数据分析完成",
+        extra={"rows": len(rows), "group_by": group_by, "time_column": time_column}
+    )
+    return json.dumps({
+        "success": True,
+        **summary,
+        "message": f"已分析 {len(rows)} 行数据"
+    }, ensure_ascii=False, default=str)
@@ -8,9 +8,10 @@ import json
 import time
 import traceback
 from typing import Dict, Any, Optional
+from typing_extensions import Annotated
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
-from langchain_core.tools import tool
+from langchain_core.tools import tool, InjectedToolArg
 
 # 导入安全、连接池和错误处理模块
 from db_mcp.sql_validator import (
@@ -19,6 +20,9 @@ from db_mcp.sql_validator import (
     sanitize_limit
 )
 from db_mcp.connection_pool import execute_query
+from db_mcp.context import resolve_connection
+from db_mcp.result_store import store_result, shape_rows
+from db_mcp.workspace import save_result
 from db_mcp.errors import (
     format_error_response,
     format_success_response,
@@ -67,15 +71,15 @@ def _convert_value(value: Any) -> Any:
 @tool
 async def execute_sql_query(
     sql: str,
-    host: str,
-    port: int = 3306,
-    username: str = "root",
-    password: str = "",
-    database: str = "information_schema",
-    limit: Optional[int] = None
+    limit: Optional[int] = None,
+    host: Annotated[Optional[str], InjectedToolArg] = None,
+    port: Annotated[Optional[int], InjectedToolArg] = None,
+    username: Annotated[Optional[str], InjectedToolArg] = None,
+    password: Annotated[Optional[str], InjectedToolArg] = None,
+    database: Annotated[Optional[str], InjectedToolArg] = None
 ) -> str:
     """
-    执行 SQL 查询并返回结果（支持动态数据库连接）
+    在当前会话绑定的数据库上执行 SQL 查询并返回结果（连接参数由服务端注入，无需传入）
 
     功能特性：
     - 仅允许 SELECT 查询（通过 SQL 解析器严格验证）
@@ -86,11 +90,6 @@ async def execute_sql_query(
 
     Args:
         sql: 要执行的 SQL 查询语句（仅支持 SELECT 查询）
-        host: 数据库主机地址（必需）
-        port: 数据库端口，默认 3306
-        username: 数据库用户名，默认 "root"
-        password: 数据库密码，默认 ""
-        database: 目标数据库名称，默认 "information_schema"
         limit: 最大返回行数，默认 100。如果 SQL 中已有 LIMIT，则使用 SQL 中的值
 
     Returns:
@@ -101,12 +100,21 @@ async def execute_sql_query(
         - row_count: 返回行数
         - execution_time: 执行时间（毫秒）
         - message: 提示信息或错误信息
+        结果超出输出预算时 data 只包含前几行，另外返回：
+        - total_rows: 查询结果总行数
+        - result_id: 完整结果的句柄，可用 fetch_query_result 分页获取、analyze_data 统计分析
+        - column_stats: 每列的统计信息（非空数、不同值数、最小/最大/平均值或高频值）
+        结果同时保存到会话工作区，workspace_table 为表名，可用 query_workspace 继续筛选 / 聚合
 
     Examples:
-        >>> await execute_sql_query("SELECT * FROM users WHERE id = 1", host="localhost", database="mydb")
-        >>> await execute_sql_query("SELECT COUNT(*) as cnt FROM orders", host="192.168.1.100", username="admin", password="pass123", database="shop", limit=1)
+        >>> await execute_sql_query.ainvoke({"sql": "SELECT * FROM users WHERE id = 1"})
+        >>> await execute_sql_query.ainvoke({"sql": "SELECT COUNT(*) as cnt FROM orders", "limit": 1})
     """
     # ========== 1. 基本参数验证 ==========
+    connection = resolve_connection(host, port, username, password, database)
+    host, port = connection["host"], connection["port"]
+    username, password = connection["username"], connection["password"]
+    database = connection["database"]
     sql = sql.strip() if sql else ""
     if not sql:
         logger.warning("收到空的 SQL 查询")
@@ -198,12 +206,40 @@ async def execute_sql_query(
             }
         )
 
+        # 结果保存到会话工作区，追问时可用 query_workspace 在本地筛选 / 聚合
+        workspace_table = await save_result(sql, columns, data)
+        workspace_info = {"workspace_table": workspace_table} if workspace_table else {}
+
+        # 超出输出预算时只返回前几行和列统计，完整结果保存在服务端
+        head, stats = shape_rows(columns, data)
+        if stats is not None:
+            result_id = store_result(sql, columns, data)
+            logger.info(
+                f"查询结果超出输出预算，已保存",
+                extra={"result_id": result_id, "row_count": len(data), "shown_rows": len(head)}
+            )
+            return format_success_response(
+                data=head,
+                columns=columns,
+                message=(
+                    f"查询成功，共 {len(data)} 行，超出输出预算只显示前 {len(head)} 行；"
+                    f"完整结果可用 fetch_query_result(result_id='{result_id}') 分页获取，"
+                    f"或用 analyze_data(result_id='{result_id}') 统计分析"
+                ),
+                execution_time=round(execution_time, 2),
+                total_rows=len(data),
+                result_id=result_id,
+                column_stats=stats,
+                **workspace_info
+            )
+
         # 返回成功响应
         return format_success_response(
             data=data,
             columns=columns,
             message=f"查询成功，返回 {len(data)} 行数据",
-            execution_time=round(execution_time, 2)
+            execution_time=round(execution_time, 2),
+            **workspace_info
         )
 
     except SQLAlchemyError as e:
@@ -0,0 +1,63 @@
+"""
+查询结果分页工具
+读取 execute_sql_query 保存在服务端的完整结果（结果超出输出预算时返回 result_id）
+"""
+
+from langchain_core.tools import tool
+
+from db_mcp.result_store import get_result, rows_within_budget, TOOL_OUTPUT_TOKEN_BUDGET
+from db_mcp.errors import format_error_response, format_success_response, ErrorCode
+from db_mcp.logger import get_logger
+
+logger = get_logger("mcp.tool.fetch_query_result")
+
+
+@tool
+async def fetch_query_result(result_id: str, offset: int = 0, limit: int = 50) -> str:
+    """
+    分页获取已保存的查询结果（execute_sql_query 结果过大时返回的 result_id）
+    不会重新执行 SQL
+
+    Args:
+        result_id: execute_sql_query 返回的 result_id
+        offset: 起始行（从 0 开始）
+        limit: 返回行数，默认 50（超出输出预算时自动减少）
+
+    Returns:
+        JSON 格式的结果，包含：
+        - success: 是否成功
+        - data: 本页行数据
+        - columns: 列名列表
+        - row_count: 本页行数
+        - offset / total_rows / next_offset: 分页信息（next_offset 为空表示已到末尾）
+        - message: 提示信息
+
+    Examples:
+        >>> await fetch_query_result.ainvoke({"result_id": "res_1a2b3c4d5e6f7a8b", "offset": 20})
+    """
+    stored = get_result(result_id)
+    if stored is None:
+        return format_error_response(
+            f"结果 '{result_id}' 不存在或已过期，请重新执行 SQL",
+            ErrorCode.INVALID_PARAMS
+        )
+
+    total = len(stored.rows)
+    offset = min(max(offset or 0, 0), total)
+    page = stored.rows[offset:offset + max(limit or 1, 1)]
+    page = page[:rows_within_budget(page, TOOL_OUTPUT_TOKEN_BUDGET)]
+    next_offset = offset + len(page) if offset + len(page) < total else None
+
+    logger.info(
+        f"分页读取查询结果",
+        extra={"result_id": stored.result_id, "offset": offset, "rows": len(page)}
+    )
+
+    return format_success_response(
+        data=page,
+        columns=stored.columns,
+        message=f"第 {offset + 1}-{offset + len(page)} 行，共 {total} 行" if page else f"已到末尾，共 {total} 行",
+        offset=offset,
+        total_rows=total,
+        next_offset=next_offset
+    )
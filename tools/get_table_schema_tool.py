@@ -1,16 +1,31 @@
 """
 数据库表结构查询工具
-从 MySQL information_schema 实时获取表的字段、类型、注释等元数据信息
+从 MySQL information_schema 获取表的字段、类型、注释等元数据信息
+优先使用本地表结构快照，快照中没有的表再实时查询
 集成异步连接池和统一错误处理
 """
 
-from typing import Optional
+from typing import Dict, List, Optional, Union
+from typing_extensions import Annotated
 from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
-from langchain_core.tools import tool
+from langchain_core.tools import tool, InjectedToolArg
 
 # 导入异步连接池和错误处理模块
 from db_mcp.connection_pool import get_engine
+from db_mcp.context import resolve_connection
+from db_mcp.table_index import resolve_table_name, make_index_key
+from db_mcp.schema_snapshot import (
+    SchemaSnapshot,
+    get_snapshot,
+    get_cached_table_details,
+    column_dicts,
+    index_dicts,
+)
+from db_mcp.metadata_store import get_metadata_store, TableMetadata, ColumnMetadata
+from db_mcp.relevance import rank_documents, take_within_budget, estimate_tokens
+from db_mcp.popularity import get_popularity
+from db_mcp.config import get_int_env
 from db_mcp.errors import (
     format_error_response,
     ErrorCode,
@@ -20,46 +35,88 @@ from db_mcp.logger import get_logger
 # 获取日志器
 logger = get_logger("mcp.tool.get_table_schema")
 
+# 传入 question 但未指定 token_budget 时的默认预算
+DEFAULT_SCHEMA_TOKEN_BUDGET = get_int_env("SCHEMA_TOKEN_BUDGET", 2000)
+# 不带任何参数调用时，表数量超过该值（且有该库的离线元数据）则返回按业务域分组的概览而不是全量列表
+SCHEMA_BROWSE_THRESHOLD = get_int_env("SCHEMA_BROWSE_THRESHOLD", 100)
+# 按业务域浏览时每页的表数量
+SCHEMA_BROWSE_PAGE_SIZE = get_int_env("SCHEMA_BROWSE_PAGE_SIZE", 50)
+# 没有离线元数据（或业务域为空）的表归入该分组
+UNCATEGORIZED = "未分类"
+
 
 def format_table_info(
     table_name: str,
     table_comment: str,
     columns: list,
-    indexes: list = None
+    indexes: list = None,
+    table_meta: Optional[TableMetadata] = None,
+    column_meta: Optional[Dict[str, ColumnMetadata]] = None,
+    question: Optional[str] = None,
+    token_budget: Optional[int] = None
 ) -> str:
     """
     将表结构信息格式化为文本
 
+    实时结构优先；离线元数据（业务注释、业务域、粒度、PII、推断关联）
+    用于补全 MySQL 中为空的注释和附加业务信息。
+
+    指定 token_budget 时只输出预算内的字段：有 question 则主键优先、
+    其余字段按与问题的相关度选取（输出仍保持原字段顺序），并提示省略数量。
+
     Args:
         table_name: 表名
         table_comment: 表注释
         columns: 字段信息列表
         indexes: 索引信息列表（可选）
+        table_meta: 离线表元数据（可选）
+        column_meta: 离线字段元数据，{casefold(字段名): ColumnMetadata}（可选）
+        question: 用户问题，用于字段相关度排序（可选）
+        token_budget: 字段列表的 token 预算（可选）
 
     Returns:
         格式化的文本字符串
     """
+    column_meta = column_meta or {}
+    business_comment = table_meta.comment if table_meta else ""
+
     lines = [
         f"【表名】{table_name}",
-        f"【表注释】{table_comment}" if table_comment else "",
+        f"【表注释】{table_comment or business_comment}" if (table_comment or business_comment) else "",
+        f"【业务说明】{business_comment}" if table_comment and business_comment and business_comment != table_comment else "",
+        f"【业务域】{table_meta.business_domain}" if table_meta and table_meta.business_domain else "",
+        f"【粒度】{table_meta.granularity}" if table_meta and table_meta.granularity else "",
         "",
         "【字段列表】"
     ]
 
-    # 收集主键信息
-    primary_keys = set()
-    if indexes:
-        for idx in indexes:
-            if idx.get("index_type") == "PRIMARY":
-                primary_keys.add(idx.get("column_name"))
+    # 收集主键信息：MySQL 的主键索引名固定为 PRIMARY（INDEX_TYPE 是 BTREE 等索引类型），
+    # 没有索引信息时使用离线元数据标记的主键
+    primary_keys = {
+        idx.get("column_name")
+        for idx in indexes or []
+        if idx.get("index_name") == "PRIMARY"
+    }
+    if not primary_keys:
+        for col in columns:
+            meta = column_meta.get(col.get("column_name", "").casefold())
+            if meta and meta.is_primary_key:
+                primary_keys.add(col.get("column_name"))
 
     # 处理字段信息
+    column_lines = []
+    column_texts = []
     for col in columns:
         col_name = col.get("column_name", "")
         column_type = col.get("column_type", "")
         is_nullable = col.get("is_nullable", "YES") == "YES"
         column_comment = col.get("column_comment", "")
         extra = col.get("extra", "")
+        meta = column_meta.get(col_name.casefold())
+
+        # MySQL 注释为空时使用离线元数据的业务注释
+        if not column_comment and meta and meta.comment != col_name:
+            column_comment = meta.comment
 
         # 构建字段描述
         col_desc = f"  - {col_name} ({column_type})"
@@ -72,6 +129,8 @@ def format_table_info(
             marks.append("非空")
         if extra:
             marks.append(extra)
+        if meta and meta.is_pii:
+            marks.append("PII")
 
         if marks:
             col_desc += f" [{', '.join(marks)}]"
@@ -80,7 +139,38 @@ def format_table_info(
         if column_comment:
             col_desc += f": {column_comment}"
 
-        lines.append(col_desc)
+        # 添加推断关联
+        if meta and meta.related_table:
+            related = meta.related_table
+            if meta.related_column:
+                related += f".{meta.related_column}"
+            col_desc += f"（推断关联: {related}）"
+
+        column_lines.append(col_desc)
+        column_texts.append((col_name, column_comment))
+
+    # 按预算选取字段
+    omitted = 0
+    if token_budget is not None and column_lines:
+        header_cost = sum(estimate_tokens(line) for line in lines)
+        order = list(range(len(column_lines)))
+        if question:
+            ranked = rank_documents(question, column_texts)
+            order = [i for _, i in ranked]
+            order.sort(key=lambda i: columns[i].get("column_name") not in primary_keys)
+        kept, omitted = take_within_budget(
+            (column_lines[i] for i in order),
+            max(token_budget - header_cost, 0)
+        )
+        kept_ids = sorted(order[:len(kept)])
+        column_lines = [column_lines[i] for i in kept_ids]
+
+    lines.extend(column_lines)
+    if omitted:
+        lines.append(
+            f"  ... 另有 {omitted} 个字段未显示（与问题相关度较低），"
+            f"不带 question/token_budget 调用可获取完整字段列表"
+        )
 
     # 过滤空行并拼接
     return "\n".join(line for line in lines if line is not None and line != "")
@@ -88,33 +178,43 @@ def format_table_info(
 
 @tool
 async def get_table_schema(
-    table_name: Optional[str] = None,
-    host: str = "localhost",
-    port: int = 3306,
-    username: str = "root",
-    password: str = "",
-    database: str = "information_schema"
+    table_name: Optional[Union[str, List[str]]] = None,
+    question: Optional[str] = None,
+    token_budget: Optional[int] = None,
+    domain: Optional[str] = None,
+    granularity: Optional[str] = None,
+    page: int = 1,
+    host: Annotated[Optional[str], InjectedToolArg] = None,
+    port: Annotated[Optional[int], InjectedToolArg] = None,
+    username: Annotated[Optional[str], InjectedToolArg] = None,
+    password: Annotated[Optional[str], InjectedToolArg] = None,
+    database: Annotated[Optional[str], InjectedToolArg] = None
 ) -> str:
     """
-    获取数据库表的结构信息（字段、类型、注释等），返回易读的文本格式
-    实时从 MySQL information_schema 查询，支持动态数据库连接
+    获取当前会话数据库中表的结构信息（字段、类型、注释等），返回易读的文本格式
+    优先读取本地表结构快照，快照缺失的表实时从 information_schema 查询；连接参数由服务端注入，无需传入
 
     功能特性：
     - 支持模糊匹配表名
+    - 支持一次获取多张表（单次 IN (...) 查询，结果去重合并）
     - 显示字段详细信息（类型、主键、非空、注释）
     - 支持查询所有表摘要
+    - 支持按问题相关度排序并限制输出 token 数（question / token_budget）
+    - 支持按业务域 / 粒度分层浏览（先看分组计数，再分页查看组内表）
     - 使用异步连接池提高性能
     - 完整的错误处理和日志记录
 
     Args:
         table_name: 表名。
-            - 如果为 None：返回所有表的摘要列表
+            - 如果为 None：返回所有表的摘要列表；表数量较多且有离线元数据时返回按业务域分组的概览
             - 如果指定表名：返回该表的详细结构（包含所有字段信息）
-        host: 数据库主机地址，默认 "localhost"
-        port: 数据库端口，默认 3306
-        username: 数据库用户名，默认 "root"
-        password: 数据库密码，默认 ""
-        database: 目标数据库名称，默认 "information_schema"
+            - 如果为表名列表（或逗号分隔的表名）：一次返回多张表的结构
+        question: 用户问题（可选）。传入后表摘要和字段按与问题的相关度排序，
+            只输出最相关的部分并提示还有多少未显示
+        token_budget: 输出的 token 预算（可选）。传入 question 时默认为 SCHEMA_TOKEN_BUDGET
+        domain: 业务域（可选），如 "risk"、"collection"。只列出该业务域的表，分页返回
+        granularity: 粒度（可选），如 "per_order"、"per_user"。可单独使用或与 domain 组合
+        page: 浏览模式的页码，从 1 开始
 
     Returns:
         文本格式的表结构信息：
@@ -123,10 +223,21 @@ async def get_table_schema(
         - 主键、非空等标记
 
     Examples:
-        >>> await get_table_schema.invoke({"host": "localhost", "database": "mydb"})  # 获取所有表
-        >>> await get_table_schema.invoke({"table_name": "users", "host": "localhost", "database": "mydb"})  # 获取指定表
+        >>> await get_table_schema.ainvoke({})  # 获取所有表
+        >>> await get_table_schema.ainvoke({"table_name": "users"})  # 获取指定表
+        >>> await get_table_schema.ainvoke({"table_name": ["users", "orders"]})  # 批量获取
+        >>> await get_table_schema.ainvoke({"question": "最近7天放款金额"})  # 相关表
+        >>> await get_table_schema.ainvoke({"domain": "risk", "granularity": "per_order"})  # 分组浏览
     """
     # ========== 1. 基本参数验证 ==========
+    connection = resolve_connection(host, port, username, password, database)
+    host, port = connection["host"], connection["port"]
+    username, password = connection["username"], connection["password"]
+    database = connection["database"]
+    table_names = _normalize_table_names(table_name)
+    if question and token_budget is None:
+        token_budget = DEFAULT_SCHEMA_TOKEN_BUDGET
+
     if not host:
         logger.warning("获取表结构时缺少主机地址")
         return format_error_response(
@@ -140,7 +251,7 @@ async def get_table_schema(
         extra={
             "host": host,
             "database": database,
-            "table_name": table_name if table_name else "（所有表）"
+            "table_name": ", ".join(table_names) if table_names else "（所有表）"
         }
     )
 
@@ -155,13 +266,27 @@ async def get_table_schema(
             database="information_schema"
         )
 
+        index_key = make_index_key(host, port, username, database)
+        snapshot = get_snapshot(index_key)
+
         async with engine.connect() as conn:
-            # ========== 3. 如果未指定表名，返回所有表的摘要 ==========
-            if not table_name:
-                return await _get_all_tables_summary(conn, database)
+            # ========== 3. 如果未指定表名，返回所有表的摘要或分组浏览 ==========
+            if not table_names:
+                tables = await _list_tables(conn, database, snapshot)
+                # 没有离线元数据时所有表都会落入 "未分类"，分组概览没有意义，仍返回全量摘要
+                if not question and (domain or granularity or (
+                    len(tables) > SCHEMA_BROWSE_THRESHOLD
+                    and get_metadata_store().has_database(database)
+                )):
+                    return _browse_tables(tables, database, domain, granularity, page)
+                if domain or granularity:
+                    tables = _filter_tables(tables, database, domain, granularity)
+                return _get_all_tables_summary(tables, database, question, token_budget)
 
             # ========== 4. 查询指定表的详细结构 ==========
-            return await _get_table_detail(conn, table_name, database)
+            return await _get_tables_detail(
+                conn, table_names, database, index_key, question, token_budget, snapshot
+            )
 
     except SQLAlchemyError as e:
         error_msg = str(e)
@@ -208,177 +333,392 @@ async def get_table_schema(
         )
 
 
-async def _get_all_tables_summary(conn, database: str) -> str:
+def _normalize_table_names(table_name: Optional[Union[str, List[str]]]) -> List[str]:
     """
-    获取数据库中所有表的摘要
+    将表名参数规范化为列表
+
+    支持单个表名、表名列表以及逗号分隔的表名字符串。
 
     Args:
-        conn: 数据库连接
-        database: 数据库名
+        table_name: 表名参数
 
     Returns:
-        表摘要文本
+        表名列表（去除空白和空项）
+    """
+    if not table_name:
+        return []
+    if isinstance(table_name, str):
+        table_name = table_name.split(",")
+    return [name.strip() for name in table_name if name and name.strip()]
+
+
+async def _list_tables(
+    conn,
+    database: str,
+    snapshot: Optional[SchemaSnapshot] = None
+) -> list:
     """
-    tables_sql = text("""
-        SELECT
-            TABLE_NAME,
-            TABLE_COMMENT,
-            ENGINE,
-            TABLE_ROWS
-        FROM TABLES
-        WHERE TABLE_SCHEMA = :database
-        AND TABLE_TYPE = 'BASE TABLE'
-        ORDER BY TABLE_NAME
-    """)
-
-    result = await conn.execute(tables_sql, {"database": database})
-    tables = result.fetchall()
+    获取数据库中所有表的 (表名, 注释, 引擎, 估算行数)，按表名排序
+
+    有快照时直接使用快照中的表列表，不查询 information_schema。
+    """
+    if snapshot is not None:
+        tables = [
+            (t.name, t.comment, t.engine, t.table_rows)
+            for t in snapshot.sorted_tables()
+        ]
+    else:
+        tables_sql = text("""
+            SELECT
+                TABLE_NAME,
+                TABLE_COMMENT,
+                ENGINE,
+                TABLE_ROWS
+            FROM TABLES
+            WHERE TABLE_SCHEMA = :database
+            AND TABLE_TYPE = 'BASE TABLE'
+            ORDER BY TABLE_NAME
+        """)
+
+        result = await conn.execute(tables_sql, {"database": database})
+        tables = result.fetchall()
 
     logger.info(f"查询到 {len(tables)} 个表", extra={"database": database})
+    return tables
+
+
+def _table_group(database: str, table_name: str) -> tuple:
+    """表所属的 (业务域, 粒度)，来自离线元数据"""
+    table_meta = get_metadata_store().get_table(database, table_name)
+    if table_meta is None:
+        return UNCATEGORIZED, ""
+    return table_meta.business_domain or UNCATEGORIZED, table_meta.granularity or ""
+
+
+def _filter_tables(
+    tables: list,
+    database: str,
+    domain: Optional[str] = None,
+    granularity: Optional[str] = None
+) -> list:
+    """按业务域 / 粒度过滤表（大小写不敏感）"""
+    domain = (domain or "").strip().casefold()
+    granularity = (granularity or "").strip().casefold()
+    filtered = []
+    for table in tables:
+        table_domain, table_granularity = _table_group(database, table[0])
+        if domain and table_domain.casefold() != domain:
+            continue
+        if granularity and table_granularity.casefold() != granularity:
+            continue
+        filtered.append(table)
+    return filtered
+
+
+def _browse_tables(
+    tables: list,
+    database: str,
+    domain: Optional[str] = None,
+    granularity: Optional[str] = None,
+    page: int = 1
+) -> str:
+    """
+    分层浏览表
+
+    未指定 domain / granularity 时返回按业务域分组的计数概览（含各粒度计数）；
+    指定后返回该分组内的表，每页 SCHEMA_BROWSE_PAGE_SIZE 个。
+
+    Args:
+        tables: _list_tables 的结果
+        database: 数据库名
+        domain: 业务域（可选）
+        granularity: 粒度（可选）
+        page: 页码，从 1 开始
+
+    Returns:
+        概览或分页列表文本
+    """
+    # ========== 1. 概览：业务域 -> 粒度计数 ==========
+    if not domain and not granularity:
+        groups: Dict[str, Dict[str, int]] = {}
+        for table in tables:
+            table_domain, table_granularity = _table_group(database, table[0])
+            counts = groups.setdefault(table_domain, {})
+            counts[table_granularity] = counts.get(table_granularity, 0) + 1
+
+        lines = [
+            f"数据库 {database} 共 {len(tables)} 个表，按业务域分组",
+            "=" * 60,
+        ]
+        for table_domain, counts in sorted(
+            groups.items(), key=lambda x: (x[0] == UNCATEGORIZED, -sum(x[1].values()), x[0])
+        ):
+            detail = ", ".join(
+                f"{g} {n}" for g, n in sorted(counts.items(), key=lambda x: -x[1]) if g
+            )
+            line = f"  • {table_domain} ({sum(counts.values())})"
+            if detail:
+                line += f": {detail}"
+            lines.append(line)
+        lines.append("=" * 60)
+        lines.append(
+            "提示: 使用 get_table_schema(domain='业务域') 浏览该业务域的表，"
+            "可再加 granularity='粒度' 缩小范围；或传入 question 按问题相关度列出表"
+        )
+        return "\n".join(lines)
+
+    # ========== 2. 分组内分页列表 ==========
+    filtered = _filter_tables(tables, database, domain, granularity)
+    group_name = " / ".join(x for x in (domain, granularity) if x)
+
+    if not filtered:
+        domains = sorted({_table_group(database, t[0])[0] for t in tables})
+        return (
+            f"数据库 {database} 中没有 {group_name} 分组的表\n"
+            f"可用业务域: {', '.join(domains)}"
+        )
+
+    # 常用的表排在前面（同热度保持表名顺序）
+    popularity = get_popularity()
+    filtered.sort(key=lambda t: -popularity.score(t[0]))
 
+    page_size = max(SCHEMA_BROWSE_PAGE_SIZE, 1)
+    total_pages = (len(filtered) + page_size - 1) // page_size
+    page = min(max(page or 1, 1), total_pages)
+    page_tables = filtered[(page - 1) * page_size:page * page_size]
+
+    metadata = get_metadata_store()
     lines = [
-        f"数据库 {database} 表结构摘要",
-        f"共 {len(tables)} 个表",
+        f"数据库 {database} 分组 {group_name}：共 {len(filtered)} 个表，第 {page}/{total_pages} 页",
         "=" * 60,
-        ""
     ]
+    for table in page_tables:
+        t_name = table[0]
+        t_comment = table[1] or ""
+        if not t_comment:
+            table_meta = metadata.get_table(database, t_name)
+            t_comment = table_meta.comment if table_meta else ""
+        line = f"  • {t_name}"
+        if not granularity:
+            table_granularity = _table_group(database, t_name)[1]
+            if table_granularity:
+                line += f" [{table_granularity}]"
+        if t_comment:
+            line += f": {t_comment}"
+        lines.append(line)
+    lines.append("=" * 60)
+    if page < total_pages:
+        lines.append(f"提示: 传入 page={page + 1} 查看下一页")
+    lines.append("提示: 使用 get_table_schema('表名') 查看具体表的详细结构")
+    return "\n".join(lines)
+
+
+def _get_all_tables_summary(
+    tables: list,
+    database: str,
+    question: Optional[str] = None,
+    token_budget: Optional[int] = None
+) -> str:
+    """
+    获取数据库中所有表的摘要
+
+    有 question 时按表名、注释、业务域与问题的相关度排序（常用的表有加成），
+    否则按表热度（历史查询 / 仪表板使用情况）排序；
+    有 token_budget 时只输出预算内的表，并提示未列出的数量。
+
+    Args:
+        tables: _list_tables 的结果（可能已按业务域过滤）
+        database: 数据库名
+        question: 用户问题（可选）
+        token_budget: 输出的 token 预算（可选）
+
+    Returns:
+        表摘要文本
+    """
+    metadata = get_metadata_store()
+    popularity = get_popularity()
 
+    blocks = []
+    search_texts = []
     for table in tables:
         t_name = table[0]
         t_comment = table[1] or ""
         engine_type = table[2] or ""
         row_count = table[3] or 0
+        table_meta = metadata.get_table(database, t_name)
+        if not t_comment and table_meta:
+            t_comment = table_meta.comment
 
-        lines.append(f"  • {t_name}")
+        block = [f"  • {t_name}"]
         if t_comment:
-            lines.append(f"    注释: {t_comment}")
+            block.append(f"    注释: {t_comment}")
+        if table_meta and table_meta.business_domain:
+            block.append(f"    业务域: {table_meta.business_domain}, 粒度: {table_meta.granularity}")
         if engine_type:
-            lines.append(f"    引擎: {engine_type}, 估算行数: {row_count}")
-        lines.append("")
+            block.append(f"    引擎: {engine_type}, 估算行数: {row_count}")
+        usage = popularity.info(t_name)
+        if usage:
+            block.append(
+                f"    历史使用: {usage['query_count']} 个查询, {usage['dashboard_count']} 个仪表板"
+            )
+        block.append("")
+        blocks.append("\n".join(block))
+
+        search_text = t_comment
+        if table_meta:
+            search_text += f" {table_meta.comment} {table_meta.business_domain}"
+        search_texts.append((t_name, search_text))
+
+    # 按问题相关度（热度加成）排序；无问题时按热度排序
+    scores = [popularity.score(table[0]) for table in tables]
+    if question:
+        ranked = [
+            (popularity.boost(score, tables[i][0]), scores[i], i)
+            for score, i in rank_documents(question, search_texts)
+        ]
+        order = [i for *_, i in sorted(ranked, key=lambda x: (-x[0], -x[1], x[2]))]
+    else:
+        order = sorted(range(len(tables)), key=lambda i: -scores[i])
+    blocks = [blocks[i] for i in order]
+
+    omitted = 0
+    if token_budget is not None:
+        blocks, omitted = take_within_budget(blocks, token_budget)
+
+    lines = [
+        f"数据库 {database} 表结构摘要",
+        f"共 {len(tables)} 个表" + ("（按与问题的相关度排序）" if question else "（常用的表在前）"),
+        "=" * 60,
+        ""
+    ]
+    lines.extend(blocks)
 
     lines.append("=" * 60)
+    if omitted:
+        lines.append(
+            f"还有 {omitted} 个表未列出（相关度较低），"
+            f"可提高 token_budget、换个问题描述，或直接指定表名查看"
+        )
     lines.append("提示: 使用 get_table_schema('表名') 查看具体表的详细结构")
 
     return "\n".join(lines)
 
 
-async def _get_table_detail(conn, table_name: str, database: str) -> str:
+async def _get_tables_detail(
+    conn,
+    table_names: List[str],
+    database: str,
+    index_key: str,
+    question: Optional[str] = None,
+    token_budget: Optional[int] = None,
+    snapshot: Optional[SchemaSnapshot] = None
+) -> str:
     """
-    获取指定表的详细信息
+    获取一张或多张表的详细信息
+
+    表名解析走本地表名索引（精确 / 大小写不敏感 / 模糊提示），
+    快照中已有的表直接使用快照结构；其余表的字段和索引信息
+    各用一次 IN (...) 查询批量获取（结果缓存，预取过的表直接命中）。
 
     Args:
         conn: 数据库连接
-        table_name: 表名
+        table_names: 表名列表
         database: 数据库名
+        index_key: 表名索引缓存 key
+        question: 用户问题，用于字段相关度排序（可选）
+        token_budget: 输出的 token 预算，多表时平均分配（可选）
+        snapshot: 表结构快照（可选）
 
     Returns:
-        表详细信息文本或错误消息
+        表详细信息文本（多张表合并输出）或错误消息
     """
-    table_name_lower = table_name.lower()
-
-    # ========== 1. 检查表是否存在 ==========
-    check_sql = text("""
-        SELECT TABLE_NAME, TABLE_COMMENT
-        FROM TABLES
-        WHERE TABLE_SCHEMA = :database
-        AND LOWER(TABLE_NAME) = :table_name
-    """)
-
-    result = await conn.execute(check_sql, {"database": database, "table_name": table_name_lower})
-    table_info = result.fetchone()
-
-    if not table_info:
-        # 表不存在，尝试模糊匹配
-        logger.warning(
-            f"表不存在: {table_name}",
-            extra={"database": database, "requested_table": table_name}
+    # ========== 1. 解析表名（去重，保持请求顺序） ==========
+    resolved: List[str] = []
+    missing: Dict[str, List[str]] = {}
+    comments: Dict[str, str] = {}
+
+    for name in table_names:
+        actual_table_name = snapshot.name_index.resolve(name) if snapshot else None
+        if actual_table_name:
+            comments[actual_table_name] = snapshot.tables[actual_table_name].comment
+        else:
+            # 快照中没有（或无快照）时走实时表名索引，处理快照之后新建的表
+            actual_table_name, index = await resolve_table_name(conn, index_key, database, name)
+            if actual_table_name:
+                comments[actual_table_name] = index.comment(actual_table_name)
+        if actual_table_name:
+            if actual_table_name not in resolved:
+                resolved.append(actual_table_name)
+        elif name not in missing:
+            # 表不存在，给出相似表名提示
+            logger.warning(
+                f"表不存在: {name}",
+                extra={"database": database, "requested_table": name}
+            )
+            missing[name] = index.suggest(name, limit=10, popularity=get_popularity().score)
+
+    # ========== 2. 获取字段和索引信息（快照优先，其余批量查询） ==========
+    columns_by_table: Dict[str, list] = {}
+    indexes_by_table: Dict[str, list] = {}
+    live_tables = []
+
+    for t in resolved:
+        table_snapshot = snapshot.tables.get(t) if snapshot else None
+        if table_snapshot is not None:
+            columns_by_table[t] = column_dicts(table_snapshot.columns)
+            indexes_by_table[t] = index_dicts(table_snapshot.indexes)
+        else:
+            live_tables.append(t)
+
+    if live_tables:
+        live_columns, live_indexes = await get_cached_table_details(conn, index_key, database, live_tables)
+        for t in live_tables:
+            columns_by_table[t] = column_dicts(live_columns.get(t, []))
+            indexes_by_table[t] = index_dicts(live_indexes.get(t, []))
+
+    if resolved:
+        logger.info(
+            f"查询表结构成功",
+            extra={
+                "tables": resolved,
+                "from_snapshot": len(resolved) - len(live_tables),
+                "column_count": sum(len(c) for c in columns_by_table.values()),
+                "index_count": sum(len(i) for i in indexes_by_table.values())
+            }
         )
 
-        similar_sql = text("""
-            SELECT TABLE_NAME
-            FROM TABLES
-            WHERE TABLE_SCHEMA = :database
-            AND LOWER(TABLE_NAME) LIKE :pattern
-            ORDER BY TABLE_NAME
-            LIMIT 10
-        """)
-        result = await conn.execute(similar_sql, {"database": database, "pattern": f"%{table_name_lower}%"})
-        similar_tables = [row[0] for row in result.fetchall()]
+    # ========== 3. 格式化输出（合并离线元数据） ==========
+    metadata = get_metadata_store()
+    table_budget = None
+    if token_budget is not None and resolved:
+        table_budget = token_budget // len(resolved)
+
+    sections = []
+    for actual_table_name in resolved:
+        columns = columns_by_table[actual_table_name]
+        section = format_table_info(
+            actual_table_name,
+            comments[actual_table_name],
+            columns,
+            indexes_by_table[actual_table_name],
+            table_meta=metadata.get_table(database, actual_table_name),
+            column_meta=metadata.get_columns(database, actual_table_name),
+            question=question,
+            token_budget=table_budget
+        )
+        section += f"\n\n 共 {len(columns)} 个字段"
+        sections.append(section)
 
-        msg = f"表 '{table_name}' 在数据库 '{database}' 中不存在\n"
+    for name, similar_tables in missing.items():
+        msg = f"表 '{name}' 在数据库 '{database}' 中不存在\n"
         if similar_tables:
             msg += f"\n你可能想查找以下表：\n"
             for t in similar_tables:
                 msg += f"  • {t}\n"
-        return msg
-
-    actual_table_name = table_info[0]
-    table_comment = table_info[1] or ""
-
-    # ========== 2. 查询字段信息 ==========
-    columns_sql = text("""
-        SELECT
-            COLUMN_NAME,
-            DATA_TYPE,
-            COLUMN_TYPE,
-            IS_NULLABLE,
-            COLUMN_DEFAULT,
-            COLUMN_COMMENT,
-            EXTRA,
-            ORDINAL_POSITION
-        FROM COLUMNS
-        WHERE TABLE_SCHEMA = :database
-        AND TABLE_NAME = :table_name
-        ORDER BY ORDINAL_POSITION
-    """)
-
-    result = await conn.execute(columns_sql, {"database": database, "table_name": actual_table_name})
-    columns = []
-    for row in result.fetchall():
-        columns.append({
-            "column_name": row[0],
-            "data_type": row[1],
-            "column_type": row[2],
-            "is_nullable": row[3],
-            "column_default": row[4],
-            "column_comment": row[5] or "",
-            "extra": row[6] or ""
-        })
-
-    # ========== 3. 查询索引信息（用于识别主键） ==========
-    indexes_sql = text("""
-        SELECT
-            INDEX_NAME,
-            COLUMN_NAME,
-            INDEX_TYPE,
-            NON_UNIQUE
-        FROM STATISTICS
-        WHERE TABLE_SCHEMA = :database
-        AND TABLE_NAME = :table_name
-        ORDER BY INDEX_NAME, SEQ_IN_INDEX
-    """)
-
-    result = await conn.execute(indexes_sql, {"database": database, "table_name": actual_table_name})
-    indexes = []
-    for row in result.fetchall():
-        indexes.append({
-            "index_name": row[0],
-            "column_name": row[1],
-            "index_type": row[2],
-            "non_unique": row[3]
-        })
-
-    logger.info(
-        f"查询表结构成功",
-        extra={
-            "table": actual_table_name,
-            "column_count": len(columns),
-            "index_count": len(indexes)
-        }
-    )
+        sections.append(msg)
 
-    # ========== 4. 格式化输出 ==========
-    result_text = format_table_info(actual_table_name, table_comment, columns, indexes)
-    result_text += f"\n\n 共 {len(columns)} 个字段"
+    if len(sections) == 1:
+        return sections[0]
 
-    return result_text
+    header = f"共请求 {len(table_names)} 个表，找到 {len(resolved)} 个"
+    return "\n\n".join([header] + sections)
@@ -0,0 +1,92 @@
+"""
+会话工作区查询工具
+在本会话之前的查询结果（内存 SQLite 表 r1、r2 ...）上执行 SQL，追问时无需重新查询 MySQL
+"""
+
+import json
+import sqlite3
+from typing import Optional
+from langchain_core.tools import tool
+
+from db_mcp import workspace
+from db_mcp.result_store import store_result, shape_rows
+from db_mcp.errors import format_error_response, format_success_response, ErrorCode
+from db_mcp.logger import get_logger
+from db_mcp import metrics
+
+logger = get_logger("mcp.tool.query_workspace")
+
+# 工作区表来源 SQL 的预览长度
+_SQL_PREVIEW_CHARS = 200
+
+
+@tool
+async def query_workspace(sql: Optional[str] = None) -> str:
+    """
+    在本会话之前的查询结果上执行 SQL（本地内存 SQLite，毫秒级，不访问 MySQL）
+    execute_sql_query 的每个结果都保存为一张表（返回的 workspace_table，如 r1、r2）。
+    追问（"按渠道拆分"、"只看上周"）时，如果已有结果包含需要的数据，优先在这里筛选、聚合、关联
+
+    Args:
+        sql: SQLite 语法的 SELECT 语句，如 "SELECT channel, SUM(amount) FROM r1 GROUP BY channel"。
+            为空时列出工作区中的表、字段和来源 SQL
+
+    Returns:
+        JSON 格式的结果：
+        - 不传 sql：tables 列表（name、columns、row_count、source_sql）
+        - 传入 sql：与 execute_sql_query 相同的格式（data、columns、row_count，
+          超出输出预算时返回前几行、列统计和 result_id）
+
+    Examples:
+        >>> await query_workspace.ainvoke({})
+        >>> await query_workspace.ainvoke({"sql": "SELECT * FROM r1 WHERE dt >= '2024-06-01'"})
+    """
+    # ========== 1. 列出工作区 ==========
+    if not sql or not sql.strip():
+        ws = workspace.get_workspace(create=False)
+        tables = [
+            {
+                "name": t.name,
+                "columns": t.columns,
+                "row_count": t.row_count,
+                "source_sql": t.sql[:_SQL_PREVIEW_CHARS],
+            }
+            for t in (ws.tables() if ws else [])
+        ]
+        return json.dumps({
+            "success": True,
+            "tables": tables,
+            "message": f"工作区共 {len(tables)} 张表" if tables else "工作区为空，请先用 execute_sql_query 查询"
+        }, ensure_ascii=False)
+
+    # ========== 2. 执行本地查询 ==========
+    sql = sql.strip().rstrip(";")
+    if not sql.split(None, 1)[0].upper() in ("SELECT", "WITH"):
+        return format_error_response("工作区只支持 SELECT 查询", ErrorCode.SQL_VALIDATION_ERROR)
+
+    try:
+        columns, rows = await workspace.query_workspace(sql)
+    except sqlite3.Error as e:
+        logger.warning(f"工作区查询失败: {e}", extra={"sql": sql[:200]})
+        return format_error_response(
+            f"工作区查询失败: {e}（可不传 sql 查看工作区中的表）",
+            ErrorCode.DB_QUERY_ERROR
+        )
+    metrics.increment("workspace_queries")
+
+    head, stats = shape_rows(columns, rows)
+    if stats is not None:
+        result_id = store_result(sql, columns, rows)
+        return format_success_response(
+            data=head,
+            columns=columns,
+            message=f"查询成功，共 {len(rows)} 行，超出输出预算只显示前 {len(head)} 行",
+            total_rows=len(rows),
+            result_id=result_id,
+            column_stats=stats
+        )
+    return format_success_response(
+        data=rows,
+        columns=columns,
+        message=f"查询成功，返回 {len(rows)} 行数据"
+    )
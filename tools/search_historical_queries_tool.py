@@ -0,0 +1,92 @@
+"""
+历史查询检索工具
+按候选表和关键词从本地 Redash 历史查询中找出经过验证的 SQL，作为生成 SQL 的参考
+"""
+
+import json
+from typing import List, Optional, Union
+from langchain_core.tools import tool
+
+from db_mcp.query_history import get_query_history
+from db_mcp.logger import get_logger
+
+logger = get_logger("mcp.tool.search_historical_queries")
+
+# 单条 SQL 返回的最大字符数
+_MAX_SQL_CHARS = 3000
+
+
+@tool
+async def search_historical_queries(
+    tables: Optional[Union[str, List[str]]] = None,
+    keywords: Optional[str] = None,
+    top_k: int = 3
+) -> str:
+    """
+    搜索相似的历史 SQL 查询（来自 Redash，已在报表中使用过）
+    参考历史写法可以一次写对 SQL，减少反复试错
+
+    Args:
+        tables: 候选表名（列表或逗号分隔），按用到这些表的历史查询排序，
+            命中的表越多、越少见，排名越靠前
+        keywords: 关键词或问题描述（可选），如 "放款金额"、"NPL"
+        top_k: 返回数量，默认 3（结构相同只有参数不同的 SQL 只返回一条）
+
+    Returns:
+        JSON 格式的搜索结果，包含：
+        - success: 是否成功
+        - results: 历史查询列表（id、name、description、tables_used、matched_tables、
+          dashboards、duplicates、sql）
+        - message: 提示信息
+
+    Examples:
+        >>> await search_historical_queries.ainvoke({"tables": ["sgo_orders"], "keywords": "放款金额"})
+        >>> await search_historical_queries.ainvoke({"keywords": "催收 回款率"})
+    """
+    if isinstance(tables, str):
+        tables = tables.split(",")
+    tables = [t.strip() for t in tables or [] if t and t.strip()]
+
+    if not tables and not (keywords and keywords.strip()):
+        return json.dumps({
+            "success": False,
+            "message": "tables 和 keywords 至少需要提供一个",
+            "results": []
+        }, ensure_ascii=False)
+
+    history = get_query_history()
+    if not len(history):
+        return json.dumps({
+            "success": False,
+            "message": "没有可用的历史查询（缺少 redash_queries.json），请使用 search_knowledge_graph",
+            "results": []
+        }, ensure_ascii=False)
+
+    top_k = max(1, min(top_k, 10))
+    hits = history.search(tables=tables, keywords=keywords, limit=top_k)
+
+    results = []
+    for hit in hits:
+        query = hit.query
+        results.append({
+            "id": query.id,
+            "name": query.name,
+            "description": query.description,
+            "tables_used": list(query.tables),
+            "matched_tables": hit.matched_tables,
+            "dashboards": list(query.dashboards),
+            "duplicates": hit.duplicates,
+            "score": hit.score,
+            "sql": query.sql[:_MAX_SQL_CHARS],
+        })
+
+    logger.info(
+        f"历史查询检索",
+        extra={"tables": tables, "keywords": keywords, "hits": len(results)}
+    )
+
+    return json.dumps({
+        "success": True,
+        "results": results,
+        "message": f"找到 {len(results)} 条历史查询" if results else "没有找到相关的历史查询"
+    }, ensure_ascii=False)
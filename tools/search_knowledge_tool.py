@@ -1,17 +1,54 @@
 """
 LightRAG 知识图谱搜索工具
 用于查询历史 SQL、相关表和字段的业务逻辑
+
+延迟控制：
+- 每次调用有总延迟预算（LIGHTRAG_LATENCY_BUDGET）
+- 主模式（如 mix）在历史耗时的分位数（LIGHTRAG_HEDGE_PERCENTILE）内未返回时，
+  并行发出一个 naive 查询，取先成功返回的结果，另一个取消
+- 胜出模式、对冲次数、预算超时和各模式耗时计入 db_mcp.metrics
 """
 
 import os
 import json
-import requests
+import time
+import asyncio
+import httpx
 from typing import Optional, Literal
 from langchain_core.tools import tool
 
+from db_mcp.http_client import get_http_client, HTTP_READ_TIMEOUT
+from db_mcp.response_cache import ResponseCache
+from db_mcp.config import get_int_env
+from db_mcp import metrics
+from db_mcp.logger import get_logger
+
+logger = get_logger("mcp.tool.search_knowledge")
+
+# 单次调用的总延迟预算（秒）
+LIGHTRAG_LATENCY_BUDGET = get_int_env("LIGHTRAG_LATENCY_BUDGET", 60)
+# 主模式耗时超过历史该分位数时发出对冲查询
+LIGHTRAG_HEDGE_PERCENTILE = get_int_env("LIGHTRAG_HEDGE_PERCENTILE", 90)
+# 对冲等待时间的下限 / 样本不足时的默认值（秒）
+LIGHTRAG_HEDGE_MIN_DELAY = get_int_env("LIGHTRAG_HEDGE_MIN_DELAY", 2)
+LIGHTRAG_HEDGE_DEFAULT_DELAY = get_int_env("LIGHTRAG_HEDGE_DEFAULT_DELAY", 15)
+# 对冲使用的模式（纯向量检索，通常最快）
+HEDGE_MODE = "naive"
+# 计算分位数所需的最少样本数
+_MIN_LATENCY_SAMPLES = 20
+
+
+# LightRAG 查询结果缓存（TTL + LRU，可选持久化到 LIGHTRAG_CACHE_FILE）
+knowledge_cache = ResponseCache(
+    "lightrag",
+    max_entries=get_int_env("LIGHTRAG_CACHE_SIZE", 512),
+    ttl=get_int_env("LIGHTRAG_CACHE_TTL", 3600),
+    persist_path=os.getenv("LIGHTRAG_CACHE_FILE", ""),
+)
+
 
 @tool
-def search_knowledge_graph(
+async def search_knowledge_graph(
     query: str,
     mode: Literal["naive", "local", "global", "hybrid", "mix", "bypass"] = "mix",
     top_k: int = 5
@@ -39,13 +76,15 @@ def search_knowledge_graph(
         JSON 格式的搜索结果，包含：
         - success: 是否成功
         - results: 搜索结果（LightRAG 返回的智能回答）
-        - mode: 使用的搜索模式
+        - mode: 实际返回结果的搜索模式（主模式较慢时可能是 naive）
+        - requested_mode: 请求的搜索模式
+        - cached: 是否来自缓存
         - message: 提示信息或错误信息
     
     Examples:
-        >>> search_knowledge_graph.invoke({"query": "如何计算 NPL 率"})
-        >>> search_knowledge_graph.invoke({"query": "temp_rc_model_daily 表", "mode": "mix"})
-        >>> search_knowledge_graph.invoke({"query": "查询昨天的放款金额", "top_k": 3})
+        >>> await search_knowledge_graph.ainvoke({"query": "如何计算 NPL 率"})
+        >>> await search_knowledge_graph.ainvoke({"query": "temp_rc_model_daily 表", "mode": "mix"})
+        >>> await search_knowledge_graph.ainvoke({"query": "查询昨天的放款金额", "top_k": 3})
     """
     # 参数验证
     if not query or not query.strip():
@@ -58,72 +97,43 @@ def search_knowledge_graph(
     # 获取 LightRAG API 配置
     lightrag_url = os.getenv("LIGHTRAG_API_URL", "http://localhost:9621")
     
-    # 构建 API 端点
-    api_endpoint = f"{lightrag_url.rstrip('/')}/query"
-    
-    # 构建请求体（根据 LightRAG API 文档）
-    payload = {
-        "query": query.strip(),
-        "mode": mode
-        # 注意：LightRAG API 可能不支持 top_k 参数，这里仅保留 query 和 mode
-    }
-    
     try:
-        # 发送请求
-        response = requests.post(
-            api_endpoint,
-            json=payload,
-            timeout=600
+        # 相同问题（归一化后）+ 模式命中缓存直接返回，并发的相同请求只查询一次；
+        # 对冲的 naive 查询胜出时结果只按 naive 缓存，之后的请求仍会尝试主模式
+        (content, answered_mode), cached = await knowledge_cache.get_or_compute(
+            make_cache_key(query, mode),
+            lambda: _hedged_query(lightrag_url, query.strip(), mode),
+            store_key=lambda result: make_cache_key(query, result[1])
         )
         
-        # 检查响应状态
-        if response.status_code == 200:
-            result_data = response.json()
-            
-            # LightRAG 返回格式可能是 {"response": "..."} 或直接是文本
-            if isinstance(result_data, dict):
-                if "response" in result_data:
-                    content = result_data["response"]
-                elif "result" in result_data:
-                    content = result_data["result"]
-                else:
-                    content = json.dumps(result_data, ensure_ascii=False)
-            else:
-                content = str(result_data)
-            
-            return json.dumps({
-                "success": True,
-                "results": content,
-                "mode": mode,
-                "top_k": top_k,
-                "message": "搜索成功"
-            }, ensure_ascii=False)
-        
-        elif response.status_code == 404:
-            return json.dumps({
-                "success": False,
-                "message": f"LightRAG 服务未找到，请检查服务地址：{lightrag_url}",
-                "results": []
-            }, ensure_ascii=False)
-        
-        else:
-            return json.dumps({
-                "success": False,
-                "message": f"LightRAG API 返回错误：{response.status_code} - {response.text[:200]}",
-                "results": []
-            }, ensure_ascii=False)
+        return json.dumps({
+            "success": True,
+            "results": content,
+            "mode": answered_mode,
+            "requested_mode": mode,
+            "top_k": top_k,
+            "cached": cached,
+            "message": "搜索成功"
+        }, ensure_ascii=False)
     
-    except requests.exceptions.ConnectionError:
+    except LightRAGError as e:
+        return json.dumps({
+            "success": False,
+            "message": str(e),
+            "results": []
+        }, ensure_ascii=False)
+    
+    except (httpx.ConnectError, httpx.ConnectTimeout):
         return json.dumps({
             "success": False,
             "message": f"无法连接到 LightRAG 服务（{lightrag_url}），请确认服务是否启动",
             "results": []
         }, ensure_ascii=False)
     
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         return json.dumps({
             "success": False,
-            "message": "LightRAG 查询超时（30秒），请稍后重试",
+            "message": f"LightRAG 查询超时（{min(HTTP_READ_TIMEOUT, LIGHTRAG_LATENCY_BUDGET)}秒），请稍后重试",
             "results": []
         }, ensure_ascii=False)
     
@@ -133,3 +143,139 @@ def search_knowledge_graph(
             "message": f"查询失败：{str(e)}",
             "results": []
         }, ensure_ascii=False)
+
+
+class LightRAGError(Exception):
+    """LightRAG 返回非 200 响应（不写入缓存）"""
+
+
+def make_cache_key(query: str, mode: str) -> str:
+    """缓存 key：模式 + 归一化问题（去首尾空白、合并空白、大小写折叠）"""
+    return f"{mode}:{' '.join(query.split()).casefold()}"
+
+
+def _hedge_delay(mode: str) -> float:
+    """主模式的对冲等待时间：历史耗时分位数，限制在 [最小值, 预算] 之间"""
+    delay = metrics.percentile(
+        "lightrag_latency_seconds", LIGHTRAG_HEDGE_PERCENTILE,
+        min_samples=_MIN_LATENCY_SAMPLES, mode=mode
+    )
+    if delay is None:
+        delay = LIGHTRAG_HEDGE_DEFAULT_DELAY
+    return min(max(delay, LIGHTRAG_HEDGE_MIN_DELAY), LIGHTRAG_LATENCY_BUDGET)
+
+
+async def _timed_query(lightrag_url: str, query: str, mode: str) -> str:
+    """
+    调用 LightRAG 并记录耗时
+
+    被对冲取消的请求记录已等待的时长（真实耗时的下限），
+    避免分位数只统计到较快的请求而逐渐偏低。
+    """
+    start_time = time.monotonic()
+    try:
+        content = await _query_lightrag(lightrag_url, query, mode)
+    except asyncio.CancelledError:
+        metrics.observe("lightrag_latency_seconds", time.monotonic() - start_time, mode=mode)
+        raise
+    metrics.observe("lightrag_latency_seconds", time.monotonic() - start_time, mode=mode)
+    return content
+
+
+async def _hedged_query(lightrag_url: str, query: str, mode: str) -> list:
+    """
+    带对冲和总预算的 LightRAG 查询
+
+    主模式在 _hedge_delay 内未返回时并行发出 naive 查询，取先成功的结果；
+    一方失败时继续等待另一方；超出 LIGHTRAG_LATENCY_BUDGET 时取消全部请求。
+
+    Returns:
+        [回答文本, 实际返回结果的模式]（列表便于缓存持久化为 JSON）
+
+    Raises:
+        LightRAGError / httpx.HTTPError: 所有请求都失败时抛出最后一个错误
+        httpx.ReadTimeout: 超出延迟预算
+    """
+    deadline = time.monotonic() + LIGHTRAG_LATENCY_BUDGET
+    tasks = {asyncio.create_task(_timed_query(lightrag_url, query, mode)): mode}
+    hedge_at = None
+    if mode not in (HEDGE_MODE, "bypass"):
+        hedge_at = time.monotonic() + _hedge_delay(mode)
+
+    last_error: Optional[BaseException] = None
+    try:
+        while tasks:
+            wake_at = min(hedge_at, deadline) if hedge_at else deadline
+            done, _ = await asyncio.wait(
+                tasks, timeout=max(wake_at - time.monotonic(), 0),
+                return_when=asyncio.FIRST_COMPLETED
+            )
+
+            for task in done:
+                task_mode = tasks.pop(task)
+                if task.exception() is None:
+                    metrics.increment("lightrag_winner", mode=task_mode)
+                    return [task.result(), task_mode]
+                last_error = task.exception()
+                metrics.increment("lightrag_errors", mode=task_mode)
+
+            # 主模式失败或等待超过分位数时发出对冲查询（只发一次）
+            if hedge_at and (not tasks or time.monotonic() >= hedge_at) and time.monotonic() < deadline:
+                hedge_at = None
+                metrics.increment("lightrag_hedges", mode=mode)
+                logger.info(f"LightRAG {mode} 查询较慢，并行发出 {HEDGE_MODE} 查询", extra={"query": query})
+                tasks[asyncio.create_task(_timed_query(lightrag_url, query, HEDGE_MODE))] = HEDGE_MODE
+
+            if tasks and time.monotonic() >= deadline:
+                metrics.increment("lightrag_budget_timeouts", mode=mode)
+                raise httpx.ReadTimeout(f"LightRAG 查询超出延迟预算（{LIGHTRAG_LATENCY_BUDGET} 秒）")
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    raise last_error
+
+
+async def _query_lightrag(lightrag_url: str, query: str, mode: str) -> str:
+    """
+    调用 LightRAG /query 接口
+
+    Returns:
+        LightRAG 返回的回答文本
+
+    Raises:
+        LightRAGError: 非 200 响应
+        httpx.HTTPError: 连接或超时错误
+    """
+    # 构建 API 端点
+    api_endpoint = f"{lightrag_url.rstrip('/')}/query"
+    
+    # 构建请求体（根据 LightRAG API 文档）
+    payload = {
+        "query": query,
+        "mode": mode
+        # 注意：LightRAG API 可能不支持 top_k 参数，这里仅保留 query 和 mode
+    }
+    
+    # 发送请求（共享的异步客户端，连接/读取超时见 db_mcp.http_client）
+    response = await get_http_client().post(
+        api_endpoint,
+        json=payload
+    )
+    
+    # 检查响应状态
+    if response.status_code == 404:
+        raise LightRAGError(f"LightRAG 服务未找到，请检查服务地址：{lightrag_url}")
+    if response.status_code != 200:
+        raise LightRAGError(f"LightRAG API 返回错误：{response.status_code} - {response.text[:200]}")
+    
+    result_data = response.json()
+    
+    # LightRAG 返回格式可能是 {"response": "..."} 或直接是文本
+    if isinstance(result_data, dict):
+        if "response" in result_data:
+            return result_data["response"]
+        if "result" in result_data:
+            return result_data["result"]
+        return json.dumps(result_data, ensure_ascii=False)
+    return str(result_data)
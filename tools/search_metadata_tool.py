@@ -0,0 +1,132 @@
+"""
+本地元数据搜索工具
+在进程内 BM25 索引（离线元数据、线上数据字典、Redash 历史查询）中检索表、字段和历史 SQL，
+本地没有足够相关的结果时再回退到 LightRAG 知识图谱
+"""
+
+import json
+import time
+from typing import Literal, Optional
+from langchain_core.tools import tool
+
+from db_mcp.knowledge_index import get_knowledge_index, KIND_QUERY
+from db_mcp.popularity import get_popularity
+from db_mcp.config import get_int_env
+from db_mcp import metrics
+from db_mcp.logger import get_logger
+from .search_knowledge_tool import search_knowledge_graph
+
+logger = get_logger("mcp.tool.search_metadata")
+
+# 本地最相关结果覆盖的查询词项（按 idf 加权）低于该百分比时视为没有命中，回退到 LightRAG
+# （BM25 得分是绝对值，随查询长度变化，不能直接用固定阈值）
+KNOWLEDGE_MIN_MATCH_PERCENT = get_int_env("KNOWLEDGE_MIN_MATCH_PERCENT", 50)
+# 单条结果内容的最大字符数（历史查询的 SQL 可能很长）
+_MAX_CONTENT_CHARS = 1500
+# 按热度重排时召回的候选倍数
+_RERANK_CANDIDATES_FACTOR = 3
+
+
+def _hit_table(hit) -> str:
+    """结果对应的表名（字段结果为 表名.字段名）"""
+    return hit.name.rsplit(".", 1)[0]
+
+
+@tool
+async def search_metadata(
+    query: str,
+    top_k: int = 5,
+    kind: Optional[Literal["table", "column", "query"]] = None
+) -> str:
+    """
+    搜索数据库元数据：表名、字段名、业务含义、历史 Redash 查询
+    本地索引毫秒级返回；本地没有相关结果时自动回退到知识图谱（LightRAG）
+
+    Args:
+        query: 搜索内容，支持中文描述、表名、字段名
+               例如：
+               - "放款金额"
+               - "machine_status 字段的含义"
+               - "催收 IVR 通话明细表"
+        top_k: 返回的结果数量，默认 5
+        kind: 只搜索某类结果（可选）
+            - "table": 表（注释、业务域、粒度）
+            - "column": 字段（表名.字段名、注释、类型）
+            - "query": Redash 历史查询（名称、描述、SQL）
+
+    Returns:
+        JSON 格式的搜索结果，包含：
+        - success: 是否成功
+        - source: 结果来源（local / lightrag）
+        - results: 结果列表（type、name、score、content）或 LightRAG 的回答
+        - message: 提示信息或错误信息
+
+    Examples:
+        >>> await search_metadata.ainvoke({"query": "放款金额"})
+        >>> await search_metadata.ainvoke({"query": "machine_status", "kind": "column"})
+    """
+    # 参数验证
+    if not query or not query.strip():
+        return json.dumps({
+            "success": False,
+            "message": "查询内容不能为空",
+            "results": []
+        }, ensure_ascii=False)
+
+    start_time = time.time()
+    top_k = max(1, min(top_k, 50))
+    hits = get_knowledge_index().search(
+        query, limit=top_k * _RERANK_CANDIDATES_FACTOR, kinds=[kind] if kind else None
+    )
+    top_match = hits[0].match_ratio if hits else 0.0
+
+    # 表和字段结果按表热度加成后重排，常用的表排在前面
+    popularity = get_popularity()
+    hits = sorted(
+        hits,
+        key=lambda hit: -(hit.score if hit.kind == KIND_QUERY
+                          else popularity.boost(hit.score, _hit_table(hit)))
+    )[:top_k]
+    elapsed_ms = round((time.time() - start_time) * 1000, 2)
+
+    results = [
+        {
+            "type": hit.kind,
+            "name": hit.name,
+            "score": hit.score,
+            "content": hit.content[:_MAX_CONTENT_CHARS],
+            "source": hit.source,
+            "match_ratio": hit.match_ratio,
+        }
+        for hit in hits
+    ]
+
+    if hits and top_match * 100 >= KNOWLEDGE_MIN_MATCH_PERCENT:
+        metrics.increment("search_metadata_requests", source="local")
+        logger.info(
+            f"本地元数据命中",
+            extra={"query": query, "hits": len(hits), "elapsed_ms": elapsed_ms}
+        )
+        return json.dumps({
+            "success": True,
+            "source": "local",
+            "results": results,
+            "message": f"本地索引找到 {len(results)} 条结果"
+        }, ensure_ascii=False)
+
+    # ========== 本地没有足够相关的结果，回退到 LightRAG ==========
+    logger.info(f"本地元数据未命中，回退到 LightRAG", extra={"query": query, "top_match": top_match})
+    fallback = json.loads(await search_knowledge_graph.ainvoke({"query": query}))
+    if fallback.get("success") or not results:
+        metrics.increment("search_metadata_requests", source="lightrag")
+        fallback["source"] = "lightrag"
+        return json.dumps(fallback, ensure_ascii=False)
+
+    # LightRAG 不可用时仍返回本地的低分结果
+    metrics.increment("search_metadata_requests", source="local_low_score")
+    return json.dumps({
+        "success": True,
+        "source": "local",
+        "results": results,
+        "message": f"本地结果相关度较低，知识图谱不可用：{fallback.get('message', '')}"
+    }, ensure_ascii=False)
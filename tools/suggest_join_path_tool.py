@@ -0,0 +1,100 @@
+"""
+表关联路径工具
+基于 Redash 历史 SQL 中真实出现过的关联条件，给出多张表之间的 JOIN 路径
+"""
+
+from typing import List, Union
+from langchain_core.tools import tool
+
+from db_mcp.join_graph import get_join_graph
+from db_mcp.query_history import normalize_table_name
+from db_mcp.logger import get_logger
+
+logger = get_logger("mcp.tool.suggest_join_path")
+
+
+@tool
+async def suggest_join_path(tables: Union[str, List[str]]) -> str:
+    """
+    给出多张表之间的关联方式（JOIN 条件），来自历史 SQL 中真实使用过的关联
+    写多表 SQL 前调用，可直接使用返回的 JOIN 子句，避免猜测关联字段
+
+    Args:
+        tables: 表名列表（或逗号分隔的表名），第一张表作为主表。
+            只传一张表时返回与它最常关联的表
+
+    Returns:
+        文本格式的关联路径：
+        - 每一步的关联条件和历史使用次数
+        - 可直接使用的 FROM ... JOIN ... ON ... 子句
+        - 无法通过历史关联连接的表
+
+    Examples:
+        >>> await suggest_join_path.ainvoke({"tables": ["sgo_orders", "users"]})
+        >>> await suggest_join_path.ainvoke({"tables": "collection_v2"})
+    """
+    if isinstance(tables, str):
+        tables = tables.split(",")
+    tables = [t.strip() for t in tables or [] if t and t.strip()]
+    if not tables:
+        return "请提供至少一个表名"
+
+    graph = get_join_graph()
+    if not len(graph):
+        return "没有可用的历史关联数据（缺少 join_graph.json / redash_queries.json），请根据表结构推断关联字段"
+
+    # ========== 1. 单表：列出常用关联 ==========
+    if len(tables) == 1:
+        neighbors = graph.neighbors(tables[0])
+        if not neighbors:
+            return f"历史 SQL 中没有找到表 '{tables[0]}' 与其他表的关联"
+        lines = [f"与 {tables[0]} 最常关联的表（历史 SQL）："]
+        for edge in neighbors:
+            lines.append(
+                f"  • {edge.left_table}.{edge.left_column} = {edge.right_table}.{edge.right_column}"
+                f"  （{edge.count} 次）"
+            )
+        return "\n".join(lines)
+
+    # ========== 2. 多表：关联路径 ==========
+    path_edges, unreachable = graph.find_join_path(tables)
+    logger.info(
+        f"关联路径查询",
+        extra={"tables": tables, "edges": len(path_edges), "unreachable": unreachable}
+    )
+
+    lines = []
+    if path_edges:
+        requested = [normalize_table_name(t) for t in tables]
+        lines.append("【关联路径】（来自历史 SQL，括号内为使用次数）")
+        for edge in path_edges:
+            lines.append(
+                f"  • {edge.left_table}.{edge.left_column} = {edge.right_table}.{edge.right_column}"
+                f"  （{edge.count} 次）"
+            )
+        intermediate = sorted(
+            {t for e in path_edges for t in (e.left_table, e.right_table)} - set(requested)
+        )
+        if intermediate:
+            lines.append(f"  需要经过中间表: {', '.join(intermediate)}")
+
+        # 按连接顺序生成 JOIN 子句（起点为第一张能关联上的表）
+        root = next(t for t in requested if t not in unreachable)
+        joined = {root}
+        clause = [f"FROM {root}"]
+        for edge in path_edges:
+            new_table = edge.right_table if edge.left_table in joined else edge.left_table
+            joined.add(new_table)
+            clause.append(
+                f"JOIN {new_table} ON {edge.left_table}.{edge.left_column} = "
+                f"{edge.right_table}.{edge.right_column}"
+            )
+        lines.append("")
+        lines.append("【JOIN 子句】")
+        lines.extend(f"  {line}" for line in clause)
+
+    if unreachable:
+        lines.append("")
+        lines.append(f"以下表在历史 SQL 中无法与其他表关联，请根据表结构推断: {', '.join(unreachable)}")
+
+    return "\n".join(lines).strip() or "这些表在历史 SQL 中没有关联记录"